@@ -1,46 +1,55 @@
-from qgis.core import *
-from qgis.utils import iface
-import ee
-import pandas as pd
-import time
-
-# Dictionary of drought-prone Indian states with bounding boxes
-states_regions = {
-    "Rajasthan": ee.Geometry.BBox(69.5, 23.3, 76.5, 30.2)
-}
-
-
-# Function to get minimum soil moisture data to avoid memory issues
-def get_soil_moisture_data(region):
-    image = ee.ImageCollection("NASA/SMAP/SPL4SMGP/007") \
-                .filterBounds(region) \
+from extraction.cli import load_config, make_client
+from extraction.decode import samples_to_frame
+from extraction.scheduler import is_throttle_error
+from extraction.sources import DATASETS
+from extraction.tiling import tiled_sample
+from extraction.tracing import labels
+
+STATES = ["Rajasthan"]
+
+
+# Function to get soil moisture data; the state is sampled tile by tile so
+# no single request is large enough to hit Earth Engine's memory limit
+def get_soil_moisture_data(client, bbox, num_rows=1000):
+    import pandas as pd
+
+    image = client.ImageCollection(DATASETS['smap']['collection']) \
+                .filterBounds(client.Geometry.BBox(*bbox)) \
                 .filterDate('2019-01-01', '2024-12-31') \
-                .select(['sm_surface']) \
+                .select(DATASETS['smap']['bands']) \
                 .first()
 
-    # Sample at SMAP resolution (~9 km)
-    sampled_points = image.sample(
-        region=region,
-        scale=750,  # Match SMAP pixel size
-        numPixels=1000,  # Start with only 10 pixels!
-        seed=42  # Ensure reproducibility
-    )
-
-    # Convert to Pandas DataFrame (with size check)
-    try:
-        features = sampled_points.getInfo()['features']
-        if len(features) == 0:
-            print("No data extracted. Try increasing numPixels or time range.")
+    # Sample one tile at SMAP resolution (~9 km)
+    def fetch_tile(tile, num_pixels, seed):
+        sampled_points = image.sample(
+            region=client.Geometry.BBox(*tile),
+            scale=750,  # Match SMAP pixel size
+            numPixels=num_pixels,
+            seed=seed  # Per-tile seed keeps reruns reproducible
+        )
+        try:
+            return samples_to_frame(sampled_points.getInfo())
+        except Exception as e:
+            if is_throttle_error(e):
+                raise
+            print("Error extracting soil moisture data:", e)
             return pd.DataFrame()
-        properties = [f['properties'] for f in features]
-        return pd.DataFrame(properties)
-    except Exception as e:
-        print("Error extracting soil moisture data:", e)
-        return pd.DataFrame()
-# Loop through each state and extract data
-
-for state, region in states_regions.items():
-    print(f"Processing {state}...")
-    soil_moisture_df = get_soil_moisture_data(region)
-    soil_moisture_df.to_csv(f'{state}_soil_moisture.csv', index=False)
 
+    df = tiled_sample(fetch_tile, bbox, target_rows=num_rows, seed=42, by=None)
+    if df.empty:
+        print("No data extracted. Try increasing numPixels or time range.")
+    return df
+
+
+if __name__ == '__main__':
+    # Same traced client as python -m extraction: calls are counted, timed and memoized
+    client = make_client()
+    config = load_config()
+
+    # Loop through each state and extract data
+    for state in STATES:
+        print(f"Processing {state}...")
+        with labels(dataset='smap', state=state):
+            soil_moisture_df = get_soil_moisture_data(client, config['states'][state]['bbox'])
+        soil_moisture_df.to_csv(f'{state}_soil_moisture.csv', index=False)
+    client.print_report()
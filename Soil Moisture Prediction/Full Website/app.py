@@ -1,36 +1,164 @@
-from flask import Flask, render_template, request, url_for
+from flask import (Flask, Response, abort, g, jsonify, render_template, request, send_file, stream_with_context,
+                   url_for)
 import pandas as pd
 import numpy as np
 import joblib
-import matplotlib.pyplot as plt
+import itertools
+import json
+import logging
 import os
+import re
+import sys
+import time
+import uuid
 from sklearn.metrics import root_mean_squared_error, mean_absolute_error, r2_score
 from datetime import datetime
 
+# Shared extraction helpers (partitioned data store) live one directory up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from serving import batch
+from serving.charts import ChartCache
+from serving.climatology import DATA_STORE, ClimatologyStore
+from serving.forecasts import STORE_PATH, ForecastStore
+from serving.inference import InferenceExecutor, InferenceTimeout, set_model_threads
+from serving.jobs import JobQueue
+from serving.maps import MAP_DIR, available, build_map, parse_period, read_meta, tile_path
+from serving.metrics import Profiler, end_trace, metrics, stage, start_trace
+from serving.registry import ModelRegistry
+from serving.scenarios import SCENARIO_METHODS, draw_scenarios, future_frame, percentile_bands, score_scenarios
+from serving.trees import FlatEnsemble, is_flat, served_path
+
 app = Flask(__name__)
 
-def get_monthly_climatology(file_path):
-    df = pd.read_csv(file_path)
-    monthly_avg = df.groupby('Month').mean().reset_index()
-    feature_cols = monthly_avg.columns.difference(['sm_surface', 'Year'])
-    monthly_avg = monthly_avg[feature_cols]
-    return df, monthly_avg
+# DATA_STORE: the partitioned Parquet store `python -m extraction` writes (the "store" in
+# extraction/config.json, relative to "Soil Moisture Prediction", or $DATA_STORE); states
+# without data there fall back to the "Data - {State} Done.csv" tables
 
-def generate_future_data(monthly_avg, years, original_df):
-    future_years = list(range(2025, 2025 + int(years)))
-    future_data = []
+# Monthly climatology per state, rebuilt only when the state's data changes
+# (python -m serving.climatology builds climatology/<State>.json at deploy time)
+climatology = ClimatologyStore(DATA_STORE, 'climatology')
+
+# A state's models run concurrently on one bounded pool shared by all requests
+# (INFERENCE_WORKERS threads x MODEL_N_JOBS threads per model, INFERENCE_TIMEOUT seconds per request)
+MODEL_N_JOBS = int(os.environ.get('MODEL_N_JOBS', 1))
+executor = InferenceExecutor(max_workers=int(os.environ.get('INFERENCE_WORKERS', 0)) or None,
+                             model_threads=MODEL_N_JOBS,
+                             timeout=float(os.environ.get('INFERENCE_TIMEOUT', 30)))
+
+# FLAT_MODELS=1 serves the flat-array exports (python -m serving.trees): memory-mapped rather
+# than unpickled, so every worker process shares one copy, but scoring large batches in NumPy
+# is slower than the native libraries; use it when memory, not CPU, is the limit
+FLAT_MODELS = os.environ.get('FLAT_MODELS', '0') == '1'
+
+def load_model(path):
+    if is_flat(path):
+        return FlatEnsemble.load(path)
+    return set_model_threads(joblib.load(path), MODEL_N_JOBS)
+
+# Models are loaded once per process and shared by all requests
+# (MODEL_MEMORY_MB caps what stays loaded, PRELOAD_MODELS=1 loads every state at startup)
+registry = ModelRegistry('models', memory_budget=int(os.environ.get('MODEL_MEMORY_MB', 2048)) * 1024 ** 2,
+                         loader=load_model, resolve=served_path if FLAT_MODELS else None)
+if os.environ.get('PRELOAD_MODELS') == '1':
+    registry.preload()
+
+# Charts are keyed by their inputs and rendered once, when their URL is first fetched
+charts = ChartCache('chart_cache')
+CHART_KEY = re.compile(r'[0-9a-f]{32}')
+CHART_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# State-wide maps (python -m serving.maps Bihar 2023-06, or a "map" job); the map view
+# on the results page fetches their overview tiles as it needs them
+MAP_ROOT = MAP_DIR
+MAP_PERIOD = re.compile(r'\d{4}-\d{2}')
+MAP_WORKERS = int(os.environ.get('MAP_WORKERS', 0)) or os.cpu_count() or 1  # Most processes one map job may use
+
+# Monte Carlo trajectories per forecast; each model scores all of them in one batch
+SCENARIOS = int(os.environ.get('SCENARIOS', 200))
+MAX_SCENARIOS = 5000
+
+# Every state x horizon x scenario method, precomputed at deploy time (python -m serving.forecasts);
+# /predict answers from it while the state's climatology, models and start year still match
+def forecast_versions(state_title):
+    return {'start_year': datetime.now().year,
+            'climatology': climatology.get(state_title).digest(),
+            'models': registry.file_digests(state_title)}
+
+forecast_store = ForecastStore(os.environ.get('FORECAST_STORE', STORE_PATH), forecast_versions)
+
+# Per-request stage timings: Prometheus text at /metrics and one JSON log line per request
+# (LOG_REQUESTS=0 silences the log; PROFILE_SAMPLE_RATE=0.01 writes a cProfile dump for 1% of
+# requests to PROFILE_DIR, to open with `python -m pstats` or snakeviz)
+request_log = logging.getLogger('soil.requests')
+if not request_log.handlers:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter('%(message)s'))
+    request_log.addHandler(log_handler)
+    request_log.propagate = False
+request_log.setLevel(logging.INFO if os.environ.get('LOG_REQUESTS', '1') != '0' else logging.WARNING)
+profiler = Profiler(float(os.environ.get('PROFILE_SAMPLE_RATE', 0)), os.environ.get('PROFILE_DIR', 'profiles'))
+metrics.describe('requests', "HTTP requests by endpoint and status")
+metrics.describe('request_seconds', "Request latency by endpoint")
+metrics.describe('rows_scored', "Feature rows scored, per model")
+metrics.describe('model_cache', "Model registry lookups by result")
+metrics.describe('climatology_cache', "Climatology lookups by result")
+metrics.describe('chart_cache', "Chart PNG requests by where the image came from")
+metrics.describe('forecast_store', "Forecast store lookups by result")
+
+@metrics.collector
+def cache_gauges():
+    versions = registry.versions()
+    return [
+        ('models_loaded', 'gauge', "Models held by the registry", {}, len(versions['models'])),
+        ('models_loaded_bytes', 'gauge', "On-disk size of the loaded models", {}, versions['bytes_loaded']),
+        ('model_loads_total', 'counter', "Model (re)loads", {}, versions['loads']),
+        ('model_evictions_total', 'counter', "Models evicted from the registry", {}, versions['evictions']),
+        ('climatology_builds_total', 'counter', "Climatologies rebuilt from data", {}, climatology.builds),
+        ('chart_renders_total', 'counter', "Charts rendered", {}, charts.renders),
+    ]
+
+@app.before_request
+def start_request():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.trace, g.trace_token = start_trace(g.request_id)
+    g.started = time.perf_counter()
+    g.profile = profiler.start()
 
-    for year in future_years:
-        for _, row in monthly_avg.iterrows():
-            data_row = row.to_dict()
-            data_row['Year'] = year
-            data_row['Month'] = int(row['Month'])
-            future_data.append(data_row)
+@app.after_request
+def finish_request(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    seconds = time.perf_counter() - g.started
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe('request_seconds', seconds, endpoint=endpoint)
+    metrics.inc('requests', endpoint=endpoint, status=response.status_code)
+    record = {'method': request.method, 'path': request.path, 'endpoint': endpoint,
+              'status': response.status_code, 'duration_ms': round(seconds * 1000, 3), **trace.summary()}
+    if g.profile is not None:
+        record['profile'] = profiler.stop(g.profile, f'{endpoint}-{g.request_id}')
+    response.headers['X-Request-ID'] = g.request_id
+    request_log.info(json.dumps(record))
+    return response
 
-    future_df = pd.DataFrame(future_data)
-    ordered_cols = [col for col in original_df.columns if col != 'sm_surface']
-    future_df = future_df[ordered_cols]
-    return future_df,future_years
+@app.teardown_request
+def end_request(exc):
+    if g.get('trace_token') is not None:
+        end_trace(g.trace_token)
+        g.trace_token = None
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def get_monthly_climatology(state_title):
+    state_climatology = climatology.get(state_title)
+    return state_climatology.columns, state_climatology.monthly_avg
+
+def generate_future_data(monthly_avg, years, columns):
+    future_years = list(range(2025, 2025 + int(years)))
+    future_df = future_frame(monthly_avg, columns, int(years), start_year=future_years[0])
+    return future_df, future_years
 
 def evaluate_model(model, X):
     preds = model.predict(X)
@@ -46,80 +174,49 @@ def compute_metrics(y_pred):
 def home():
     return render_template('index.html')
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    region = request.form['region'].replace(" ", "").lower()
-    years = int(request.form['years'])
-
-    state_title = region.title().replace(" ", "")
-    csv_path = f"Data - {state_title} Done.csv"
-    df, monthly_avg = get_monthly_climatology(csv_path)
-    future_df, future_years = generate_future_data(monthly_avg, years, df)
-    
-
-    model_dir = os.path.join('models', state_title)
-    model_files = {
-        "Random Forest": next((f for f in os.listdir(model_dir) if "Random" in f), None),
-        "XGBoost": next((f for f in os.listdir(model_dir) if "XGB" in f), None),
-        "LightGBM": next((f for f in os.listdir(model_dir) if "LGBM" in f), None),
-        "GBR Model": next((f for f in os.listdir(model_dir) if "GBR" in f), None)
-    }
+def run_forecast(state_title, years, n_scenarios=SCENARIOS, scenario_method='variance'):
+    """Forecast, scenario bands, metrics and chart keys for one state (raises InferenceTimeout)."""
+    with stage('climatology'):
+        state_climatology = climatology.get(state_title)
+    columns, monthly_avg = state_climatology.columns, state_climatology.monthly_avg
+    with stage('scenarios'):
+        future_df, future_years = generate_future_data(monthly_avg, years, columns)
+        scenarios, scenario_columns = draw_scenarios(state_climatology, years, n_scenarios, scenario_method,
+                                                     start_year=future_years[0])
+
+    with stage('models'):
+        models = registry.state_models(state_title)
 
     results = {}
     preds_all = {}
+    bands_all = {}
     r2_list, rmse_list, mae_list = [], [], []
 
-    for model_name, file_name in model_files.items():
-        if file_name:
-            model_path = os.path.join(model_dir, file_name)
-            model = joblib.load(model_path)
-            preds = evaluate_model(model, future_df)
-            preds_all[model_name] = preds
-            r2, rmse, mae = compute_metrics(preds)
-            r2_list.append(r2)
-            rmse_list.append(rmse)
-            mae_list.append(mae)
-            results[model_name] = {
-                'r2': round(r2, 3),
-                'rmse': round(rmse, 3),
-                'mae': round(mae, 3)
-            }
-
-    plt.figure(figsize=(10, 4))
-    for name, preds in preds_all.items():
-        plt.plot(preds[:100], label=name)
-    plt.title(f"Soil Moisture Forecast for {state_title}")
-    plt.xlabel("Sample Index")
-    plt.ylabel("Soil Moisture")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("static/trend_plot.png")
-    plt.close()
-
-    plt.figure(figsize=(6, 4))
-    for name, preds in preds_all.items():
-        plt.plot(preds[:100], label=name)
-    plt.title("Predicted Soil Moisture (No Actual Available)")
-    plt.xlabel("Index")
-    plt.ylabel("Soil Moisture")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("static/actual_vs_pred.png")
-    plt.close()
+    # Point forecast and scenario bands for every model, all models at once
+    def run_model(model):
+        return (evaluate_model(model, future_df),
+                percentile_bands(score_scenarios(model, scenarios, scenario_columns)))
+    outputs = executor.map_models(models, run_model)
+    for model_name in outputs:
+        metrics.inc('rows_scored', len(future_df) + scenarios.shape[0] * scenarios.shape[1], model=model_name)
 
-    selected_model = 'XGBoost'
-    forecast_values = preds_all[selected_model]
+    for model_name, (preds, model_bands) in outputs.items():
+        preds_all[model_name] = preds
+        bands_all[model_name] = model_bands
+        r2, rmse, mae = compute_metrics(preds)
+        r2_list.append(r2)
+        rmse_list.append(rmse)
+        mae_list.append(mae)
+        results[model_name] = {
+            'r2': round(r2, 3),
+            'rmse': round(rmse, 3),
+            'mae': round(mae, 3)
+        }
 
-    # Split forecast values into yearly & monthly predictions
-    forecast_array = np.array(forecast_values).reshape(years, 12)
-    yearly_predictions = forecast_array.mean(axis=1)
-    monthly_predictions = forecast_array.tolist()
-    forecast_years = [datetime.now().year + i + 1 for i in range(years)]
-    month_labels = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    selected_model = 'XGBoost'
     start_year = datetime.now().year
-    total_months = len(forecast_values)
-    forecast_dates = pd.date_range(start=f'{start_year}-01', periods=total_months, freq='M')
+    forecast_values = preds_all[selected_model]
+    forecast_dates = pd.date_range(start=f'{start_year}-01', periods=len(forecast_values), freq='MS')
 
     # Step 1: Prepare monthly labels
     month_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
@@ -127,48 +224,300 @@ def predict():
 
     # Step 2: Break down forecast into monthly/yearly values
     forecast_years = list(range(start_year, start_year + years))
-    forecast_values = preds_all[selected_model]
 
     # Ensure total values = years * 12
     forecast_values = forecast_values[:years * 12]
     monthly_predictions = [forecast_values[i * 12:(i + 1) * 12] for i in range(years)]
-    yearly_predictions = [round(np.mean(month), 3) for month in monthly_predictions]
+    yearly_predictions = [round(float(np.mean(month)), 3) for month in monthly_predictions]
+
+    # P10/P50/P90 of the selected model over the Monte Carlo scenarios
+    bands = bands_all[selected_model]
+    band_low, band_high = bands['p10'][:years * 12], bands['p90'][:years * 12]
+    yearly_bands = [(round(float(band_low[i * 12:(i + 1) * 12].mean()), 3),
+                     round(float(band_high[i * 12:(i + 1) * 12].mean()), 3))
+                    for i in range(years)]
 
     # Step 3: Zip year and monthly values for Jinja2
-    yearly_data = list(zip(forecast_years, yearly_predictions))
-    # Pre-zip month labels with each monthly prediction
+    yearly_data = [(year, value, low, high)
+                   for (year, value), (low, high) in zip(zip(forecast_years, yearly_predictions), yearly_bands)]
+    # Pre-zip month labels with each monthly prediction and its P10-P90 band
     monthly_data = [
-        (year, list(zip(month_labels, monthly)))
-        for year, monthly in zip(forecast_years, monthly_predictions)
+        (year, list(zip(month_labels, monthly.tolist(),
+                        np.round(band_low[i * 12:(i + 1) * 12], 3).tolist(),
+                        np.round(band_high[i * 12:(i + 1) * 12], 3).tolist())))
+        for i, (year, monthly) in enumerate(zip(forecast_years, monthly_predictions))
     ]
 
-    
-    plt.figure(figsize=(10, 5))
-    plt.plot(forecast_dates, forecast_values, marker='o', linestyle='-', color='seagreen')
-    plt.title(f"📆 Soil Moisture Forecast ({forecast_dates[0].year}–{forecast_dates[-1].year})")
-    plt.xlabel("Date")
-    plt.ylabel("Predicted Soil Moisture (%)")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig("static/forecast_trend.png")
-    plt.close()
-    
-
-    return render_template('result.html',
-                           years=years,
-                           r2=max(r2_list),
-                           rmse=min(rmse_list),
-                           mae=min(mae_list),
-                           prediction=round(np.median(forecast_values), 5),
-                           rf_r2=results['Random Forest']['r2'], rf_rmse=results['Random Forest']['rmse'], rf_mae=results['Random Forest']['mae'],
-                           xgb_r2=results['XGBoost']['r2'], xgb_rmse=results['XGBoost']['rmse'], xgb_mae=results['XGBoost']['mae'],
-                           lgbm_r2=results['LightGBM']['r2'], lgbm_rmse=results['LightGBM']['rmse'], lgbm_mae=results['LightGBM']['mae'],
-                           hybrid_r2=results['GBR Model']['r2'], hybrid_rmse=results['GBR Model']['rmse'], hybrid_mae=results['GBR Model']['mae'],
-                           forecast_years=forecast_years,
-                            yearly_data=yearly_data,
-                            monthly_data=monthly_data,
-                            month_labels=month_labels,)
+    # Chart inputs: same state, horizon, scenarios, data and model versions -> same charts
+    chart_inputs = {
+        'state': state_title, 'years': years, 'start_year': start_year,
+        'scenarios': n_scenarios, 'scenario_method': scenario_method,
+        'data': state_climatology.fingerprint,
+        'models': {name: entry.sha256 for name, entry in models.items()},
+    }
+    model_series = {'state': state_title, 'models': {name: preds[:100].tolist() for name, preds in preds_all.items()}}
+    forecast_series = {
+        'dates': [date.strftime('%Y-%m-%d') for date in forecast_dates],
+        'forecast': np.asarray(forecast_values).tolist(),
+        'p10': band_low.tolist(), 'p50': bands['p50'][:years * 12].tolist(), 'p90': band_high.tolist(),
+    }
+    chart_keys = {
+        kind: charts.register(kind, series, **chart_inputs)
+        for kind, series in (('trend', model_series), ('actual_vs_pred', model_series),
+                             ('forecast', forecast_series))
+    }
+
+    return {
+        'state': state_title,
+        'years': years,
+        'scenarios': n_scenarios,
+        'scenario_method': scenario_method,
+        'selected_model': selected_model,
+        'r2': float(max(r2_list)),
+        'rmse': float(min(rmse_list)),
+        'mae': float(min(mae_list)),
+        'prediction': round(float(np.median(forecast_values)), 5),
+        'metrics': results,
+        'forecast_years': forecast_years,
+        'yearly_data': yearly_data,
+        'monthly_data': monthly_data,
+        'month_labels': month_labels,
+        'series': forecast_series,
+        'chart_keys': chart_keys,
+    }
+
+def get_forecast(state_title, years, n_scenarios=SCENARIOS, scenario_method='variance'):
+    # The stored forecast when it is current, otherwise computed live
+    with stage('forecast_store'):
+        forecast = forecast_store.get(state_title, years, n_scenarios, scenario_method)
+    if forecast is None:
+        return run_forecast(state_title, years, n_scenarios, scenario_method)
+    for key, chart in forecast.pop('charts').items():
+        charts.restore(key, chart)
+    return forecast
+
+def forecast_params(form):
+    # Region/years/scenario settings from the form or a job's JSON params; ValueError when invalid
+    try:
+        state_title = form['region'].replace(" ", "").lower().title().replace(" ", "")
+        years = int(form['years'])
+        n_scenarios = int(form.get('scenarios', SCENARIOS))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise ValueError("region, years and scenarios are required; years and scenarios are whole numbers")
+    if years < 1:
+        raise ValueError("years must be at least 1")
+    if not 1 <= n_scenarios <= MAX_SCENARIOS:
+        raise ValueError(f"scenarios must be between 1 and {MAX_SCENARIOS}")
+    scenario_method = form.get('scenario_method', 'variance')
+    if scenario_method not in SCENARIO_METHODS:
+        scenario_method = 'variance'
+    return state_title, years, n_scenarios, scenario_method
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    try:
+        params = forecast_params(request.form)
+    except ValueError as e:
+        return str(e), 400
+    try:
+        forecast = get_forecast(*params)
+    except InferenceTimeout as e:
+        return str(e), 504
+
+    results = forecast['metrics']
+    chart_urls = {kind: url_for('chart_png', key=key) for kind, key in forecast['chart_keys'].items()}
+    with stage('template'):
+        return render_template('result.html',
+                               years=forecast['years'],
+                               r2=forecast['r2'],
+                               rmse=forecast['rmse'],
+                               mae=forecast['mae'],
+                               prediction=forecast['prediction'],
+                               rf_r2=results['Random Forest']['r2'], rf_rmse=results['Random Forest']['rmse'], rf_mae=results['Random Forest']['mae'],
+                               xgb_r2=results['XGBoost']['r2'], xgb_rmse=results['XGBoost']['rmse'], xgb_mae=results['XGBoost']['mae'],
+                               lgbm_r2=results['LightGBM']['r2'], lgbm_rmse=results['LightGBM']['rmse'], lgbm_mae=results['LightGBM']['mae'],
+                               hybrid_r2=results['GBR Model']['r2'], hybrid_rmse=results['GBR Model']['rmse'], hybrid_mae=results['GBR Model']['mae'],
+                               forecast_years=forecast['forecast_years'],
+                               chart_urls=chart_urls,
+                               scenarios=forecast['scenarios'],
+                               scenario_method=forecast['scenario_method'],
+                                yearly_data=forecast['yearly_data'],
+                                monthly_data=forecast['monthly_data'],
+                                month_labels=forecast['month_labels'],
+                                map_state=forecast['state'],
+                                map_periods=available(MAP_ROOT, forecast['state']),)
+
+def _cached_response(response, key):
+    response.headers['Cache-Control'] = CHART_CACHE_CONTROL
+    response.set_etag(key)
+    return response.make_conditional(request)
+
+@app.route('/charts/<key>.png')
+def chart_png(key):
+    png = charts.png(key) if CHART_KEY.fullmatch(key) else None
+    if png is None:
+        abort(404)
+    return _cached_response(Response(png, mimetype='image/png'), key)
+
+@app.route('/charts/<key>.json')
+def chart_json(key):
+    # Series behind a chart, for client-side rendering
+    chart = charts.series(key) if CHART_KEY.fullmatch(key) else None
+    if chart is None:
+        abort(404)
+    return _cached_response(jsonify(chart), key)
+
+def _map_state(state):
+    # Only states with models have maps; also keeps the path inside MAP_ROOT
+    state = batch.state_key(state)
+    if state not in registry.states():
+        abort(404)
+    return state
+
+@app.route('/maps/<state>')
+def map_periods(state):
+    state = _map_state(state)
+    return jsonify({'state': state, 'periods': available(MAP_ROOT, state)})
+
+@app.route('/maps/<state>/<period>')
+def map_meta(state, period):
+    state = _map_state(state)
+    meta = read_meta(MAP_ROOT, state, period) if MAP_PERIOD.fullmatch(period) else None
+    if meta is None:
+        abort(404)
+    meta['tile_url'] = url_for('map_meta', state=state, period=period) + '/tiles/{z}/{x}_{y}.png'
+    return jsonify(meta)
+
+@app.route('/maps/<state>/<period>/tiles/<int:z>/<int:x>_<int:y>.png')
+def map_tile(state, period, z, x, y):
+    state = _map_state(state)
+    path = tile_path(MAP_ROOT, state, period, z, x, y) if MAP_PERIOD.fullmatch(period) else None
+    if path is None or not os.path.exists(path):
+        abort(404)  # Outside the map, or a tile with no pixels
+    return send_file(os.path.abspath(path), mimetype='image/png', max_age=3600)
+
+def json_batch_frames(body, models=None):
+    # Result frames for a JSON batch body (regions forecast or raw feature rows)
+    if not isinstance(body, dict):
+        raise batch.BatchError('JSON input must be an object: {"state": ..., "rows": [...]} or {"regions": [...]}')
+    names = batch.model_names(body.get('models') or models)
+    if 'regions' in body:
+        years = int(body.get('years', 1))
+        if not 1 <= years <= 10:
+            raise batch.BatchError("years must be between 1 and 10")
+        regions = body['regions']
+        if not isinstance(regions, list) or not all(isinstance(region, str) for region in regions):
+            raise batch.BatchError('"regions" must be a list of state names')
+        return batch.forecast_chunks(climatology, registry, regions, years, names, executor=executor)
+    if not isinstance(body.get('state'), str):
+        raise batch.BatchError('"state" must be a state name')
+    rows = body.get('rows')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise batch.BatchError('"rows" must be a list of objects: [{feature: value, ...}, ...]')
+    models = batch.select_models(registry, batch.state_key(body['state']), names)
+    return batch.score_chunks(models, batch.row_chunks(rows), executor=executor)
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Batch scoring, streamed back as NDJSON (default) or CSV (?format=csv).
+
+    - CSV body or 'file' upload of raw feature rows, with ?state=Bihar
+    - JSON {"state": ..., "rows": [{feature: value, ...}, ...]}
+    - JSON {"regions": ["Bihar", ...], "years": 3} for per-month forecasts
+    Optional ?models=rf,xgb (or "models" in the JSON) picks the models.
+    """
+    output = request.args.get('format', 'csv' if 'text/csv' in request.headers.get('Accept', '') else 'ndjson')
+    try:
+        if request.is_json:
+            frames = json_batch_frames(request.get_json(silent=True), request.args.get('models'))
+        else:
+            state = request.args.get('state') or request.form.get('state')
+            if not state:
+                raise batch.BatchError("CSV input needs ?state=<State>")
+            names = batch.model_names(request.args.get('models') or request.form.get('models'))
+            models = batch.select_models(registry, batch.state_key(state), names)
+            stream = batch.spooled_copy(request.files['file'].stream) if 'file' in request.files else request.stream
+            frames = batch.score_chunks(models, batch.csv_chunks(stream), executor=executor)
+        # Score the first chunk before streaming so bad input is still a 400
+        first = next(frames, None)
+    except InferenceTimeout as e:
+        return jsonify({'error': str(e)}), 504
+    except (batch.BatchError, KeyError, ValueError, FileNotFoundError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    frames = itertools.chain([first] if first is not None else [], frames)
+    if output == 'csv':
+        return Response(stream_with_context(batch.csv_lines(frames)), mimetype='text/csv')
+    return Response(stream_with_context(batch.ndjson_lines(frames)), mimetype='application/x-ndjson')
+
+# Long forecasts and bulk scoring run in the background: POST /jobs returns an ID at once
+def forecast_job(params, path):
+    forecast = get_forecast(*forecast_params(params))
+    with app.test_request_context():
+        forecast['charts'] = {kind: url_for('chart_png', key=key) for kind, key in forecast['chart_keys'].items()}
+    with open(path, 'w') as f:
+        json.dump(forecast, f)
+    return 'application/json'
+
+def batch_job(params, path):
+    frames = json_batch_frames(params)
+    lines = batch.csv_lines(frames) if params.get('format') == 'csv' else batch.ndjson_lines(frames)
+    with open(path, 'w') as f:
+        f.writelines(lines)
+    return 'text/csv' if params.get('format') == 'csv' else 'application/x-ndjson'
+
+def map_job(params, path):
+    year, month = parse_period(params['period'])
+    workers = min(max(int(params.get('workers') or MAP_WORKERS), 1), MAP_WORKERS)
+    meta = build_map(batch.state_key(params['region']), year, month, 'models', DATA_STORE, MAP_ROOT,
+                     workers, flat=FLAT_MODELS)
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+    return 'application/json'
+
+# Shared by every worker process through jobs/jobs.sqlite; a process only starts its job
+# threads when it first handles a /jobs request, so importing the app starts nothing
+jobs = JobQueue({'forecast': forecast_job, 'batch': batch_job, 'map': map_job}, root='jobs',
+                workers=int(os.environ.get('JOB_WORKERS', 2)))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """{"kind": "forecast", "params": {"region": "bihar", "years": 10}},
+    {"kind": "batch", "params": <batch JSON body, optional "format": "csv">} or
+    {"kind": "map", "params": {"region": "bihar", "period": "2023-06"}}."""
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    params = body.get('params') or {}
+    try:
+        # Forecast settings are checked now, so a bad request fails here rather than in a worker
+        if body.get('kind') == 'forecast':
+            forecast_params(params)
+        job_id = jobs.submit(body.get('kind'), params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'id': job_id, 'status': 'queued',
+                    'status_url': url_for('job_status', job_id=job_id),
+                    'result_url': url_for('job_result', job_id=job_id)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    if job['status'] != 'done':
+        return jsonify({'id': job_id, 'status': job['status'], 'error': job['error']}), 409
+    return send_file(os.path.abspath(job['result_path']), mimetype=job['content_type'])
+
+@app.route('/models')
+def model_versions():
+    return jsonify(registry.versions())
 
 if __name__ == '__main__':
     app.run(debug=True)
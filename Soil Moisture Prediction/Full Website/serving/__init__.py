@@ -0,0 +1 @@
+"""Model loading and forecast helpers for the Flask app."""
@@ -0,0 +1,131 @@
+import io
+import json
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from serving.metrics import metrics
+from serving.registry import MODEL_PATTERNS
+from serving.scenarios import feature_columns, future_frame
+
+# Short names accepted in ?models=rf,xgb
+MODEL_ALIASES = {'rf': "Random Forest", 'xgb': "XGBoost", 'lgbm': "LightGBM", 'gbr': "GBR Model"}
+
+# Feature order of the training tables (static/results.csv without the prediction)
+FEATURE_COLUMNS = ['S2_B4', 'S2_B5', 'S2_B6', 'S2_B7', 'S2_B8', 'L8_B4', 'L8_B5', 'L8_B6', 'L8_B7', 'Year', 'Month']
+
+CHUNK_ROWS = 5000
+
+
+class BatchError(ValueError):
+    pass
+
+
+def state_key(region):
+    # Same normalisation as the form: "Uttar Pradesh" / "uttarpradesh" -> "Uttarpradesh"
+    return region.replace(" ", "").lower().title()
+
+
+def model_names(requested=None):
+    """Display names for a list/comma string of model names or aliases (default: all four)."""
+    if not requested:
+        return list(MODEL_PATTERNS)
+    if isinstance(requested, str):
+        requested = [name.strip() for name in requested.split(',') if name.strip()]
+    names = []
+    for name in requested:
+        name = MODEL_ALIASES.get(name.lower(), name)
+        if name not in MODEL_PATTERNS:
+            raise BatchError(f"Unknown model {name!r}; choose from {list(MODEL_ALIASES)} or {list(MODEL_PATTERNS)}")
+        names.append(name)
+    return names
+
+
+def select_models(registry, state, names):
+    models = OrderedDict()
+    available = registry.model_files(state)
+    for name in names:
+        if name not in available:
+            raise BatchError(f"No {name} model for {state}")
+        models[name] = registry.get(state, name, available[name])
+    return models
+
+
+def _feature_order(model, columns):
+    names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else columns
+
+
+def _predict(models, X, columns, executor=None):
+    # {name: predictions}, on the shared inference pool when one is given
+    def predict(model):
+        return model.predict(X[_feature_order(model, columns)])
+    if executor is not None:
+        preds = executor.map_models(models, predict)
+    else:
+        preds = OrderedDict((name, predict(entry.model)) for name, entry in models.items())
+    for name in preds:
+        metrics.inc('rows_scored', len(X), model=name)
+    return preds
+
+
+def score_chunks(models, chunks, columns=FEATURE_COLUMNS, executor=None):
+    """Score DataFrame chunks of raw feature rows; yields one result frame per chunk."""
+    offset = 0
+    for chunk in chunks:
+        missing = [col for col in columns if col not in chunk.columns]
+        if missing:
+            raise BatchError(f"Missing feature columns {missing}")
+        out = OrderedDict([('row', np.arange(offset, offset + len(chunk)))])
+        out.update(_predict(models, chunk, columns, executor))
+        offset += len(chunk)
+        yield pd.DataFrame(out)
+
+
+def row_chunks(rows, chunk_rows=CHUNK_ROWS):
+    # JSON rows (list of objects) in fixed-size DataFrame chunks
+    for start in range(0, len(rows), chunk_rows):
+        yield pd.DataFrame(rows[start:start + chunk_rows])
+
+
+def spooled_copy(stream, max_size=8 * 1024 ** 2):
+    # Uploaded files are closed with the request; keep our own copy (on disk past max_size)
+    copy = tempfile.SpooledTemporaryFile(max_size=max_size)
+    shutil.copyfileobj(stream, copy)
+    copy.seek(0)
+    return copy
+
+
+def csv_chunks(stream, chunk_rows=CHUNK_ROWS):
+    # Reads the uploaded CSV incrementally, chunk_rows at a time
+    return pd.read_csv(io.TextIOWrapper(stream, encoding='utf-8'), chunksize=chunk_rows)
+
+
+def forecast_chunks(climatology, registry, regions, years, names, start_year=2025, executor=None):
+    """Point forecasts (one frame per state) for every month of the next `years` years."""
+    for region in regions:
+        state = state_key(region)
+        models = select_models(registry, state, names)
+        state_climatology = climatology.get(state)
+        future_df = future_frame(state_climatology.monthly_avg, state_climatology.columns, years, start_year)
+        columns = feature_columns(state_climatology.columns)
+        out = OrderedDict([('state', state), ('Year', future_df['Year'].to_numpy()),
+                           ('Month', future_df['Month'].to_numpy())])
+        out.update(_predict(models, future_df, columns, executor))
+        yield pd.DataFrame(out)
+
+
+def ndjson_lines(frames):
+    for frame in frames:
+        records = frame.to_dict('records')
+        yield ''.join(json.dumps(record, default=lambda value: value.item()) + '\n' for record in records)
+
+
+def csv_lines(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header)
+        header = False
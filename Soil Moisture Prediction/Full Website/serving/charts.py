@@ -0,0 +1,154 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib
+
+matplotlib.use('Agg')
+from matplotlib.figure import Figure  # noqa: E402  (no pyplot: figures are per call, not global)
+
+from serving.metrics import metrics, stage  # noqa: E402
+
+
+def chart_key(kind, **inputs):
+    """Content address of a chart: same kind and inputs, same key (and URL)."""
+    payload = json.dumps({'kind': kind, **inputs}, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def _model_lines(ax, series):
+    for name, values in series['models'].items():
+        ax.plot(values, label=name)
+    ax.legend()
+
+
+def render_trend(series):
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    _model_lines(ax, series)
+    ax.set_title(f"Soil Moisture Forecast for {series['state']}")
+    ax.set_xlabel("Sample Index")
+    ax.set_ylabel("Soil Moisture")
+    return fig
+
+
+def render_actual_vs_pred(series):
+    fig = Figure(figsize=(6, 4))
+    ax = fig.subplots()
+    _model_lines(ax, series)
+    ax.set_title("Predicted Soil Moisture (No Actual Available)")
+    ax.set_xlabel("Index")
+    ax.set_ylabel("Soil Moisture")
+    return fig
+
+
+def render_forecast(series):
+    import pandas as pd
+
+    dates = pd.to_datetime(series['dates'])
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.fill_between(dates, series['p10'], series['p90'], color='seagreen', alpha=0.2, label='P10–P90')
+    ax.plot(dates, series['p50'], linestyle='--', color='darkgreen', label='P50')
+    ax.plot(dates, series['forecast'], marker='o', linestyle='-', color='seagreen', label='Forecast')
+    ax.legend()
+    ax.set_title(f"📆 Soil Moisture Forecast ({dates[0].year}–{dates[-1].year})")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Predicted Soil Moisture (%)")
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    return fig
+
+
+RENDERERS = {
+    'trend': render_trend,
+    'actual_vs_pred': render_actual_vs_pred,
+    'forecast': render_forecast,
+}
+
+
+class ChartCache:
+    """Chart series and rendered PNGs, content-addressed under root/<kk>/<key>.*
+
+    register() only records the series (cheap, on the request path); the PNG
+    is rendered the first time its URL is fetched and then served from memory
+    or disk, so identical inputs are never rendered twice and concurrent
+    requests never share an output file.
+    """
+
+    def __init__(self, root='chart_cache', memory_items=256):
+        self.root = root
+        self.memory_items = memory_items
+        self._pngs = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self.renders = 0
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], f'{key}.{ext}')
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def register(self, kind, series, **inputs):
+        # Returns the key; the series file is written once per distinct input
+        key = chart_key(kind, **inputs)
+        self.restore(key, {'kind': kind, 'series': series})
+        return key
+
+    def restore(self, key, chart):
+        # A chart registered elsewhere (e.g. saved in the forecast store), under its original key
+        path = self._path(key, 'json')
+        if not os.path.exists(path):
+            self._write(path, json.dumps(chart).encode())
+
+    def series(self, key):
+        path = self._path(key, 'json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._pngs[key] = png
+            self._pngs.move_to_end(key)
+            while len(self._pngs) > self.memory_items:
+                self._pngs.popitem(last=False)
+
+    def png(self, key):
+        """PNG bytes for a registered chart, rendering it on first use; None if unknown."""
+        with self._lock:
+            png = self._pngs.get(key)
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+        if png is not None:
+            metrics.inc('chart_cache', result='memory')
+            return png
+        with render_lock:
+            path = self._path(key, 'png')
+            if os.path.exists(path):
+                metrics.inc('chart_cache', result='disk')
+                with open(path, 'rb') as f:
+                    png = f.read()
+            else:
+                chart = self.series(key)
+                if chart is None:
+                    return None
+                metrics.inc('chart_cache', result='render')
+                buffer = io.BytesIO()
+                with stage('chart_render', kind=chart['kind']):
+                    fig = RENDERERS[chart['kind']](chart['series'])
+                    fig.tight_layout()
+                    fig.savefig(buffer, format='png')
+                png = buffer.getvalue()
+                self._write(path, png)
+                self.renders += 1
+            self._remember(key, png)
+            return png
@@ -0,0 +1,335 @@
+"""Per-state monthly climatology, built once per data version.
+
+Build every state's artifact at deploy time (run from "Full Website"):
+
+    python -m serving.climatology                 # all states in extraction/config.json
+    python -m serving.climatology Bihar Gujarat
+
+The data is streamed in blocks of --block-rows rows (float32 bands, int16
+Year/Month) and the monthly statistics are accumulated block by block, so
+memory stays bounded however many rows a state has.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from extraction.cli import data_store_path
+from extraction.store import INT_COLUMNS, iter_partitions, list_partitions, read_partitions
+from serving.metrics import metrics, stage
+
+TARGET = 'sm_surface'
+ARTIFACT_FORMAT = 2  # Bump when the artifact gains fields; older artifacts are rebuilt
+BLOCK_ROWS = 500_000  # Rows per block when streaming a state's data
+DATA_STORE = data_store_path()  # Where `python -m extraction` writes (extraction/config.json or $DATA_STORE)
+
+
+def data_csv(state):
+    return f"Data - {state} Done.csv"
+
+
+def load_state_data(state, data_store=DATA_STORE, columns=None):
+    # Partitioned store when the state has been imported/extracted, else the CSV
+    if list_partitions(data_store, 'training', states=[state]):
+        return read_partitions(data_store, 'training', states=[state], columns=columns)
+    return pd.read_csv(data_csv(state), usecols=columns)
+
+
+def compact_dtypes(path):
+    # float32 for numeric CSV columns and int16 for Year/Month, judged from the first rows
+    sample = pd.read_csv(path, nrows=1000)
+    return {col: np.int16 if col in INT_COLUMNS else np.float32
+            for col in sample.columns if pd.api.types.is_numeric_dtype(sample[col])}
+
+
+def iter_state_data(state, data_store=DATA_STORE, block_rows=BLOCK_ROWS, columns=None):
+    """load_state_data() as a stream of compact frames of at most block_rows rows."""
+    if list_partitions(data_store, 'training', states=[state]):
+        yield from iter_partitions(data_store, 'training', states=[state], columns=columns, block_rows=block_rows)
+        return
+    path = data_csv(state)
+    with pd.read_csv(path, usecols=columns, dtype=compact_dtypes(path), chunksize=block_rows) as reader:
+        yield from reader
+
+
+def source_fingerprint(state, data_store=DATA_STORE):
+    """Identifies the current version of a state's data from file stats alone."""
+    partitions = list_partitions(data_store, 'training', states=[state])
+    if partitions:
+        digest = hashlib.sha256()
+        for _, _, _, path in partitions:
+            stat = os.stat(path)
+            digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}\n'.encode())
+        return {'source': os.path.join(data_store, 'training'), 'version': digest.hexdigest()}
+    path = data_csv(state)
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return {'source': path, 'version': f'{stat.st_mtime_ns}:{stat.st_size}'}
+    return None
+
+
+class MonthlyStats:
+    """Per-month band mean and standard deviation, and per-(year, month) band means,
+    accumulated one block at a time.
+
+    State is 12 x bands per statistic (plus 12 x bands per year), whatever the
+    number of rows. Blocks are merged with the pairwise mean/variance update
+    in float64, so the results match a groupby over the whole table. NaNs are
+    skipped per band, as groupby does.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.rows = 0
+
+    def _start(self, columns):
+        self.columns = list(columns)
+        self.bands = [col for col in self.columns if col not in (TARGET, 'Year', 'Month')]
+        shape = (12, len(self.bands))
+        self.month_rows = np.zeros(12, dtype=np.int64)
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.year_sum = {}    # year -> 12 x bands
+        self.year_count = {}
+
+    def update(self, block):
+        if self.columns is None:
+            self._start(block.columns)
+        if block.empty:
+            return self
+        nbands = len(self.bands)
+        month = block['Month'].to_numpy().astype(np.intp) - 1
+        values = block[self.bands].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+        # One bincount per statistic over (month, band) cells
+        cells = (month[:, None] * nbands + np.arange(nbands)).ravel()
+        size = 12 * nbands
+        count = np.bincount(cells, weights=valid.ravel(), minlength=size).reshape(12, nbands)
+        total = np.bincount(cells, weights=values.ravel(), minlength=size).reshape(12, nbands)
+        mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+        deviation = np.where(valid, values - mean[month], 0.0)
+        m2 = np.bincount(cells, weights=(deviation ** 2).ravel(), minlength=size).reshape(12, nbands)
+
+        merged = self.count + count
+        delta = mean - self.mean
+        share = np.divide(count, merged, out=np.zeros_like(merged), where=merged > 0)
+        self.mean += delta * share
+        self.m2 += m2 + delta ** 2 * self.count * share
+        self.count = merged
+        self.month_rows += np.bincount(month, minlength=12)
+
+        years, year_index = np.unique(block['Year'].to_numpy(), return_inverse=True)
+        cells = ((year_index * 12 + month)[:, None] * nbands + np.arange(nbands)).ravel()
+        size = len(years) * 12 * nbands
+        count = np.bincount(cells, weights=valid.ravel(), minlength=size).reshape(len(years), 12, nbands)
+        total = np.bincount(cells, weights=values.ravel(), minlength=size).reshape(len(years), 12, nbands)
+        for i, year in enumerate(int(year) for year in years):
+            if year not in self.year_sum:
+                self.year_sum[year] = np.zeros((12, nbands))
+                self.year_count[year] = np.zeros((12, nbands))
+            self.year_sum[year] += total[i]
+            self.year_count[year] += count[i]
+        self.rows += len(block)
+        return self
+
+    def _months(self):
+        return np.flatnonzero(self.month_rows)
+
+    def monthly_avg(self):
+        # Mean of every feature per calendar month; the target and Year are dropped
+        months = self._months()
+        mean = np.where(self.count > 0, self.mean, np.nan)[months]
+        monthly_avg = pd.DataFrame({'Month': (months + 1).astype(np.int64),
+                                    **{band: mean[:, j] for j, band in enumerate(self.bands)}})
+        return monthly_avg[monthly_avg.columns.difference([TARGET, 'Year'])]
+
+    def monthly_std(self):
+        # Standard deviation of every band per calendar month (scenario perturbations)
+        months = self._months()
+        std = np.sqrt(np.divide(self.m2, self.count, out=np.zeros_like(self.m2), where=self.count > 0))[months]
+        return pd.DataFrame({'Month': (months + 1).astype(np.int64),
+                             **{band: std[:, j] for j, band in enumerate(self.bands)}})
+
+    def year_blocks(self):
+        """Band means per (year, month) as a years x 12 x bands grid, NaN where a month is missing."""
+        years = sorted(self.year_sum)
+        values = np.stack([np.divide(self.year_sum[year], self.year_count[year],
+                                     out=np.full((12, len(self.bands)), np.nan), where=self.year_count[year] > 0)
+                           for year in years]) if years else np.zeros((0, 12, len(self.bands)))
+        return {'years': years, 'bands': self.bands, 'values': values.tolist()}
+
+
+def _frame_json(df):
+    return {'columns': list(df.columns), 'values': df.to_dict('list')}
+
+
+def _frame_from_json(data):
+    return pd.DataFrame(data['values'])[data['columns']]
+
+
+class Climatology:
+    def __init__(self, state, columns, monthly_avg, fingerprint, monthly_std=None, blocks=None):
+        self.state = state
+        self.columns = columns  # Column order of the source table (model feature order + target)
+        self.monthly_avg = monthly_avg
+        self.monthly_std = monthly_std
+        self.blocks = blocks  # MonthlyStats.year_blocks() of the source, for block-bootstrap scenarios
+        self.fingerprint = fingerprint
+        self.checked = time.monotonic()
+        self._digest = None
+
+    @classmethod
+    def from_stats(cls, state, stats, fingerprint):
+        return cls(state, stats.columns, stats.monthly_avg(), fingerprint, stats.monthly_std(), stats.year_blocks())
+
+    @classmethod
+    def from_data(cls, state, df, fingerprint):
+        return cls.from_stats(state, MonthlyStats().update(df), fingerprint)
+
+    def digest(self):
+        # Content hash of what forecasts are computed from (unlike the fingerprint, not file stats)
+        if self._digest is None:
+            data = self.to_json()
+            data.pop('fingerprint')
+            self._digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        return self._digest
+
+    def to_json(self):
+        return {
+            'format': ARTIFACT_FORMAT,
+            'state': self.state,
+            'fingerprint': self.fingerprint,
+            'columns': self.columns,
+            'monthly_avg': _frame_json(self.monthly_avg),
+            'monthly_std': _frame_json(self.monthly_std),
+            'blocks': self.blocks,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('format') != ARTIFACT_FORMAT:
+            return None
+        return cls(data['state'], data['columns'], _frame_from_json(data['monthly_avg']), data['fingerprint'],
+                   _frame_from_json(data['monthly_std']), data['blocks'])
+
+
+class ClimatologyStore:
+    """Climatology artifacts in artifact_dir/<State>.json, cached in memory.
+
+    A request only stats the source files (at most every check_interval
+    seconds); the artifact is rebuilt when the data's fingerprint changes.
+    If the source data is not deployed at all, the artifact is used as is.
+    """
+
+    def __init__(self, data_store=DATA_STORE, artifact_dir='climatology', check_interval=2.0,
+                 block_rows=BLOCK_ROWS):
+        self.data_store = data_store
+        self.block_rows = block_rows
+        self.artifact_dir = artifact_dir
+        self.check_interval = check_interval
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.builds = 0
+
+    def _artifact_path(self, state):
+        return os.path.join(self.artifact_dir, f'{state}.json')
+
+    def _read_artifact(self, state):
+        path = self._artifact_path(state)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            climatology = Climatology.from_json(json.load(f))
+        if climatology is None:
+            return None  # Older artifact format
+        climatology.checked = float('-inf')  # Validate against the data before first use
+        return climatology
+
+    def _write_artifact(self, climatology):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        path = self._artifact_path(climatology.state)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(climatology.to_json(), f)
+        os.replace(tmp_path, path)
+
+    def build(self, state):
+        """Recompute a state's climatology from its data and save the artifact."""
+        fingerprint = source_fingerprint(state, self.data_store)
+        if fingerprint is None:
+            raise FileNotFoundError(f"No training data for {state} in {self.data_store} or {data_csv(state)}")
+        with stage('climatology_build', state=state):
+            stats = MonthlyStats()
+            for block in iter_state_data(state, self.data_store, self.block_rows):
+                stats.update(block)
+            climatology = Climatology.from_stats(state, stats, fingerprint)
+        print(f"📊 Climatology for {state} built from {fingerprint['source']}")
+        self._write_artifact(climatology)
+        self.builds += 1
+        return climatology
+
+    def _current(self, state, climatology):
+        if climatology is None:
+            return False
+        if time.monotonic() - climatology.checked < self.check_interval:
+            return True
+        fingerprint = source_fingerprint(state, self.data_store)
+        if fingerprint is not None and fingerprint != climatology.fingerprint:
+            return False
+        climatology.checked = time.monotonic()
+        return True
+
+    def get(self, state):
+        with self._lock:
+            climatology = self._cache.get(state)
+            build_lock = self._build_locks.setdefault(state, threading.Lock())
+        if self._current(state, climatology):
+            metrics.inc('climatology_cache', result='hit')
+            return climatology
+
+        metrics.inc('climatology_cache', result='miss')
+        with build_lock:
+            climatology = self._cache.get(state)
+            if self._current(state, climatology):
+                return climatology
+            climatology = self._read_artifact(state)
+            if not self._current(state, climatology):
+                climatology = self.build(state)
+            with self._lock:
+                self._cache[state] = climatology
+            return climatology
+
+
+def build_all(states, data_store=DATA_STORE, artifact_dir='climatology', block_rows=BLOCK_ROWS):
+    store = ClimatologyStore(data_store, artifact_dir, block_rows=block_rows)
+    built = []
+    for state in states:
+        if source_fingerprint(state, data_store) is None:
+            print(f"⚠ No training data for {state}, skipped.")
+            continue
+        climatology = store.build(state)
+        built.append(state)
+        print(f"✅ {state}: {len(climatology.monthly_avg)} months -> {store._artifact_path(state)}")
+    return built
+
+
+if __name__ == '__main__':
+    from extraction.cli import load_config
+
+    parser = argparse.ArgumentParser(description="Build per-state climatology artifacts for the web app")
+    parser.add_argument('states', nargs='*', help="default: every state in extraction/config.json")
+    parser.add_argument('--data-store', default=DATA_STORE)
+    parser.add_argument('--out', default='climatology')
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS, help="rows read per block")
+    args = parser.parse_args()
+    build_all(args.states or list(load_config()['states']), args.data_store, args.out, args.block_rows)
@@ -0,0 +1,215 @@
+"""Precomputed /predict answers: every state x horizon x scenario method, built at deploy time.
+
+Forecasts are deterministic given the climatology, the models and the
+start year, so all of them are computed once (run from "Full Website",
+after the models and climatology artifacts are in place):
+
+    python -m serving.forecasts                   # every state with models and data, 1-10 years
+    python -m serving.forecasts Bihar --years 1-5
+
+The store is one file: a JSON header (index of record offsets plus the
+climatology/model versions each state was built from) followed by one
+compressed JSON record per (state, years, scenarios, method) holding the
+full forecast: per-model metrics, yearly/monthly aggregates, bands and the
+chart series. The app memory-maps it; a lookup is a dict probe and one
+slice. A state whose climatology, models or start year no longer match
+is served live until the store is rebuilt.
+"""
+import argparse
+import datetime
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from serving.climatology import source_fingerprint
+from serving.metrics import metrics
+
+STORE_PATH = 'forecasts.store'
+MAGIC = b'FCSTORE1'
+FORMAT = 1
+HORIZONS = range(1, 11)  # The years offered in index.html
+
+
+def record_key(state, years, n_scenarios, method):
+    return f'{state}/{int(years)}/{int(n_scenarios)}/{method}'
+
+
+def write_store(path, records, versions, meta):
+    """Write {key: forecast} and {state: versions} as one store file, replaced atomically."""
+    index = {}
+    blobs = []
+    offset = 0
+    for key, forecast in records.items():
+        blob = zlib.compress(json.dumps(forecast).encode(), 6)
+        index[key] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({'format': FORMAT, **meta, 'versions': versions, 'index': index}).encode()
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return offset + len(header) + len(MAGIC) + 8
+
+
+class _StoreFile:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a forecast store")
+        (length,) = struct.unpack_from('<Q', self.buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self.buffer[start:start + length])
+        if header.get('format') != FORMAT:
+            raise ValueError(f"{path} has store format {header.get('format')}, expected {FORMAT}")
+        self.data_start = start + length
+        self.index = header.pop('index')
+        self.versions = header.pop('versions')
+        self.meta = header
+
+    def read(self, key):
+        span = self.index.get(key)
+        if span is None:
+            return None
+        offset, length = span
+        start = self.data_start + offset
+        return json.loads(zlib.decompress(self.buffer[start:start + length]))
+
+
+class ForecastStore:
+    """Read side of the store, shared by every request.
+
+    versions(state) returns the state's current {'start_year', 'climatology',
+    'models'}; it is compared with what the store was built from at most
+    every check_interval seconds per state, and the file itself is reopened
+    when a rebuild replaces it.
+    """
+
+    def __init__(self, path=STORE_PATH, versions=None, check_interval=2.0):
+        self.path = path
+        self.versions = versions
+        self.check_interval = check_interval
+        self._file = None
+        self._file_checked = float('-inf')
+        self._fresh = {}  # state -> (store stamp, fresh?, checked at)
+        self._lock = threading.Lock()
+
+    def _current_file(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._file_checked < self.check_interval:
+                return self._file
+            self._file_checked = now
+            current = self._file
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        else:
+            if current is None or current.stamp != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                try:
+                    current = _StoreFile(self.path)
+                except (OSError, ValueError) as e:
+                    print(f"⚠ Forecast store not used: {e}")
+                    current = None
+        with self._lock:
+            self._file = current
+        return current
+
+    def _is_fresh(self, store, state):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._fresh.get(state)
+        if cached is not None and cached[0] == store.stamp and now - cached[2] < self.check_interval:
+            return cached[1]
+        built = store.versions.get(state)
+        try:
+            fresh = built is not None and self.versions(state) == built
+        except FileNotFoundError:
+            fresh = False
+        with self._lock:
+            self._fresh[state] = (store.stamp, fresh, now)
+        return fresh
+
+    def get(self, state, years, n_scenarios, method):
+        """The stored forecast, or None when it is missing or stale."""
+        store = self._current_file()
+        key = record_key(state, years, n_scenarios, method)
+        if store is None or key not in store.index:
+            metrics.inc('forecast_store', result='miss')
+            return None
+        if not self._is_fresh(store, state):
+            metrics.inc('forecast_store', result='stale')
+            return None
+        metrics.inc('forecast_store', result='hit')
+        return store.read(key)
+
+    def info(self):
+        store = self._current_file()
+        if store is None:
+            return {'path': self.path, 'records': 0}
+        return {'path': self.path, 'records': len(store.index), **store.meta}
+
+
+def build_store(states=None, horizons=HORIZONS, methods=None, n_scenarios=None, path=STORE_PATH):
+    """Compute every forecast with the app's own code path and write the store."""
+    import app as web
+
+    states = states or [state for state in web.registry.states()
+                        if web.registry.model_files(state) and source_fingerprint(state, web.DATA_STORE)]
+    methods = methods or list(web.SCENARIO_METHODS)
+    n_scenarios = n_scenarios or web.SCENARIOS
+    records = {}
+    versions = {}
+    start = time.perf_counter()
+    for state in states:
+        state_versions = web.forecast_versions(state)
+        for years in horizons:
+            for method in methods:
+                forecast = web.run_forecast(state, years, n_scenarios, method)
+                # Chart series travel with the record, so any node can render the charts
+                forecast['charts'] = {key: web.charts.series(key) for key in forecast['chart_keys'].values()}
+                records[record_key(state, years, n_scenarios, method)] = forecast
+        if web.forecast_versions(state) != state_versions:
+            raise RuntimeError(f"{state}'s models or data changed while its forecasts were built; run again")
+        versions[state] = state_versions
+        print(f"✅ {state}: {len(horizons) * len(methods)} forecasts")
+    meta = {'built_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'horizons': list(horizons), 'methods': methods, 'scenarios': n_scenarios}
+    size = write_store(path, records, versions, meta)
+    print(f"📦 {len(records)} forecasts for {len(versions)} states -> {path} "
+          f"({size / 1024:.0f} KB, {time.perf_counter() - start:.1f}s)")
+    return records
+
+
+def parse_horizons(text):
+    # "1-10" or "1,3,5"
+    years = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        years.extend(range(int(first), int(last or first) + 1))
+    return years
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute every /predict forecast into one store file")
+    parser.add_argument('states', nargs='*', help="default: every state with models and data")
+    parser.add_argument('--years', default='1-10', help="horizons, e.g. 1-10 or 1,5,10")
+    parser.add_argument('--methods', nargs='+', help="scenario methods (default: all)")
+    parser.add_argument('--scenarios', type=int, help="scenarios per forecast (default: the app's SCENARIOS)")
+    parser.add_argument('--out', default=os.environ.get('FORECAST_STORE', STORE_PATH))
+    args = parser.parse_args()
+    build_store(args.states, parse_horizons(args.years), args.methods, args.scenarios, args.out)
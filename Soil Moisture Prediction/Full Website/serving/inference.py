@@ -0,0 +1,66 @@
+import contextvars
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from serving.metrics import stage
+
+
+class InferenceTimeout(TimeoutError):
+    pass
+
+
+def set_model_threads(model, n_jobs):
+    """Pin a model's own parallelism (RF/XGBoost/LightGBM n_jobs; GBR has none)."""
+    get_params = getattr(model, 'get_params', None)
+    if get_params is not None and 'n_jobs' in get_params():
+        model.set_params(n_jobs=n_jobs)
+    return model
+
+
+class InferenceExecutor:
+    """Runs each state's models concurrently on one pool shared by all requests.
+
+    The pool has max_workers threads and every model is pinned to
+    model_threads threads of its own (set_model_threads() when the registry
+    loads it), so at most max_workers * model_threads cores are busy however
+    many requests arrive; extra work queues instead of oversubscribing the
+    CPU. XGBoost, LightGBM and the forests' tree traversal release the GIL,
+    so threads run them in parallel and a request's latency follows its
+    slowest model.
+    """
+
+    def __init__(self, max_workers=None, model_threads=1, timeout=30.0):
+        self.model_threads = model_threads
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) // model_threads)
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+
+    def map_models(self, models, fn, timeout=None):
+        """{name: fn(entry.model)} for every model, computed concurrently.
+
+        Raises InferenceTimeout if the whole ensemble is not done within
+        `timeout` seconds (default: the executor's); unfinished work that has
+        not started yet is cancelled.
+        """
+        def timed(name, model):
+            with stage('predict', model=name):
+                return fn(model)
+
+        futures = OrderedDict()
+        for name, entry in models.items():
+            # Each model runs in a copy of the caller's context, so its time lands in the request's trace
+            futures[name] = self._pool.submit(contextvars.copy_context().run, timed, name, entry.model)
+        done, pending = wait(futures.values(), timeout=timeout or self.timeout)
+        if pending:
+            for future in pending:
+                future.cancel()
+            slow = [name for name, future in futures.items() if future in pending]
+            raise InferenceTimeout(f"Models {slow} did not finish within {timeout or self.timeout}s")
+        return OrderedDict((name, future.result()) for name, future in futures.items())
+
+    def predict_all(self, models, X, timeout=None):
+        return self.map_models(models, lambda model: model.predict(X), timeout)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT,
+    error TEXT,
+    result_path TEXT,
+    content_type TEXT,
+    owner TEXT,
+    lease_until REAL
+)
+"""
+# Columns added since the first schema, for job databases created before them
+ADDED_COLUMNS = {'owner': 'TEXT', 'lease_until': 'REAL'}
+STATUSES = ('queued', 'running', 'done', 'failed')
+LEASE_SECONDS = 60.0
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class JobQueue:
+    """Background jobs on a local thread pool, tracked in SQLite.
+
+    handlers maps a job kind to fn(params, path) -> content type: the handler
+    writes its result to `path` and the file is kept under result_dir, so
+    finished results can be fetched again after a restart.
+
+    Several processes (e.g. gunicorn workers) can share one root. A job runs
+    only in the queue that claims it, with a conditional UPDATE from
+    'queued' to 'running'; the claim is a lease that the owner renews every
+    lease_seconds / 3. A 'running' job whose lease has expired (its process
+    died) is queued again and claimed by whichever queue gets to it first.
+
+    Nothing starts until start(), or the first submit/get: importing the app
+    does not spawn worker threads.
+    """
+
+    def __init__(self, handlers, root='jobs', workers=2, lease_seconds=LEASE_SECONDS):
+        self.handlers = handlers
+        self.root = root
+        self.db_path = os.path.join(root, 'jobs.sqlite')
+        self.result_dir = os.path.join(root, 'results')
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stop = threading.Event()
+        self._waiting = set()  # Jobs submitted to this queue's pool and not started yet
+
+    def start(self):
+        """Create the database, start the workers and the lease keeper (once per process)."""
+        with self._lock:
+            if self._pool is not None:
+                return
+            os.makedirs(self.result_dir, exist_ok=True)
+            with self._connect() as db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute(SCHEMA)
+                existing = {row['name'] for row in db.execute('PRAGMA table_info(jobs)')}
+                for name, kind in ADDED_COLUMNS.items():
+                    if name not in existing:
+                        db.execute(f'ALTER TABLE jobs ADD COLUMN {name} {kind}')
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='jobs')
+        self._recover()
+        threading.Thread(target=self._keep_leases, name='jobs-lease', daemon=True).start()
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not shared across threads
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _update(self, job_id, **fields):
+        # Only the queue holding the job's lease records its outcome
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as db:
+            db.execute(f'UPDATE jobs SET {columns} WHERE id = ? AND owner = ?',
+                       (*fields.values(), job_id, self.owner))
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            if job_id in self._waiting:
+                return
+            self._waiting.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    def _recover(self):
+        # Expired leases go back to the queue; queued jobs are offered to this process too,
+        # the atomic claim decides which process runs each of them
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL "
+                       "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (time.time(),))
+        rows = self._connect().execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created").fetchall()
+        for row in rows:
+            self._enqueue(row['id'])
+
+    def _keep_leases(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                with self._connect() as db:
+                    db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running'",
+                               (time.time() + self.lease_seconds, self.owner))
+                self._recover()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    def _claim(self, job_id):
+        with self._connect() as db:
+            claimed = db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, started = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (self.owner, time.time() + self.lease_seconds, _now(), job_id))
+        return claimed.rowcount == 1
+
+    def submit(self, kind, params):
+        """Queue a job and return its ID straight away."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {sorted(self.handlers)}")
+        self.start()
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute('INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)',
+                       (job_id, kind, json.dumps(params), 'queued', _now()))
+        self._enqueue(job_id)
+        return job_id
+
+    def _run(self, job_id):
+        with self._lock:
+            self._waiting.discard(job_id)
+        if not self._claim(job_id):
+            return  # Another process has it (or it already finished)
+        job = self.get(job_id)
+        path = os.path.join(self.result_dir, job_id)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            content_type = self.handlers[job['kind']](job['params'], tmp_path)
+            os.replace(tmp_path, path)
+            self._update(job_id, status='done', finished=_now(), result_path=path, content_type=content_type)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status='failed', finished=_now(), error=f'{type(e).__name__}: {e}')
+
+    def get(self, job_id):
+        self.start()
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def status(self, job_id):
+        # Public view of a job (no filesystem paths)
+        job = self.get(job_id)
+        if job is None:
+            return None
+        for field in ('result_path', 'owner', 'lease_until'):
+            job.pop(field)
+        return job
+
+    def shutdown(self):
+        self._stop.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,238 @@
+"""State-wide soil moisture maps: every pixel of a month's feature grid through the state's models.
+
+The feature grid is the store's 'grid' dataset (Sentinel-2 + Landsat bands
+of each sampled pixel, with its lon/lat), extracted on request:
+
+    python -m extraction run --datasets grid --states Bihar --years 2023
+
+A month's map is built from "Full Website" (or through POST /jobs, kind "map"):
+
+    python -m serving.maps Bihar 2023-06 --workers 4
+
+The grid is streamed in chunks of --chunk-rows pixels; worker processes load
+the models once and write their chunk's predictions straight into the
+output memmap, so memory stays bounded by the chunks in flight. Output, in
+maps/<State>/<YYYY-MM>/:
+
+    lon.npy, lat.npy        float32 pixel coordinates
+    prediction.npy          float32 pixels x models (model order in meta.json)
+    meta.json               models, bounds, value range, tile levels
+    tiles/<z>/<x>_<y>.png   mean prediction per cell; level z splits the state into 2^z x 2^z tiles
+"""
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from numpy.lib.format import open_memmap
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from extraction.store import iter_partitions, list_partitions
+from serving.batch import FEATURE_COLUMNS, _feature_order
+from serving.climatology import DATA_STORE
+from serving.inference import set_model_threads
+from serving.registry import ModelRegistry
+from serving.trees import FlatEnsemble, is_flat, served_path
+
+MAP_DIR = 'maps'
+GRID_DATASET = 'grid'
+CHUNK_ROWS = 65_536
+TILE_SIZE = 256  # Cells per tile side
+MAX_LEVEL = 3    # Finest level is at most 2048 x 2048 cells
+COLORMAP = 'YlGnBu'
+
+_models = None  # Per worker process: OrderedDict of loaded models
+
+
+def parse_period(text):
+    # "2023-06" -> (2023, 6)
+    year, month = text.split('-')
+    return int(year), int(month)
+
+
+def map_path(root, state, year, month):
+    return os.path.join(root, state, f'{year}-{month:02d}')
+
+
+def available(root, state):
+    """Periods ("YYYY-MM") with a finished map for a state, newest first."""
+    state_dir = os.path.join(root, state)
+    if not os.path.isdir(state_dir):
+        return []
+    return sorted((name for name in os.listdir(state_dir)
+                   if os.path.exists(os.path.join(state_dir, name, 'meta.json'))), reverse=True)
+
+
+def read_meta(root, state, period):
+    path = os.path.join(root, state, period, 'meta.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def tile_path(root, state, period, z, x, y):
+    return os.path.join(root, state, period, 'tiles', str(z), f'{x}_{y}.png')
+
+
+def _load_models(paths):
+    global _models
+    # One thread per model: the parallelism comes from the worker processes
+    _models = OrderedDict()
+    for name, path in paths.items():
+        _models[name] = FlatEnsemble.load(path) if is_flat(path) else set_model_threads(joblib.load(path), 1)
+
+
+def _score_chunk(prediction_path, offset, X):
+    out = np.load(prediction_path, mmap_mode='r+')
+    for i, model in enumerate(_models.values()):
+        out[offset:offset + len(X), i] = model.predict(X[_feature_order(model, FEATURE_COLUMNS)])
+    out.flush()
+    return len(X)
+
+
+def _levels(pixels):
+    # Finest level with about one pixel per cell, capped at MAX_LEVEL
+    side = math.sqrt(max(pixels, 1))
+    return min(MAX_LEVEL, max(0, math.ceil(math.log2(side / TILE_SIZE))))
+
+
+def build_tiles(directory, bounds, levels, chunk_rows=CHUNK_ROWS):
+    """Overview tiles from the memmaps in `directory`; returns the (vmin, vmax) they are coloured with."""
+    from matplotlib.image import imsave
+
+    west, south, east, north = bounds
+    size = TILE_SIZE * 2 ** levels
+    total = np.zeros(size * size)
+    count = np.zeros(size * size)
+    lon = np.load(os.path.join(directory, 'lon.npy'), mmap_mode='r')
+    lat = np.load(os.path.join(directory, 'lat.npy'), mmap_mode='r')
+    prediction = np.load(os.path.join(directory, 'prediction.npy'), mmap_mode='r')
+    for start in range(0, len(lon), chunk_rows):
+        end = start + chunk_rows
+        values = prediction[start:end].mean(axis=1, dtype=np.float64)
+        col = np.clip(((lon[start:end] - west) / max(east - west, 1e-9) * size).astype(np.intp), 0, size - 1)
+        row = np.clip(((north - lat[start:end]) / max(north - south, 1e-9) * size).astype(np.intp), 0, size - 1)
+        ok = ~np.isnan(values)
+        cells = row[ok] * size + col[ok]
+        total += np.bincount(cells, weights=values[ok], minlength=size * size)
+        count += np.bincount(cells, minlength=size * size)
+    total, count = total.reshape(size, size), count.reshape(size, size)
+
+    # One colour scale for every level, from the finest cells
+    means = np.divide(total, count, out=np.full_like(total, np.nan), where=count > 0)
+    vmin, vmax = (float(np.nanmin(means)), float(np.nanmax(means))) if count.any() else (0.0, 1.0)
+    for z in range(levels, -1, -1):
+        if z < levels:
+            means = np.divide(total, count, out=np.full_like(total, np.nan), where=count > 0)
+        n_tiles = 2 ** z
+        os.makedirs(os.path.join(directory, 'tiles', str(z)), exist_ok=True)
+        for y in range(n_tiles):
+            for x in range(n_tiles):
+                cells = np.s_[y * TILE_SIZE:(y + 1) * TILE_SIZE, x * TILE_SIZE:(x + 1) * TILE_SIZE]
+                if not count[cells].any():
+                    continue  # No pixels here; the view leaves the tile blank
+                buffer = io.BytesIO()
+                imsave(buffer, means[cells].astype(np.float32), cmap=COLORMAP, vmin=vmin, vmax=vmax, format='png')
+                with open(os.path.join(directory, 'tiles', str(z), f'{x}_{y}.png'), 'wb') as f:
+                    f.write(buffer.getvalue())
+        # Next level up: 2 x 2 cells -> 1
+        half = total.shape[0] // 2
+        total = total.reshape(half, 2, half, 2).sum(axis=(1, 3))
+        count = count.reshape(half, 2, half, 2).sum(axis=(1, 3))
+    return vmin, vmax
+
+
+def build_map(state, year, month, models_root='models', data_store=DATA_STORE, root=MAP_DIR, workers=None,
+              chunk_rows=CHUNK_ROWS, flat=False):
+    """Predict every grid pixel of a state-month with the state's models and write the map; returns its meta."""
+    start = time.perf_counter()
+    partitions = list_partitions(data_store, GRID_DATASET, states=[state], years=[year], months=[month])
+    if not partitions:
+        raise FileNotFoundError(f"No {GRID_DATASET} data for {state} {year}-{month:02d} in {data_store} "
+                                f"(python -m extraction run --datasets grid --states {state} --years {year})")
+    paths = ModelRegistry(models_root).model_files(state)
+    if not paths:
+        raise FileNotFoundError(f"No models for {state} in {models_root}")
+    if flat:
+        paths = OrderedDict((name, served_path(path)) for name, path in paths.items())
+
+    import pyarrow.parquet as pq
+
+    pixels = sum(pq.ParquetFile(path).metadata.num_rows for _, _, _, path in partitions)
+    out_dir = map_path(root, state, year, month)
+    tmp_dir = f'{out_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    prediction_path = os.path.join(tmp_dir, 'prediction.npy')
+    prediction = open_memmap(prediction_path, mode='w+', dtype=np.float32, shape=(pixels, len(paths)))
+    prediction[:] = np.nan
+    prediction.flush()
+    del prediction
+    lon = open_memmap(os.path.join(tmp_dir, 'lon.npy'), mode='w+', dtype=np.float32, shape=(pixels,))
+    lat = open_memmap(os.path.join(tmp_dir, 'lat.npy'), mode='w+', dtype=np.float32, shape=(pixels,))
+
+    workers = workers or os.cpu_count() or 1
+    print(f"🗺️ {state} {year}-{month:02d}: {pixels} pixels x {len(paths)} models on {workers} workers")
+    # Spawned, not forked: the web app builds maps from a job thread, and a fork would copy
+    # whatever locks the app's other threads hold at that moment
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_load_models, initargs=(paths,)) as pool:
+        in_flight = deque()
+        offset = 0
+        for block in iter_partitions(data_store, GRID_DATASET, states=[state], years=[year], months=[month],
+                                     block_rows=chunk_rows):
+            lon[offset:offset + len(block)] = block['lon'].to_numpy()
+            lat[offset:offset + len(block)] = block['lat'].to_numpy()
+            # At most two chunks per worker are held in memory at once
+            if len(in_flight) >= 2 * workers:
+                in_flight.popleft().result()
+            in_flight.append(pool.submit(_score_chunk, prediction_path, offset, block[FEATURE_COLUMNS]))
+            offset += len(block)
+        while in_flight:
+            in_flight.popleft().result()
+    lon.flush()
+    lat.flush()
+    bounds = [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())] if pixels else [0, 0, 1, 1]
+    del lon, lat
+
+    levels = _levels(pixels)
+    vmin, vmax = build_tiles(tmp_dir, bounds, levels, chunk_rows)
+    meta = {'state': state, 'period': f'{year}-{month:02d}', 'pixels': pixels, 'models': list(paths),
+            'bounds': bounds, 'levels': levels, 'tile_size': TILE_SIZE, 'colormap': COLORMAP,
+            'vmin': vmin, 'vmax': vmax, 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': round(time.perf_counter() - start, 2)}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    # Swap the finished map in; readers of the old one only see it disappear
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return meta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Predict soil moisture for every grid pixel of a state-month")
+    parser.add_argument('state')
+    parser.add_argument('period', help="YYYY-MM")
+    parser.add_argument('--models', default='models')
+    parser.add_argument('--data-store', default=DATA_STORE)
+    parser.add_argument('--out', default=MAP_DIR)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="pixels scored per chunk")
+    parser.add_argument('--flat', action='store_true', help="score with the flat-array exports (serving.trees)")
+    args = parser.parse_args()
+    year, month = parse_period(args.period)
+    meta = build_map(args.state, year, month, args.models, args.data_store, args.out, args.workers,
+                     args.chunk_rows, args.flat)
+    print(f"✅ {meta['pixels']} pixels, {meta['levels'] + 1} tile levels, "
+          f"{meta['vmin']:.4f}–{meta['vmax']:.4f} in {meta['seconds']}s -> "
+          f"{map_path(args.out, args.state, year, month)}")
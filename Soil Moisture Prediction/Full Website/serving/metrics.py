@@ -0,0 +1,191 @@
+"""Request stage timers, counters and the Prometheus text behind /metrics.
+
+Code anywhere in the app times a stage with
+
+    with stage('model_load', model=name):
+        ...
+
+which feeds the process-wide histogram soil_stage_seconds{stage=..., model=...}
+and, inside a request, that request's trace (logged as one JSON line when
+the request finishes). Values are per process: with several workers each
+one exposes its own /metrics, to be summed by the scraper.
+"""
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+PREFIX = 'soil_'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace = contextvars.ContextVar('trace', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Trace:
+    """Stage timings and counts collected for one request."""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.stages = OrderedDict()
+        self.counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def summary(self):
+        with self._lock:
+            stages = {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+            return {'request_id': self.request_id, 'stages_ms': stages, 'counts': dict(self.counts)}
+
+
+class Metrics:
+    """Counters and histograms keyed by name and labels, rendered as Prometheus text."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._help = {}
+        self._counters = OrderedDict()    # name -> {label key: value}
+        self._histograms = OrderedDict()  # name -> {label key: [bucket counts..., sum, count]}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, OrderedDict())
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+        trace = _trace.get()
+        if trace is not None:
+            trace.count(name if not labels else f"{name}:{':'.join(str(v) for v in labels.values())}", value)
+
+    def observe(self, name, seconds, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, OrderedDict())
+            key = _label_key(labels)
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    state[i] += 1
+            state[-2] += seconds
+            state[-1] += 1
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Time a block as soil_stage_seconds{stage=name, ...} and in the current request's trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe('stage_seconds', seconds, stage=name, **labels)
+            trace = _trace.get()
+            if trace is not None:
+                trace.add(name if not labels else f"{name}:{':'.join(str(v) for v in labels.values())}", seconds)
+
+    def collector(self, fn):
+        """Register fn() -> [(name, type, help, labels dict, value)] read at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = [(name, dict(series)) for name, series in self._counters.items()]
+            histograms = [(name, {key: list(state) for key, state in series.items()})
+                          for name, series in self._histograms.items()]
+        for name, series in counters:
+            full = f'{PREFIX}{name}_total'
+            lines.append(f'# HELP {full} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {full} counter')
+            for key, value in series.items():
+                lines.append(f'{full}{_format_labels(key)} {value}')
+        for name, series in histograms:
+            full = PREFIX + name
+            lines.append(f'# HELP {full} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {full} histogram')
+            for key, state in series.items():
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f'{full}_bucket{_format_labels(key, [("le", repr(bound))])} {count}')
+                lines.append(f'{full}_bucket{_format_labels(key, [("le", "+Inf")])} {state[-1]}')
+                lines.append(f'{full}_sum{_format_labels(key)} {state[-2]:.6f}')
+                lines.append(f'{full}_count{_format_labels(key)} {state[-1]}')
+        seen = set()
+        for fn in self._collectors:
+            for name, kind, help_text, labels, value in fn():
+                full = PREFIX + name
+                if full not in seen:
+                    lines.append(f'# HELP {full} {help_text}')
+                    lines.append(f'# TYPE {full} {kind}')
+                    seen.add(full)
+                lines.append(f'{full}{_format_labels(_label_key(labels))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('stage_seconds', "Time spent in each stage of request handling")
+stage = metrics.stage
+
+
+def start_trace(request_id):
+    trace = Trace(request_id)
+    return trace, _trace.set(trace)
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+def current_trace():
+    return _trace.get()
+
+
+class Profiler:
+    """cProfile dumps for a random sample (rate 0..1) of requests, written to root/."""
+
+    def __init__(self, rate=0.0, root='profiles'):
+        self.rate = rate
+        self.root = root
+
+    def start(self):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another request on this thread is already being profiled
+            return None
+        return profile
+
+    def stop(self, profile, name):
+        profile.disable()
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.prof")
+        profile.dump_stats(path)
+        return path
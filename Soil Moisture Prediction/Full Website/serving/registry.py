@@ -0,0 +1,216 @@
+import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+
+from serving.metrics import metrics, stage
+
+# Display name -> substring that identifies the model file in models/<State>/
+MODEL_PATTERNS = OrderedDict([
+    ("Random Forest", "Random"),
+    ("XGBoost", "XGB"),
+    ("LightGBM", "LGBM"),
+    ("GBR Model", "GBR"),
+])
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# One loaded model plus the file version it came from
+class ModelEntry:
+    def __init__(self, state, name, path, model, stat, sha256):
+        self.state = state
+        self.name = name
+        self.path = path
+        self.model = model
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size  # On-disk size, used as the memory estimate
+        self.sha256 = sha256
+        self.loaded_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.checked = time.monotonic()
+
+    def version(self):
+        return {
+            'state': self.state,
+            'model': self.name,
+            'file': os.path.basename(self.path),
+            'sha256': self.sha256[:12],
+            'modified': datetime.datetime.fromtimestamp(self.mtime_ns / 1e9).isoformat(timespec='seconds'),
+            'loaded_at': self.loaded_at,
+            'bytes': self.size,
+        }
+
+
+class ModelRegistry:
+    """Process-wide cache of unpickled models, shared by every request.
+
+    Models are loaded on first use (or by preload()), kept in an LRU bounded
+    by memory_budget bytes and re-checked at most every check_interval
+    seconds: a changed mtime/size whose content hash also changed is loaded
+    by the first request that sees it and swapped in atomically; requests
+    arriving meanwhile keep using the old model until the new one is ready
+    (only a model that was never loaded makes them wait).
+    resolve maps a model file to the file actually loaded (e.g. its flat
+    export); a change to either path's result is picked up the same way.
+    """
+
+    def __init__(self, root='models', memory_budget=2 * 1024 ** 3, check_interval=2.0,
+                 loader=joblib.load, resolve=None):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+        self.loader = loader
+        self.resolve = resolve
+        self._entries = OrderedDict()  # (state, name) -> ModelEntry, least recently used first
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._digests = {}  # path -> ((mtime_ns, size), sha256)
+        self.loads = 0
+        self.evictions = 0
+
+    def states(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def model_files(self, state):
+        """{display name: path} for the models present in models/<state>/."""
+        model_dir = os.path.join(self.root, state)
+        files = sorted(f for f in os.listdir(model_dir) if os.path.isfile(os.path.join(model_dir, f))) \
+            if os.path.isdir(model_dir) else []
+        found = OrderedDict()
+        for name, pattern in MODEL_PATTERNS.items():
+            file_name = next((f for f in files if pattern in f), None)
+            if file_name:
+                found[name] = os.path.join(model_dir, file_name)
+        return found
+
+    def file_digests(self, state):
+        """{display name: sha256} of a state's model files, without loading them.
+
+        A file is only hashed again when its mtime or size changes.
+        """
+        digests = OrderedDict()
+        for name, path in self.model_files(state).items():
+            stat = os.stat(path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            with self._lock:
+                cached = self._digests.get(path)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, file_sha256(path))
+                with self._lock:
+                    self._digests[path] = cached
+            digests[name] = cached[1]
+        return digests
+
+    def _load_lock(self, key):
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _is_current(self, entry, path):
+        # Cheap stat check first; hash only when mtime or size moved
+        if time.monotonic() - entry.checked < self.check_interval:
+            return True
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if path == entry.path and (stat.st_mtime_ns, stat.st_size) == (entry.mtime_ns, entry.size):
+            entry.checked = time.monotonic()
+            return True
+        if path == entry.path and stat.st_size == entry.size and file_sha256(path) == entry.sha256:
+            entry.mtime_ns = stat.st_mtime_ns  # Touched, not changed
+            entry.checked = time.monotonic()
+            return True
+        return False
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            used = sum(e.size for e in self._entries.values())
+            while used > self.memory_budget and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                used -= evicted.size
+                self.evictions += 1
+
+    def get(self, state, name, path=None):
+        """The current ModelEntry for a state's model, loading it if needed."""
+        key = (state, name)
+        path = path or self.model_files(state).get(name)
+        if path is None:
+            return None
+        if self.resolve is not None:
+            path = self.resolve(path)
+        entry = self._cached(key)
+        if entry is not None and self._is_current(entry, path):
+            metrics.inc('model_cache', result='hit')
+            return entry
+
+        lock = self._load_lock(key)
+        if entry is None:
+            lock.acquire()
+        elif not lock.acquire(blocking=False):
+            # Another request is already loading the new version: keep serving the old one meanwhile
+            metrics.inc('model_cache', result='stale')
+            return entry
+        metrics.inc('model_cache', result='miss')
+        try:
+            entry = self._cached(key)  # Another request may have just loaded it
+            if entry is not None and entry.path == path and self._is_current(entry, path):
+                return entry
+            stat = os.stat(path)
+            sha256 = file_sha256(path)
+            if entry is not None and entry.path == path and entry.sha256 == sha256:
+                entry.mtime_ns, entry.checked = stat.st_mtime_ns, time.monotonic()
+                return entry
+            with stage('model_load', model=name):
+                model = self.loader(path)
+            entry = ModelEntry(state, name, path, model, stat, sha256)
+            self.loads += 1
+            self._store(key, entry)
+            return entry
+        finally:
+            lock.release()
+
+    def state_models(self, state):
+        """{display name: ModelEntry} for every model available for a state."""
+        models = OrderedDict()
+        for name, path in self.model_files(state).items():
+            entry = self.get(state, name, path)
+            if entry is not None:
+                models[name] = entry
+        return models
+
+    def preload(self, states=None):
+        # Warm the cache at startup so the first request does not pay for unpickling
+        for state in states or self.states():
+            self.state_models(state)
+
+    def versions(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            'models': [entry.version() for entry in entries],
+            'bytes_loaded': sum(entry.size for entry in entries),
+            'memory_budget': self.memory_budget,
+            'loads': self.loads,
+            'evictions': self.evictions,
+        }
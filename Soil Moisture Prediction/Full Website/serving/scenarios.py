@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from serving.climatology import TARGET
+
+PERCENTILES = (10, 50, 90)
+SCENARIO_METHODS = ('variance', 'bootstrap')
+
+
+def feature_columns(columns):
+    # Model input order: the training table's columns without the target
+    return [col for col in columns if col != TARGET]
+
+
+def future_frame(monthly_avg, columns, years, start_year=2025):
+    """Climatology repeated for every future year, in model feature order."""
+    monthly_avg = monthly_avg.sort_values('Month')
+    n_months = len(monthly_avg)
+    data = {}
+    for col in feature_columns(columns):
+        if col == 'Year':
+            data[col] = np.repeat(np.arange(start_year, start_year + years), n_months)
+        else:
+            data[col] = np.tile(monthly_avg[col].to_numpy(), years)
+    return pd.DataFrame(data)
+
+
+def draw_scenarios(climatology, years, n_scenarios=200, method='variance', seed=0, start_year=2025):
+    """n_scenarios perturbed feature trajectories as one (scenario, month step, feature) array.
+
+    'variance' adds Gaussian noise with each calendar month's historical
+    standard deviation to the climatology; 'bootstrap' stitches whole
+    historical years (one block per future year) drawn with replacement, so
+    the bands keep their observed within-year co-variation. Months missing
+    from a drawn year fall back to the climatology.
+    """
+    if method not in SCENARIO_METHODS:
+        raise ValueError(f"Unknown scenario method {method!r}; expected one of {SCENARIO_METHODS}")
+    rng = np.random.default_rng(seed)
+    monthly_avg = climatology.monthly_avg.sort_values('Month')
+    months = monthly_avg['Month'].to_numpy()
+    columns = feature_columns(climatology.columns)
+    bands = [col for col in columns if col not in ('Year', 'Month')]
+    base = monthly_avg[bands].to_numpy()  # months x bands
+
+    if method == 'variance':
+        spread = climatology.monthly_std.set_index('Month').reindex(months)[bands].to_numpy()
+        noise = rng.standard_normal((n_scenarios, years, len(months), len(bands)))
+        values = base + noise * spread
+    else:
+        blocks = climatology.blocks
+        order = [blocks['bands'].index(band) for band in bands]
+        history = np.asarray(blocks['values'], dtype=float)[:, months - 1][:, :, order]  # years x months x bands
+        history = np.where(np.isnan(history), base, history)
+        picks = rng.integers(len(blocks['years']), size=(n_scenarios, years))
+        values = history[picks]
+
+    scenarios = np.empty((n_scenarios, years * len(months), len(columns)))
+    scenarios[:, :, [columns.index(band) for band in bands]] = values.reshape(n_scenarios, -1, len(bands))
+    if 'Year' in columns:
+        scenarios[:, :, columns.index('Year')] = np.repeat(np.arange(start_year, start_year + years), len(months))
+    if 'Month' in columns:
+        scenarios[:, :, columns.index('Month')] = np.tile(months, years)
+    return scenarios, columns
+
+
+def score_scenarios(model, scenarios, columns, batch_rows=200_000):
+    """Predictions for every scenario, shape (scenario, month step), scored in large batches."""
+    n_scenarios, steps, n_features = scenarios.shape
+    flat = scenarios.reshape(-1, n_features)
+    preds = np.empty(len(flat))
+    for start in range(0, len(flat), batch_rows):
+        batch = pd.DataFrame(flat[start:start + batch_rows], columns=columns)
+        preds[start:start + batch_rows] = model.predict(batch)
+    return preds.reshape(n_scenarios, steps)
+
+
+def percentile_bands(preds, percentiles=PERCENTILES):
+    # {'p10': [...], 'p50': [...], 'p90': [...]} per month step
+    values = np.percentile(preds, percentiles, axis=0)
+    return {f'p{p}': row for p, row in zip(percentiles, values)}
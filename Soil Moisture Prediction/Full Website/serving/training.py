@@ -0,0 +1,486 @@
+"""Train the four models for every state and publish them where app.py loads them.
+
+Run from "Full Website" (one command retrains everything):
+
+    python -m serving.training                  # every state with data, all cores
+    python -m serving.training Bihar Gujarat --workers 4
+
+Each (state, model) pair is an independent job on a process pool. The
+latest year in a state's data is held out for validation: the boosted
+models stop adding trees once that year's RMSE stops improving, then every
+model is refit on all years (boosted ones with the chosen number of trees).
+
+Artifacts go to models/<State>/versions/<version>/ with a manifest.json;
+the new version is then published as models/<State>/{Random_Forest,
+XGB_model,LGBM_model,GBR_model}.pkl plus models/<State>/manifest.json,
+each file replaced atomically, and exported to flat arrays (serving.trees).
+
+After `python -m extraction update` has appended new months, update the
+published models without a full retrain:
+
+    python -m serving.training --update          # add trees for the new months
+
+Boosted models continue boosting and the Random Forest grows extra trees,
+fitted on the last 12 months of data plus every month the model has not
+learned yet. Each updated model must score the newest whole month(s)
+(held out from the update, at least --min-gate-rows rows) no worse than the
+model it replaces, within --tolerance. Models that fail the gate, or whose
+new months are too few rows to judge, stay as they are; every manifest
+entry records the month its model has learned up to (data_through), so
+they are updated on all the months they missed next time.
+"""
+import argparse
+import copy
+import datetime
+import functools
+import json
+import os
+import shutil
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+
+from serving.climatology import DATA_STORE, TARGET, load_state_data, source_fingerprint
+from serving.registry import file_sha256
+from serving.scenarios import feature_columns
+
+# Display name -> published file name (matched by serving.registry.MODEL_PATTERNS)
+MODEL_FILES = OrderedDict([
+    ("Random Forest", 'Random_Forest.pkl'),
+    ("XGBoost", 'XGB_model.pkl'),
+    ("LightGBM", 'LGBM_model.pkl'),
+    ("GBR Model", 'GBR_model.pkl'),
+])
+MANIFEST = 'manifest.json'
+VERSIONS_DIR = 'versions'
+SEED = 42
+UPDATE_WINDOW_MONTHS = 12  # Recent data the added trees are fitted on
+MIN_GATE_ROWS = 200  # Held-out rows an update is judged on, in whole months
+
+
+def _atomic_write_json(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _atomic_copy(src, dst):
+    tmp_path = f'{dst}.{os.getpid()}.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+@functools.lru_cache(maxsize=4)
+def _state_frame(state, data_store):
+    # Same table (and column order) the climatology is built from, so the app's
+    # future frames line up with the models' feature_names_in_
+    df = load_state_data(state, data_store).dropna()
+    features = feature_columns(list(df.columns))
+    return df, features
+
+
+def year_split(df, holdout_year=None):
+    """Boolean masks (train, validation) holding out one year (default: the latest)."""
+    years = df['Year'].astype(int)
+    holdout_year = int(years.max()) if holdout_year is None else int(holdout_year)
+    validation = (years == holdout_year).to_numpy()
+    if validation.all() or not validation.any():
+        raise ValueError(f"Need data from at least one year besides {holdout_year} to validate")
+    return ~validation, validation, holdout_year
+
+
+def month_index(df):
+    return (df['Year'].astype(int) * 12 + df['Month'].astype(int) - 1).to_numpy()
+
+
+def data_through(df):
+    # [year, month] of the newest rows in a table
+    latest = int(month_index(df).max())
+    return [latest // 12, latest % 12 + 1]
+
+
+def scores(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, r2_score, root_mean_squared_error
+
+    return {'r2': round(float(r2_score(y_true, y_pred)), 4),
+            'rmse': round(float(root_mean_squared_error(y_true, y_pred)), 5),
+            'mae': round(float(mean_absolute_error(y_true, y_pred)), 5)}
+
+
+def fit_random_forest(X, y, X_val, y_val, threads, max_rounds, patience):
+    from sklearn.ensemble import RandomForestRegressor
+
+    params = {'n_estimators': 300, 'min_samples_leaf': 2, 'n_jobs': threads, 'random_state': SEED}
+    model = RandomForestRegressor(**params).fit(X, y)
+    return model, params, None
+
+
+def fit_xgboost(X, y, X_val, y_val, threads, max_rounds, patience):
+    from xgboost import XGBRegressor
+
+    params = {'n_estimators': max_rounds, 'learning_rate': 0.05, 'max_depth': 6, 'subsample': 0.8,
+              'colsample_bytree': 0.8, 'n_jobs': threads, 'random_state': SEED}
+    model = XGBRegressor(**params, early_stopping_rounds=patience)
+    model.fit(X, y, eval_set=[(X_val, y_val)], verbose=False)
+    return model, params, int(model.best_iteration) + 1
+
+
+def fit_lightgbm(X, y, X_val, y_val, threads, max_rounds, patience):
+    import lightgbm
+    from lightgbm import LGBMRegressor
+
+    params = {'n_estimators': max_rounds, 'learning_rate': 0.05, 'num_leaves': 31, 'subsample': 0.8,
+              'subsample_freq': 1, 'colsample_bytree': 0.8, 'n_jobs': threads, 'random_state': SEED,
+              'verbose': -1}
+    model = LGBMRegressor(**params)
+    with warnings.catch_warnings():
+        # eval_set is deprecated in newer LightGBM but still the only spelling older releases accept
+        warnings.filterwarnings('ignore', message=".*'eval_set' is deprecated")
+        model.fit(X, y, eval_set=[(X_val, y_val)], callbacks=[lightgbm.early_stopping(patience, verbose=False)])
+    return model, params, int(model.best_iteration_ or max_rounds)
+
+
+def fit_gbr(X, y, X_val, y_val, threads, max_rounds, patience, step=25):
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    # warm_start adds `step` trees at a time; stop once the held-out year stops improving
+    params = {'learning_rate': 0.05, 'max_depth': 3, 'subsample': 0.8, 'random_state': SEED}
+    model = GradientBoostingRegressor(n_estimators=step, warm_start=True, **params)
+    best_rmse, best_rounds, stale = np.inf, step, 0
+    while model.n_estimators <= max_rounds:
+        model.fit(X, y)
+        rmse = float(np.sqrt(np.mean((model.predict(X_val) - y_val) ** 2)))
+        if rmse < best_rmse:
+            best_rmse, best_rounds, stale = rmse, model.n_estimators, 0
+        else:
+            stale += step
+            if stale >= patience:
+                break
+        model.n_estimators += step
+    # The loop overshoots by up to `patience` trees, and warm_start cannot drop trees:
+    # fit the early-stopped size again so the validation scores are those of that model
+    model = GradientBoostingRegressor(n_estimators=best_rounds, **params).fit(X, y)
+    return model, params, best_rounds
+
+
+FITTERS = {
+    "Random Forest": fit_random_forest,
+    "XGBoost": fit_xgboost,
+    "LightGBM": fit_lightgbm,
+    "GBR Model": fit_gbr,
+}
+
+
+def refit(model, params, best_rounds, X, y):
+    # Final model on every year; boosted models keep the validated number of trees
+    model = model.__class__(**params)
+    if best_rounds is not None:
+        model.set_params(n_estimators=best_rounds)
+    return model.fit(X, y)
+
+
+def train_model(state, name, version_dir, data_store=DATA_STORE, holdout_year=None, threads=1,
+                max_rounds=2000, patience=50):
+    """Fit, validate and save one model; returns its manifest entry."""
+    start = time.perf_counter()
+    df, features = _state_frame(state, data_store)
+    train, validation, holdout_year = year_split(df, holdout_year)
+    X, y = df[features], df[TARGET].to_numpy()
+
+    model, params, best_rounds = FITTERS[name](X[train], y[train], X[validation], y[validation],
+                                               threads, max_rounds, patience)
+    validation_scores = scores(y[validation], model.predict(X[validation]))
+    model = refit(model, params, best_rounds, X, y)
+
+    path = os.path.join(version_dir, MODEL_FILES[name])
+    joblib.dump(model, path)
+    return {
+        'file': MODEL_FILES[name],
+        'sha256': file_sha256(path),
+        'params': params,
+        'best_iteration': best_rounds,
+        'data_through': data_through(df),
+        'holdout_year': holdout_year,
+        'validation': validation_scores,
+        'train_rows': int(train.sum()),
+        'validation_rows': int(validation.sum()),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def publish(state_dir, version_dir, manifest, flat=True):
+    """Make a trained version the one the app serves, one atomic rename per file."""
+    for entry in manifest['models'].values():
+        published = os.path.join(state_dir, entry['file'])
+        _atomic_copy(os.path.join(version_dir, entry['file']), published)
+        if flat:
+            from serving.trees import check_rows, compare, export_model, flat_path
+
+            model = joblib.load(published)
+            try:
+                exported = export_model(model)
+                compare(model, exported, check_rows(list(exported.feature_names_in_)))
+            except (ValueError, AssertionError) as e:
+                print(f"⚠ {entry['file']}: no flat export ({e})")
+                continue
+            exported.save(flat_path(published))
+    _atomic_write_json(os.path.join(state_dir, MANIFEST), manifest)
+
+
+def prune_versions(state_dir, keep):
+    versions = sorted(os.listdir(os.path.join(state_dir, VERSIONS_DIR)))
+    for old in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(state_dir, VERSIONS_DIR, old), ignore_errors=True)
+
+
+def train_all(states, root='models', data_store=DATA_STORE, workers=None, holdout_year=None,
+              max_rounds=2000, patience=50, flat=True, keep=5):
+    version = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    manifests = {}
+    for state in states:
+        fingerprint = source_fingerprint(state, data_store)
+        if fingerprint is None:
+            print(f"⚠ No training data for {state}, skipped.")
+            continue
+        print(f"📂 {state}: training data from {fingerprint['source']}")
+        version_dir = os.path.join(root, state, VERSIONS_DIR, version)
+        os.makedirs(version_dir, exist_ok=True)
+        manifests[state] = {'state': state, 'version': version, 'data': fingerprint,
+                            'data_through': data_through(_state_frame(state, data_store)[0]),
+                            'trained_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                            'models': OrderedDict()}
+
+    print(f"🚀 Training {len(manifests) * len(MODEL_FILES)} models for {len(manifests)} states (version {version})")
+    failed = set()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(train_model, state, name, os.path.join(root, state, VERSIONS_DIR, version), data_store,
+                        holdout_year, 1, max_rounds, patience): (state, name)
+            for state in manifests for name in MODEL_FILES
+        }
+        for future in as_completed(futures):
+            state, name = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"❌ {state} {name}: {e}")
+                failed.add(state)
+                continue
+            manifests[state]['models'][name] = entry
+            print(f"✅ {state} {name}: validation {entry['holdout_year']} R² {entry['validation']['r2']}, "
+                  f"RMSE {entry['validation']['rmse']} ({entry['seconds']}s)")
+
+    for state, manifest in manifests.items():
+        state_dir = os.path.join(root, state)
+        if state in failed:
+            print(f"⚠ {state}: not published, the current models stay in place")
+            continue
+        manifest['models'] = OrderedDict((name, manifest['models'][name]) for name in MODEL_FILES)
+        version_dir = os.path.join(state_dir, VERSIONS_DIR, version)
+        _atomic_write_json(os.path.join(version_dir, MANIFEST), manifest)
+        publish(state_dir, version_dir, manifest, flat)
+        prune_versions(state_dir, keep)
+        print(f"📦 {state}: published version {version}")
+    return manifests
+
+
+def warm_start(model, name, X, y, extra_trees):
+    """A copy of a fitted model with `extra_trees` more trees fitted on (X, y)."""
+    if name == "XGBoost":
+        from xgboost import XGBRegressor
+
+        params = {**model.get_params(), 'n_estimators': extra_trees, 'early_stopping_rounds': None}
+        return XGBRegressor(**params).fit(X, y, xgb_model=model.get_booster(), verbose=False)
+    if name == "LightGBM":
+        from lightgbm import LGBMRegressor
+
+        params = {**model.get_params(), 'n_estimators': extra_trees}
+        return LGBMRegressor(**params).fit(X, y, init_model=model.booster_)
+    # scikit-learn ensembles keep their fitted trees and add new ones with warm_start
+    model = copy.deepcopy(model)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees)
+    model.fit(X, y)
+    return model.set_params(warm_start=False)
+
+
+def update_split(df, through, min_gate_rows=MIN_GATE_ROWS):
+    """Masks (window, gate, new) for an update of a model trained on data up to `through`.
+
+    new: rows after `through`. gate: the newest new months, whole, until
+    they hold at least min_gate_rows rows (or every new month). window: the
+    last UPDATE_WINDOW_MONTHS of data plus all new rows, without the gate.
+    """
+    months = month_index(df)
+    watermark = through[0] * 12 + through[1] - 1
+    new = months > watermark
+    if not new.any():
+        return None
+    gate = np.zeros(len(df), dtype=bool)
+    for month in np.unique(months[new])[::-1]:
+        gate |= months == month
+        if gate.sum() >= min_gate_rows:
+            break
+    recent = months > months.max() - UPDATE_WINDOW_MONTHS
+    window = (recent | new) & ~gate
+    return window, gate, new
+
+
+def update_model(state, name, state_dir, version_dir, through, data_store=DATA_STORE, extra_trees=50,
+                 tolerance=0.02, min_gate_rows=MIN_GATE_ROWS):
+    """Warm-start one published model on the months after `through`; returns (passed, entry)."""
+    start = time.perf_counter()
+    df, features = _state_frame(state, data_store)
+    window, gate, new = update_split(df, through, min_gate_rows)
+    if gate.sum() < min_gate_rows or not window.any():
+        # Too little held-out data to tell a better model from a worse one: wait for more months
+        return False, {'rows': int(gate.sum()), 'passed': False,
+                       'reason': f"{int(new.sum())} new rows, the gate needs {min_gate_rows}"}
+    X, y = df[features], df[TARGET].to_numpy()
+    current = joblib.load(os.path.join(state_dir, MODEL_FILES[name]))
+
+    # Gate: the update may not do worse than the current model on rows neither has seen
+    candidate = warm_start(current, name, X[window], y[window], extra_trees)
+    current_scores = scores(y[gate], current.predict(X[gate]))
+    candidate_scores = scores(y[gate], candidate.predict(X[gate]))
+    passed = candidate_scores['rmse'] <= current_scores['rmse'] * (1 + tolerance)
+    gate_report = {'rows': int(gate.sum()), 'current': current_scores, 'updated': candidate_scores,
+                   'tolerance': tolerance, 'passed': bool(passed)}
+    if not passed:
+        return False, gate_report
+
+    # The published update also learns from the gate rows
+    model = warm_start(current, name, X[window | gate], y[window | gate], extra_trees)
+    path = os.path.join(version_dir, MODEL_FILES[name])
+    joblib.dump(model, path)
+    return True, {
+        'file': MODEL_FILES[name],
+        'sha256': file_sha256(path),
+        'added_trees': extra_trees,
+        'data_through': data_through(df),
+        'new_rows': int(new.sum()),
+        'window_rows': int((window | gate).sum()),
+        'gate': gate_report,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def update_all(states, root='models', data_store=DATA_STORE, workers=None, extra_trees=50, tolerance=0.02,
+               flat=True, keep=5, min_gate_rows=MIN_GATE_ROWS):
+    """Warm-start every state's published models on their new months and publish what passes the gate."""
+    version = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    jobs = {}
+    for state in states:
+        state_dir = os.path.join(root, state)
+        manifest_path = os.path.join(state_dir, MANIFEST)
+        if not os.path.exists(manifest_path) or source_fingerprint(state, data_store) is None:
+            print(f"⚠ {state}: no published manifest or no data, skipped (train it first).")
+            continue
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('data_through') is None:
+            print(f"⚠ {state}: manifest has no data_through; retrain with python -m serving.training {state}")
+            continue
+        # Each model is updated from the month it has learned up to (older manifests: the state's)
+        print(f"📂 {state}: new data from {source_fingerprint(state, data_store)['source']}")
+        df, _ = _state_frame(state, data_store)
+        behind = OrderedDict()
+        for name in MODEL_FILES:
+            model_through = manifest['models'].get(name, {}).get('data_through', manifest['data_through'])
+            if update_split(df, model_through, min_gate_rows) is not None:
+                behind[name] = model_through
+        if not behind:
+            through = manifest['data_through']
+            print(f"✅ {state}: models are up to date with the data ({through[0]}-{through[1]:02d})")
+            continue
+        os.makedirs(os.path.join(state_dir, VERSIONS_DIR, version), exist_ok=True)
+        jobs[state] = (manifest, behind)
+
+    results = {state: OrderedDict() for state in jobs}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(update_model, state, name, os.path.join(root, state),
+                        os.path.join(root, state, VERSIONS_DIR, version), model_through, data_store,
+                        extra_trees, tolerance, min_gate_rows): (state, name)
+            for state, (_, behind) in jobs.items() for name, model_through in behind.items()
+        }
+        for future in as_completed(futures):
+            state, name = futures[future]
+            try:
+                results[state][name] = future.result()
+            except Exception as e:
+                print(f"❌ {state} {name}: {e}")
+                results[state][name] = (False, {'error': str(e)})
+
+    published = {}
+    for state, (previous, behind) in jobs.items():
+        state_dir = os.path.join(root, state)
+        version_dir = os.path.join(state_dir, VERSIONS_DIR, version)
+        for name, (passed, entry) in results[state].items():
+            if not passed:
+                reason = entry.get('error') or entry.get('reason') or \
+                    f"failed the gate, RMSE {entry['current']['rmse']} -> {entry['updated']['rmse']}"
+                print(f"⚠ {state} {name}: kept the current model ({reason})")
+        if not any(passed for passed, _ in results[state].values()):
+            shutil.rmtree(version_dir, ignore_errors=True)
+            print(f"⚠ {state}: no model passed the gate, nothing published")
+            continue
+        manifest = {**previous, 'version': version, 'previous_version': previous['version'],
+                    'data': source_fingerprint(state, data_store),
+                    'updated_at': datetime.datetime.now().isoformat(timespec='seconds'), 'models': OrderedDict()}
+        for name in MODEL_FILES:
+            old_entry = {'file': MODEL_FILES[name], 'data_through': previous['data_through'],
+                         **previous['models'].get(name, {})}
+            passed, entry = results[state].get(name, (None, None))
+            if passed:
+                manifest['models'][name] = entry
+                print(f"✅ {state} {name}: +{entry['added_trees']} trees, gate RMSE "
+                      f"{entry['gate']['current']['rmse']} -> {entry['gate']['updated']['rmse']}")
+                continue
+            # Keep the current model (and how far it has learned) in the new version
+            _atomic_copy(os.path.join(state_dir, old_entry['file']), os.path.join(version_dir, old_entry['file']))
+            manifest['models'][name] = old_entry
+            if passed is not None:
+                manifest['models'][name] = {**old_entry, 'gate': entry}
+        # The state is only as current as its least current model
+        through = min(entry['data_through'] for entry in manifest['models'].values())
+        manifest['data_through'] = through
+        _atomic_write_json(os.path.join(version_dir, MANIFEST), manifest)
+        publish(state_dir, version_dir, manifest, flat)
+        prune_versions(state_dir, keep)
+        published[state] = manifest
+        print(f"📦 {state}: published update {version} (every model has data through {through[0]}-{through[1]:02d})")
+    return published
+
+
+if __name__ == '__main__':
+    from extraction.cli import load_config
+
+    parser = argparse.ArgumentParser(description="Train and publish the per-state soil moisture models")
+    parser.add_argument('states', nargs='*', help="default: every state in extraction/config.json with data")
+    parser.add_argument('--root', default='models')
+    parser.add_argument('--data-store', default=DATA_STORE)
+    parser.add_argument('--workers', type=int, help="parallel training jobs (default: all cores)")
+    parser.add_argument('--holdout-year', type=int, help="validation year (default: each state's latest)")
+    parser.add_argument('--max-rounds', type=int, default=2000, help="upper bound on boosting rounds")
+    parser.add_argument('--patience', type=int, default=50, help="rounds without improvement before stopping")
+    parser.add_argument('--keep', type=int, default=5, help="versions kept under models/<State>/versions")
+    parser.add_argument('--no-flat', action='store_true', help="skip the flat-array export")
+    parser.add_argument('--update', action='store_true', help="warm-start the published models on new months")
+    parser.add_argument('--extra-trees', type=int, default=50, help="trees added per model by --update")
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help="--update gate: allowed RMSE increase on the newest month (0.02 = 2%%)")
+    parser.add_argument('--min-gate-rows', type=int, default=MIN_GATE_ROWS,
+                        help="--update gate: fewest held-out rows (whole newest months) an update is judged on")
+    args = parser.parse_args()
+    states = args.states or list(load_config()['states'])
+    if args.update:
+        update_all(states, args.root, args.data_store, args.workers, args.extra_trees, args.tolerance,
+                   not args.no_flat, args.keep, args.min_gate_rows)
+    else:
+        train_all(states, args.root, args.data_store, args.workers, args.holdout_year, args.max_rounds,
+                  args.patience, not args.no_flat, args.keep)
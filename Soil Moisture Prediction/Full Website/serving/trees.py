@@ -0,0 +1,391 @@
+"""Flat-array export of the tree ensembles and a vectorized NumPy evaluator.
+
+Export (and check against the original models) from "Full Website":
+
+    python -m serving.trees                 # every state under models/
+    python -m serving.trees Bihar --check   # compare with the pickles, print timings
+
+Each model is written next to its pickle as flat/<pickle stem>.trees: a JSON
+header followed by the raw, aligned node arrays. Loading memory-maps the
+arrays instead of unpickling, so every worker process serving a model shares
+one page-cache copy of it. Exports are written to a temporary file and
+renamed into place, so a retrained model swaps in atomically; workers that
+still map the old file keep reading it until they reload.
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+FLAT_DIR = 'flat'
+FLAT_EXT = '.trees'
+MAGIC = b'FLATTRE1'
+ALIGN = 64
+BLOCK_ELEMENTS = 1 << 16  # rows x trees walked per step: small enough to stay in cache
+TREES_PER_BLOCK = 8
+
+
+class FlatEnsemble:
+    """A tree ensemble as flat node arrays.
+
+    All trees share one node table: feature (-1 for leaves), threshold,
+    children (left, right; a leaf points to itself), default_left (where
+    NaN goes) per node and value for leaves; roots holds each tree's first
+    node. A prediction is base + scale * (sum or mean over trees of the
+    reached leaf values). strict=True compares x < threshold (XGBoost),
+    otherwise x <= threshold (scikit-learn, LightGBM); inputs are cast to
+    input_dtype first so the comparisons match the original library exactly.
+    """
+
+    def __init__(self, feature, threshold, children, default_left, value, roots, base=0.0, scale=1.0,
+                 average=False, strict=False, input_dtype='float64', feature_names=None, kind='', max_depth=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.children = np.asarray(children, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base = float(base)
+        self.scale = float(scale)
+        self.average = bool(average)
+        self.strict = bool(strict)
+        self.input_dtype = str(input_dtype)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object) if feature_names is not None else None
+        self.kind = kind
+        self.max_depth = self._max_depth() if max_depth is None else int(max_depth)
+
+    def _max_depth(self):
+        frontier = self.roots
+        level = 0
+        while len(frontier):
+            internal = frontier[self.feature[frontier] >= 0]
+            frontier = self.children[internal].ravel()
+            level += 1
+        return max(level - 1, 0)
+
+    def _leaf_sum(self, X, roots):
+        """Sum of the leaf values each row of X reaches in the trees starting at `roots`.
+
+        Walks all (row, tree) pairs one level per step with flat gathers. X
+        carries a leading zero column so a leaf's feature (-1) reads it, and
+        leaves have an infinite threshold and point to themselves, so rows
+        that reached a leaf stay put without any masking.
+        """
+        n_rows, n_columns = X.shape
+        flat_x = X.ravel()
+        offsets = (np.arange(n_rows, dtype=np.int32) * n_columns + 1)[:, None]
+        node = np.repeat(roots[None, :], n_rows, axis=0)
+        missing = np.isnan(flat_x).any()
+        for _ in range(self.max_depth):
+            x = flat_x.take(offsets + self.feature.take(node))
+            threshold = self.threshold.take(node)
+            go_right = x >= threshold if self.strict else x > threshold
+            if missing:
+                go_right = np.where(np.isnan(x), ~self.default_left.take(node), go_right)
+            node = self.children.take(node * 2 + go_right)
+        return self.value.take(node).sum(axis=1)
+
+    def predict(self, X):
+        if self.feature_names_in_ is not None and hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=self.input_dtype)
+        padded = np.zeros((len(X), X.shape[1] + 1))
+        padded[:, 1:] = X
+        total = np.zeros(len(X))
+        rows_per_block = max(1, BLOCK_ELEMENTS // min(TREES_PER_BLOCK, len(self.roots)))
+        # Trees in small groups keep each group's nodes in cache while every row walks them
+        for first_tree in range(0, len(self.roots), TREES_PER_BLOCK):
+            roots = self.roots[first_tree:first_tree + TREES_PER_BLOCK]
+            for start in range(0, len(X), rows_per_block):
+                total[start:start + rows_per_block] += self._leaf_sum(padded[start:start + rows_per_block], roots)
+        if self.average:
+            total /= len(self.roots)
+        return self.base + self.scale * total
+
+    def arrays(self):
+        return {
+            'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+            'default_left': self.default_left, 'value': self.value, 'roots': self.roots,
+        }
+
+    def meta(self):
+        return {
+            'base': self.base, 'scale': self.scale, 'average': self.average, 'strict': self.strict,
+            'input_dtype': self.input_dtype, 'kind': self.kind, 'max_depth': self.max_depth,
+            'feature_names': list(self.feature_names_in_) if self.feature_names_in_ is not None else None,
+        }
+
+    def save(self, path):
+        """Write the ensemble as one memory-mappable file, replacing `path` atomically."""
+        arrays = self.arrays()
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+        header = json.dumps({'meta': self.meta(), 'arrays': layout}).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read an exported ensemble; with mmap the node arrays stay in the (shared) page cache."""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a flat tree export")
+            (header_size,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_size))
+            data_start = -(-(len(MAGIC) + 8 + header_size) // ALIGN) * ALIGN
+            arrays = {}
+            for name, spec in header['arrays'].items():
+                dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+                if mmap:
+                    arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=data_start + spec['offset'],
+                                             shape=shape)
+                else:
+                    f.seek(data_start + spec['offset'])
+                    arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        return cls(**arrays, **header['meta'])
+
+
+class _NodeTable:
+    def __init__(self):
+        self.feature, self.threshold, self.left, self.right = [], [], [], []
+        self.default_left, self.value = [], []
+
+    def add(self, feature=-1, threshold=0.0, default_left=True, value=0.0):
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.default_left.append(default_left)
+        self.value.append(value)
+        return len(self.feature) - 1
+
+    def build(self, roots, **options):
+        # Leaves point to themselves with an infinite threshold (see FlatEnsemble._leaf_sum)
+        feature = np.asarray(self.feature, dtype=np.int32)
+        leaf = feature < 0
+        index = np.arange(len(feature), dtype=np.int32)
+        children = np.column_stack([np.where(leaf, index, self.left), np.where(leaf, index, self.right)])
+        threshold = np.where(leaf, np.inf, np.asarray(self.threshold, dtype=np.float64))
+        return FlatEnsemble(feature, threshold, children, self.default_left, self.value, roots, **options)
+
+
+def _sklearn_trees(trees, table):
+    roots = []
+    for tree in trees:
+        offset = len(table.feature)
+        table.feature.extend(np.where(tree.children_left < 0, -1, tree.feature).tolist())
+        table.threshold.extend(tree.threshold.tolist())
+        table.left.extend(np.where(tree.children_left < 0, -1, tree.children_left + offset).tolist())
+        table.right.extend(np.where(tree.children_right < 0, -1, tree.children_right + offset).tolist())
+        # scikit-learn sends NaN to the side with more training samples when it has seen NaNs
+        missing_left = getattr(tree, 'missing_go_to_left', np.ones(tree.node_count, dtype=np.uint8))
+        table.default_left.extend(np.asarray(missing_left, dtype=bool).tolist())
+        table.value.extend(tree.value[:, 0, 0].tolist())
+        roots.append(offset)
+    return roots
+
+
+def _feature_names(model):
+    names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else None
+
+
+def export_random_forest(model):
+    table = _NodeTable()
+    roots = _sklearn_trees([estimator.tree_ for estimator in model.estimators_], table)
+    return table.build(roots, average=True, input_dtype='float32', feature_names=_feature_names(model),
+                       kind='RandomForestRegressor')
+
+
+def export_gradient_boosting(model):
+    if model.init_ == 'zero':
+        base = 0.0
+    elif hasattr(model.init_, 'constant_'):
+        base = float(np.ravel(model.init_.constant_)[0])
+    else:
+        raise ValueError(f"Unsupported GradientBoosting init estimator {model.init_!r}")
+    table = _NodeTable()
+    roots = _sklearn_trees([estimator.tree_ for estimator in model.estimators_[:, 0]], table)
+    return table.build(roots, base=base, scale=model.learning_rate, input_dtype='float32',
+                       feature_names=_feature_names(model), kind='GradientBoostingRegressor')
+
+
+def export_xgboost(model):
+    booster = model.get_booster()
+    names = booster.feature_names or [f'f{i}' for i in range(booster.num_features())]
+    params = json.loads(booster.save_config())['learner']
+    objective = params['objective']['name']
+    if objective not in ('reg:squarederror', 'reg:linear'):
+        raise ValueError(f"Unsupported XGBoost objective {objective}")
+    base = float(params['learner_model_param']['base_score'].strip('[]'))
+
+    table = _NodeTable()
+    roots = []
+
+    def add(node):
+        if 'leaf' in node:
+            return table.add(value=node['leaf'])
+        index = table.add(feature=names.index(node['split']),
+                          threshold=float(np.float32(node['split_condition'])),
+                          default_left=node['missing'] == node['yes'])
+        children = {child['nodeid']: child for child in node['children']}
+        table.left[index] = add(children[node['yes']])
+        table.right[index] = add(children[node['no']])
+        return index
+
+    for dump in booster.get_dump(dump_format='json'):
+        roots.append(add(json.loads(dump)))
+    return table.build(roots, base=base, strict=True, input_dtype='float32',
+                       feature_names=booster.feature_names, kind='XGBRegressor')
+
+
+def export_lightgbm(model):
+    dump = model.booster_.dump_model()
+    if dump['num_class'] != 1 or dump['objective'].split()[0] not in ('regression', 'regression_l2', 'l2'):
+        raise ValueError(f"Unsupported LightGBM objective {dump['objective']}")
+    table = _NodeTable()
+
+    def add(node):
+        if 'leaf_value' in node:
+            return table.add(value=node['leaf_value'])
+        if node['decision_type'] != '<=':
+            raise ValueError("Categorical LightGBM splits are not supported")
+        missing_type = node.get('missing_type', 'NaN')
+        if missing_type == 'Zero':
+            raise ValueError("LightGBM zero_as_missing splits are not supported")
+        # Without a learned direction (missing_type 'None') LightGBM scores NaN as 0.0
+        default_left = node['default_left'] if missing_type == 'NaN' else 0.0 <= node['threshold']
+        index = table.add(feature=node['split_feature'], threshold=node['threshold'], default_left=default_left)
+        table.left[index] = add(node['left_child'])
+        table.right[index] = add(node['right_child'])
+        return index
+
+    roots = [add(tree['tree_structure']) for tree in dump['tree_info']]
+    return table.build(roots, average=dump.get('average_output', False), feature_names=dump['feature_names'],
+                       kind='LGBMRegressor')
+
+
+EXPORTERS = {
+    'RandomForestRegressor': export_random_forest,
+    'GradientBoostingRegressor': export_gradient_boosting,
+    'XGBRegressor': export_xgboost,
+    'LGBMRegressor': export_lightgbm,
+}
+
+
+def export_model(model):
+    """FlatEnsemble for a fitted RF, GBR, XGBoost or LightGBM regressor."""
+    exporter = EXPORTERS.get(type(model).__name__)
+    if exporter is None:
+        raise ValueError(f"No flat export for {type(model).__name__}")
+    return exporter(model)
+
+
+def flat_path(model_path):
+    model_dir, file_name = os.path.split(model_path)
+    return os.path.join(model_dir, FLAT_DIR, os.path.splitext(file_name)[0] + FLAT_EXT)
+
+
+def served_path(model_path):
+    """The file to serve for a model: its flat export if that is not older than the pickle."""
+    path = flat_path(model_path)
+    try:
+        if os.stat(path).st_mtime_ns >= os.stat(model_path).st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    return model_path
+
+
+def is_flat(path):
+    return path.endswith(FLAT_EXT)
+
+
+def check_rows(feature_names, n_rows=2000, seed=0):
+    # Inputs spanning the band ranges seen in the training tables, plus calendar columns
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in feature_names:
+        if name == 'Year':
+            columns[name] = rng.integers(2019, 2035, n_rows).astype(float)
+        elif name == 'Month':
+            columns[name] = rng.integers(1, 13, n_rows).astype(float)
+        else:
+            columns[name] = rng.uniform(-0.2, 0.8, n_rows)
+    return np.column_stack([columns[name] for name in feature_names])
+
+
+def compare(model, flat, X, tolerance=1e-5):
+    """Max absolute difference between the original and the flat predictions."""
+    import pandas as pd
+
+    frame = pd.DataFrame(X, columns=list(flat.feature_names_in_)) if flat.feature_names_in_ is not None else X
+    expected = np.asarray(model.predict(frame), dtype=np.float64)
+    error = float(np.max(np.abs(expected - flat.predict(frame)))) if len(X) else 0.0
+    if error > tolerance:
+        raise AssertionError(f"{flat.kind}: flat predictions differ by {error:.3g} (> {tolerance})")
+    return error
+
+
+def export_state(model_dir, check=False, tolerance=1e-5):
+    import joblib
+    import pandas as pd
+
+    from serving.registry import ModelRegistry
+
+    root, state = os.path.split(os.path.normpath(model_dir))
+    for path in ModelRegistry(root).model_files(state).values():
+        file_name = os.path.basename(path)
+        start = time.perf_counter()
+        model = joblib.load(path)
+        pickle_load = time.perf_counter() - start
+        flat = export_model(model)
+        # Never publish an export that disagrees with its model
+        X = check_rows(list(flat.feature_names_in_) if flat.feature_names_in_ is not None
+                       else [f'f{i}' for i in range(int(flat.feature.max()) + 1)])
+        error = compare(model, flat, X, tolerance)
+        flat.save(flat_path(path))
+        line = f"✅ {file_name}: {len(flat.roots)} trees, {len(flat.feature)} nodes, max |diff| {error:.2e}"
+        if check:
+            start = time.perf_counter()
+            flat = FlatEnsemble.load(flat_path(path))
+            flat_load = time.perf_counter() - start
+            frame = pd.DataFrame(X[:120], columns=list(flat.feature_names_in_))  # a 10-year monthly forecast
+            timings = []
+            for predictor in (model, flat):
+                start = time.perf_counter()
+                for _ in range(20):
+                    predictor.predict(frame)
+                timings.append((time.perf_counter() - start) / 20 * 1000)
+            line += (f"; load {pickle_load * 1000:.1f} -> {flat_load * 1000:.1f} ms"
+                     f", predict(120 rows) {timings[0]:.2f} -> {timings[1]:.2f} ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the state models to flat arrays")
+    parser.add_argument('states', nargs='*', help="default: every state under --root")
+    parser.add_argument('--root', default='models')
+    parser.add_argument('--check', action='store_true', help="also print load and predict timings")
+    parser.add_argument('--tolerance', type=float, default=1e-5)
+    args = parser.parse_args()
+    for state in args.states or sorted(os.listdir(args.root)):
+        print(f"🚀 {state}")
+        export_state(os.path.join(args.root, state), args.check, args.tolerance)
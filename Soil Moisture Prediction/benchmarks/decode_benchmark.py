@@ -0,0 +1,108 @@
+"""Sample decoding: legacy per-feature dicts vs. columnar NumPy arrays.
+
+Run from the "Soil Moisture Prediction" folder:
+
+    python benchmarks/decode_benchmark.py            # benchmark the recorded page
+    python benchmarks/decode_benchmark.py --record   # re-record the fixture
+
+The fixture is one getInfo() page of the co-located training extraction
+(5 months x 1000 points, geometries included), recorded from the fake
+Earth Engine backend so it can be regenerated without credentials.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from extraction.decode import decode_samples, samples_to_frame
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'sample_page.json.gz')
+
+
+def record(path=FIXTURE):
+    from extraction import sources
+    from extraction.colocated import stack_builders
+    from extraction.composites import _sample_month
+    from extraction.fake_ee import FakeEarthEngine
+
+    client = FakeEarthEngine(latency=0)
+    region = client.Geometry.BBox(77.2, 15.8, 81.3, 19.9)
+    build = stack_builders(*(sources.builder(name) for name in ('sentinel2', 'landsat', 'smap')))
+    pages = [_sample_month(client, build(region, 2020, month, client), region, month, 750, 1000, 42,
+                           None, True, None) for month in range(1, 6)]
+    response = client.FeatureCollection(pages).flatten().getInfo()
+    with gzip.open(path, 'wt') as f:
+        json.dump(response, f)
+    print(f"Recorded {len(response['features'])} features to {path}")
+
+
+# What image_to_dataframe / yearly_samples did before the columnar decoder
+def legacy_decode(response):
+    features = response['features']
+    properties = [f['properties'] for f in features]
+    return pd.DataFrame(properties)
+
+
+def _time(fn, response, repeat):
+    fn(response)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(response)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    fn(response)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--record', action='store_true', help="re-record the fixture from the fake backend")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record()
+        return
+    with gzip.open(FIXTURE, 'rt') as f:
+        response = json.load(f)
+
+    # Same table either way
+    expected = legacy_decode(response)
+    decoded = samples_to_frame(response)
+    pd.testing.assert_frame_equal(decoded, expected[decoded.columns], check_dtype=False)
+    arrays = decode_samples(response, coords=True)
+    assert np.allclose(arrays['lon'], [f['geometry']['coordinates'][0] for f in response['features']])
+
+    print(f"{len(response['features'])} features, {len(expected.columns)} properties")
+    candidates = [
+        ('legacy dicts -> DataFrame', legacy_decode),
+        ('columnar -> DataFrame', samples_to_frame),
+        ('columnar arrays', decode_samples),
+        ('columnar arrays float32', lambda r: decode_samples(r, dtype=np.float32)),
+        ('columnar arrays + lon/lat', lambda r: decode_samples(r, coords=True)),
+    ]
+    baseline = None
+    for name, fn in candidates:
+        elapsed, peak = _time(fn, response, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:28s} {elapsed * 1000:8.2f} ms  {baseline / elapsed:5.2f}x  peak {peak / 1e6:6.2f} MB")
+
+    # Parsing the response body (inside getInfo) also shrinks once geometries are not requested
+    without = {**response, 'features': [{**f, 'geometry': None} for f in response['features']]}
+    for name, payload in (('with geometries', json.dumps(response)), ('without geometries', json.dumps(without))):
+        elapsed, _ = _time(json.loads, payload, args.repeat)
+        print(f"JSON parse {name:17s} {elapsed * 1000:8.2f} ms  {len(payload) / 1e6:6.2f} MB payload")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Benchmark suite for the prediction service and the extractors.
+
+Run from the "Soil Moisture Prediction" folder:
+
+    python benchmarks/suite.py                               # every group, summary + JSON
+    python benchmarks/suite.py --groups e2e micro --quick
+    python benchmarks/suite.py --output base.json
+    python benchmarks/suite.py --baseline base.json --threshold 0.25   # exit 1 on regressions
+
+Groups:
+  e2e         POST /predict through the Flask test client, per state and
+              horizon, cold (fresh model/climatology caches) and warm
+  micro       get_monthly_climatology, generate_future_data and
+              evaluate_model on synthetic data of increasing size
+  extraction  the extraction jobs against the fake Earth Engine backend,
+              per configured latency
+
+The app runs in a throwaway workspace with seeded synthetic training tables
+and freshly fitted models (the repo ships neither), so runs are comparable
+across machines only through --baseline on the same machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB = os.path.join(ROOT, 'Full Website')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, WEB)
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ['S2_B4', 'S2_B5', 'S2_B6', 'S2_B7', 'S2_B8', 'L8_B4', 'L8_B5', 'L8_B6', 'L8_B7']
+MODEL_FILES = {
+    "Random Forest": 'Random_Forest.pkl',
+    "XGBoost": 'XGB_model.pkl',
+    "LightGBM": 'LGBM_model.pkl',
+    "GBR Model": 'GBR_model.pkl',
+}
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {'median_ms': round(float(np.median(ms)), 3), 'min_ms': round(float(ms.min()), 3),
+            'p90_ms': round(float(np.percentile(ms, 90)), 3), 'runs': len(ms)}
+
+
+def timed(fn, repeat=5, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def synthetic_table(rows, seed=0):
+    # Band values, calendar columns and a seasonal soil-moisture target
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.uniform(0, 0.5, (rows, len(FEATURES))), columns=FEATURES)
+    df['Year'] = rng.integers(2019, 2024, rows)
+    df['Month'] = rng.integers(1, 13, rows)
+    df['sm_surface'] = (0.1 + 0.3 * df['S2_B8'] + 0.02 * np.sin(df['Month'] / 12 * 2 * np.pi)
+                        + rng.normal(0, 0.01, rows))
+    return df
+
+
+def fit_models(df, n_estimators=100, seed=0):
+    from lightgbm import LGBMRegressor
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from xgboost import XGBRegressor
+
+    X, y = df[FEATURES + ['Year', 'Month']], df['sm_surface']
+    return {
+        "Random Forest": RandomForestRegressor(n_estimators, max_depth=12, n_jobs=-1, random_state=seed).fit(X, y),
+        "XGBoost": XGBRegressor(n_estimators=n_estimators, max_depth=6, random_state=seed).fit(X, y),
+        "LightGBM": LGBMRegressor(n_estimators=n_estimators, random_state=seed, verbose=-1).fit(X, y),
+        "GBR Model": GradientBoostingRegressor(n_estimators=n_estimators, random_state=seed).fit(X, y),
+    }
+
+
+def make_workspace(path, states, rows=5000, n_estimators=100):
+    """Data CSVs and models/<State>/ in the layout app.py reads from its working directory."""
+    import joblib
+
+    for i, state in enumerate(states):
+        df = synthetic_table(rows, seed=i)
+        df.to_csv(os.path.join(path, f"Data - {state} Done.csv"), index=False)
+        model_dir = os.path.join(path, 'models', state)
+        os.makedirs(model_dir, exist_ok=True)
+        for name, model in fit_models(df, n_estimators, seed=i).items():
+            joblib.dump(model, os.path.join(model_dir, MODEL_FILES[name]))
+    return path
+
+
+def load_app():
+    # The app reads models/, data and caches relative to the working directory
+    os.environ.setdefault('LOG_REQUESTS', '0')
+    os.environ['DATA_STORE'] = os.path.abspath('data_store')  # Not the project's real store
+    import app as web
+    return web
+
+
+def reset_app_caches(web):
+    # What a freshly started worker sees: nothing loaded, no climatology artifacts
+    from serving.climatology import ClimatologyStore
+    from serving.registry import ModelRegistry
+
+    old = web.registry
+    web.registry = ModelRegistry(old.root, old.memory_budget, old.check_interval, loader=old.loader,
+                                 resolve=old.resolve)
+    shutil.rmtree('climatology', ignore_errors=True)
+    web.climatology = ClimatologyStore(web.DATA_STORE, 'climatology')
+
+
+def bench_e2e(states, horizons, repeat):
+    web = load_app()
+    client = web.app.test_client()
+    results = {}
+    for state in states:
+        for years in horizons:
+            form = {'region': state, 'years': str(years)}
+
+            def post():
+                response = client.post('/predict', data=form)
+                assert response.status_code == 200, response.status_code
+
+            cold = []
+            for _ in range(max(1, repeat // 2)):
+                reset_app_caches(web)
+                start = time.perf_counter()
+                post()
+                cold.append(time.perf_counter() - start)
+            results[f'e2e/predict/{state}/{years}y/cold'] = summarize(cold)
+            results[f'e2e/predict/{state}/{years}y/warm'] = timed(post, repeat)
+    return results
+
+
+def bench_micro(sizes, repeat):
+    import joblib
+
+    from serving.trees import export_model
+
+    web = load_app()
+    results = {}
+    for rows in sizes:
+        state = f'Bench{rows}'
+        synthetic_table(rows).to_csv(f"Data - {state} Done.csv", index=False)
+
+        def cold_climatology():
+            reset_app_caches(web)
+            return web.get_monthly_climatology(state)
+        results[f'micro/get_monthly_climatology/{rows}rows/cold'] = timed(cold_climatology, repeat, warmup=0)
+        results[f'micro/get_monthly_climatology/{rows}rows/warm'] = timed(
+            lambda: web.get_monthly_climatology(state), repeat)
+        os.remove(f"Data - {state} Done.csv")
+
+    columns, monthly_avg = web.get_monthly_climatology(web.registry.states()[0])
+    for years in (1, 5, 10):
+        results[f'micro/generate_future_data/{years}y'] = timed(
+            lambda: web.generate_future_data(monthly_avg, years, columns), repeat)
+
+    state = web.registry.states()[0]
+    for name, file_name in MODEL_FILES.items():
+        model = joblib.load(os.path.join('models', state, file_name))
+        variants = [(name, model)]
+        try:
+            variants.append((f'{name} flat', export_model(model)))
+        except ValueError:
+            pass
+        for rows in sizes:
+            X = synthetic_table(rows, seed=1)[FEATURES + ['Year', 'Month']]
+            for label, predictor in variants:
+                results[f'micro/evaluate_model/{label}/{rows}rows'] = timed(
+                    lambda: web.evaluate_model(predictor, X), repeat)
+    return results
+
+
+def bench_extraction(latencies, states, workers, datasets=('training', 'landsat')):
+    from extraction.cache import SampleCache
+    from extraction.cli import _job, load_config
+    from extraction.fake_ee import FakeEarthEngine
+    from extraction.scheduler import ExtractionScheduler, month_tasks, year_tasks
+
+    config = load_config()
+    results = {}
+    for latency in latencies:
+        for name in datasets:
+            mode = 'monthly' if name == 'landsat' else 'yearly'
+            client = FakeEarthEngine(latency=latency)
+            regions = {state: client.Geometry.BBox(*config['states'][state]['bbox']) for state in states}
+            tasks = month_tasks(regions, [2020]) if mode == 'monthly' else year_tasks(regions, [2020])
+            scheduler = ExtractionScheduler(client, max_workers=workers, rate=1000.0)
+            cache = SampleCache(tempfile.mkdtemp(prefix='bench-cache-'))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # the jobs print per-task progress
+                output = scheduler.run(_job(name, config, client, cache, mode), tasks)
+            seconds = time.perf_counter() - start
+            rows = sum(len(df) for df in output.values())
+            results[f'extraction/{name}/{mode}/latency{latency}s'] = {
+                **summarize([seconds]), 'rows': rows, 'ee_calls': client.calls,
+                'rows_per_s': round(rows / seconds, 1), 'calls_per_s': round(client.calls / seconds, 2),
+            }
+            shutil.rmtree(cache.root, ignore_errors=True)
+    return results
+
+
+def environment():
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+        'platform': platform.platform(), 'cpus': os.cpu_count(), 'numpy': np.__version__,
+        'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+    }
+
+
+def regressions(results, baseline, threshold):
+    """Benchmarks whose median got more than `threshold` (0.25 = 25%) slower than the baseline."""
+    slower = []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before.get('median_ms'):
+            continue
+        ratio = current['median_ms'] / before['median_ms']
+        if ratio > 1 + threshold:
+            slower.append((name, before['median_ms'], current['median_ms'], ratio))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups', nargs='+', choices=('e2e', 'micro', 'extraction'),
+                        default=['e2e', 'micro', 'extraction'])
+    parser.add_argument('--states', nargs='+', default=['Bihar', 'Rajasthan'])
+    parser.add_argument('--horizons', nargs='+', type=int, default=[1, 5, 10])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument('--latencies', nargs='+', type=float, default=[0.0, 0.05])
+    parser.add_argument('--workers', type=int, default=4, help="extraction worker threads")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=5000, help="training rows per synthetic state")
+    parser.add_argument('--estimators', type=int, default=100)
+    parser.add_argument('--quick', action='store_true', help="one state, small sizes, 3 repeats")
+    parser.add_argument('--workspace', help="reuse (or create) this workspace instead of a temporary one")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs the baseline")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.states, args.horizons, args.sizes, args.repeat = args.states[:1], [1, 10], [1_000, 10_000], 3
+        args.latencies, args.estimators = [0.0], min(args.estimators, 50)
+
+    workspace = os.path.abspath(args.workspace or tempfile.mkdtemp(prefix='soil-bench-'))
+    os.makedirs(workspace, exist_ok=True)
+    if not os.path.isdir(os.path.join(workspace, 'models')):
+        print(f"🔧 Building workspace in {workspace}", file=sys.stderr)
+        make_workspace(workspace, args.states, args.rows, args.estimators)
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    results = {}
+    try:
+        if 'e2e' in args.groups:
+            results.update(bench_e2e(args.states, args.horizons, args.repeat))
+        if 'micro' in args.groups:
+            results.update(bench_micro(args.sizes, args.repeat))
+        if 'extraction' in args.groups:
+            results.update(bench_extraction(args.latencies, args.states, args.workers))
+    finally:
+        os.chdir(cwd)
+        if not args.workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {'environment': environment(), 'settings': vars(args), 'results': results}
+    for name, result in results.items():
+        extra = f"  {result['rows_per_s']:>10.1f} rows/s" if 'rows_per_s' in result else ''
+        print(f"{name:58s} {result['median_ms']:10.2f} ms{extra}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = regressions(results, baseline, args.threshold)
+        for name, before, after, ratio in slower:
+            print(f"❌ {name}: {before:.2f} -> {after:.2f} ms ({ratio:.2f}x)", file=sys.stderr)
+        if slower:
+            return 1
+        print(f"✅ No benchmark more than {args.threshold:.0%} slower than {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Shared Earth Engine extraction helpers for the soil moisture scripts."""
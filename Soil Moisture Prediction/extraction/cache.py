@@ -0,0 +1,110 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+
+def region_bbox(region):
+    # Client-side geometries (ee.Geometry.BBox) serialise without a round trip
+    coords = region.toGeoJSON()['coordinates'][0]
+    lons = [c[0] for c in coords]
+    lats = [c[1] for c in coords]
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+def sample_key(dataset_id, bbox, start, end, bands, scale, num_pixels, seed, **options):
+    """Content address of one month's sample: same request, same key.
+
+    Extra sampling options (projection, server-side subsetting) that change
+    the result are folded into the key too.
+    """
+    request = {
+        'dataset_id': dataset_id,
+        'bbox': [round(float(v), 6) for v in bbox],
+        'start': str(start),
+        'end': str(end),
+        'bands': list(bands),
+        'scale': scale,
+        'num_pixels': num_pixels,
+        'seed': seed,
+    }
+    request.update({name: value for name, value in options.items() if value is not None})
+    payload = json.dumps(request, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest(), request
+
+
+# On-disk cache of sampled months plus a manifest of what is done, empty or failed
+class SampleCache:
+    def __init__(self, root='extraction_cache'):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    def _object_path(self, key):
+        return os.path.join(self.root, 'objects', key[:2], f'{key}.csv')
+
+    def _record(self, key, entry):
+        entry['updated'] = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self.manifest[key] = entry
+            tmp_path = f'{self.manifest_path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    def get(self, key):
+        """Cached DataFrame for key, or None when it still has to be fetched."""
+        import pandas as pd
+
+        entry = self.manifest.get(key)
+        if entry is None or entry['status'] == 'failed':
+            return None
+        if entry['status'] == 'empty':
+            return pd.DataFrame()
+        path = self._object_path(key)
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path)
+
+    def put(self, key, request, df):
+        if df.empty:
+            self._record(key, {'status': 'empty', 'request': request, 'rows': 0})
+            return
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        self._record(key, {'status': 'done', 'request': request, 'rows': len(df)})
+
+    def mark_failed(self, key, request, error):
+        self._record(key, {'status': 'failed', 'request': request, 'error': str(error)})
+
+    def report(self):
+        """Coverage per dataset and the list of failed requests."""
+        coverage = {}
+        failures = []
+        for key, entry in sorted(self.manifest.items(), key=lambda item: item[1]['request']['start']):
+            request = entry['request']
+            counts = coverage.setdefault(request['dataset_id'], {'done': 0, 'empty': 0, 'failed': 0, 'rows': 0})
+            counts[entry['status']] += 1
+            counts['rows'] += entry.get('rows', 0)
+            if entry['status'] == 'failed':
+                failures.append({'key': key, 'start': request['start'], 'bbox': request['bbox'],
+                                 'dataset_id': request['dataset_id'], 'error': entry['error']})
+        return {'coverage': coverage, 'failures': failures}
+
+    def print_report(self):
+        report = self.report()
+        for dataset_id, counts in report['coverage'].items():
+            print(f"📦 {dataset_id}: {counts['done']} done, {counts['empty']} empty, "
+                  f"{counts['failed']} failed ({counts['rows']} rows)")
+        for failure in report['failures']:
+            print(f"   ❌ {failure['dataset_id']} {failure['start']} {failure['bbox']}: {failure['error']}")
@@ -0,0 +1,315 @@
+"""Headless extraction entry point: python -m extraction {plan,run,update,report}.
+
+Only the standard library is imported up front; Earth Engine, pandas and
+pyarrow are loaded by the commands that need them, so --help and plan
+start instantly on batch nodes.
+"""
+import argparse
+import copy
+import datetime
+import json
+import math
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # "Soil Moisture Prediction"
+DEFAULT_CONFIG = os.path.join(PROJECT_DIR, 'extraction', 'config.json')
+DATASET_NAMES = ('landsat', 'sentinel2', 'smap', 'training', 'grid')
+DEFAULT_DATASETS = ('landsat', 'sentinel2', 'smap', 'training')  # The map grid is only extracted on request
+SENSOR_DATASETS = ('sentinel2', 'landsat', 'smap')  # Stacking order of the training table
+
+
+def load_config(path=DEFAULT_CONFIG):
+    with open(path) as f:
+        config = json.load(f)
+    # Relative store/cache paths are relative to the project folder, not the working directory,
+    # so the extractors, the web app and the training/map tools all use the same data store
+    # (DATA_STORE overrides it for all of them)
+    config['store'] = os.environ.get('DATA_STORE') or os.path.join(PROJECT_DIR, config['store'])
+    config['cache'] = os.path.join(PROJECT_DIR, config['cache'])
+    # "Data - {State} Done.csv" exports go where the web app reads them
+    config['csv_dir'] = os.path.join(PROJECT_DIR, config.get('csv_dir', 'Full Website'))
+    return config
+
+
+def data_store_path(config_path=DEFAULT_CONFIG):
+    """Absolute path of the partitioned data store every tool reads and writes."""
+    return load_config(config_path)['store']
+
+
+def parse_years(text):
+    # "2020", "2019-2023" or "2019,2021"
+    years = []
+    for part in text.split(','):
+        start, _, end = part.partition('-')
+        years.extend(range(int(start), int(end or start) + 1))
+    return years
+
+
+def dataset_settings(config, name):
+    """Built-in collection/band settings for a sensor, overridden by the config."""
+    from extraction.sources import DATASETS
+
+    settings = copy.deepcopy(DATASETS.get(name, {}))
+    settings.update(config.get('datasets', {}).get(name, {}))
+    return settings
+
+
+def _selection(config, args):
+    states = args.states or list(config['states'])
+    unknown = sorted(set(states) - set(config['states']))
+    if unknown:
+        raise SystemExit(f"Unknown state(s) {unknown}; configured: {sorted(config['states'])}")
+    years = parse_years(args.years) if getattr(args, 'years', None) else \
+        list(range(config['years']['start'], config['years']['end'] + 1))
+    return states, years, args.datasets or list(DEFAULT_DATASETS)
+
+
+def plan(config, args):
+    # Dry run: tiles and requests per state-year, no Earth Engine involved
+    from extraction.composites import MAX_FEATURES_PER_REQUEST
+    from extraction.tiling import allocate_rows, split_bbox
+
+    states, years, datasets = _selection(config, args)
+    sampling = config['sampling']
+    total = 0
+    for state in states:
+        tiles = split_bbox(config['states'][state]['bbox'], sampling['scale'], sampling['max_tile_pixels'])
+        for name in datasets:
+            target_rows = dataset_settings(config, name)['target_rows']
+            quotas = allocate_rows(tiles, target_rows, sampling['scale'])
+            requests = sum(math.ceil(12 * math.ceil(quota * 1.5) / MAX_FEATURES_PER_REQUEST) for quota in quotas)
+            total += requests * len(years)
+            print(f"{state:14s} {name:10s} {len(tiles)} tiles, {target_rows} rows/month, "
+                  f"{requests} requests/year x {len(years)} years")
+    print(f"Total: {total} Earth Engine requests")
+
+
+def make_client(backend='ee', fake_latency=0.05, memoize=True):
+    """The Earth Engine client every extractor uses, wrapped in the tracer."""
+    # Every round trip goes through the tracer: per-dataset/state accounting, identical requests sent once
+    from extraction.tracing import TracingClient
+
+    if backend == 'fake':
+        from extraction.fake_ee import FakeEarthEngine
+        return TracingClient(FakeEarthEngine(latency=fake_latency), memoize=memoize)
+
+    import ee
+
+    # Authenticate and initialize Earth Engine
+    try:
+        ee.Initialize()
+    except Exception:
+        ee.Authenticate()
+        ee.Initialize()
+    return TracingClient(ee, memoize=memoize)
+
+
+def _client(args):
+    return make_client(args.backend, args.fake_latency, memoize=not args.no_memo)
+
+
+def _months(month):
+    # Year-level jobs sample every month, or just `month` when one is given
+    return range(1, 13) if month is None else [month]
+
+
+def _period(year, month):
+    return f"{year} (all months)" if month is None else f"{year}-{month:02d}"
+
+
+def _job(name, config, client, cache, mode):
+    from extraction import sources
+
+    sampling = config['sampling']
+    tiling = {'scale': sampling['scale'], 'seed': sampling['seed'],
+              'max_tile_pixels': sampling['max_tile_pixels']}
+
+    if name in ('training', 'grid'):
+        from extraction.colocated import GRID_COLUMNS, JOINED_COLUMNS, colocated_samples
+
+        # The map grid is the feature sensors alone (no SMAP target), with pixel coordinates
+        sensors = SENSOR_DATASETS if name == 'training' else SENSOR_DATASETS[:2]
+        builders = [sources.builder(sensor, dataset_settings(config, sensor)) for sensor in sensors]
+        specs = [sources.cache_spec(sensor, dataset_settings(config, sensor)) for sensor in sensors]
+        spec = {'dataset_id': '+'.join(s['dataset_id'] for s in specs),
+                'bands': [band for s in specs for band in s['bands']], 'window': specs[0]['window']}
+        target_rows = dataset_settings(config, name)['target_rows']
+        columns = JOINED_COLUMNS if name == 'training' else GRID_COLUMNS
+
+        def extract_colocated(client, region, year, month=None):
+            print(f"   🔄 {name} {_period(year, month)} (co-located)")
+            return colocated_samples(client, builders, region, year, target_rows=target_rows,
+                                     scale=sampling['scale'], seed=sampling['seed'], cache=cache, cache_spec=spec,
+                                     months=_months(month), columns=columns, geometries=(name == 'grid'),
+                                     max_tile_pixels=sampling['max_tile_pixels'])
+        return extract_colocated
+
+    settings = dataset_settings(config, name)
+    build = sources.builder(name, settings)
+
+    if mode == 'monthly':
+        # One request per month, sampled over the whole state box
+        def extract_month(client, region, year, month):
+            print(f"   🔄 {name} {year}-{month:02d}")
+            df = sources.image_to_dataframe(build(region, year, month, client), region,
+                                            scale=sampling['scale'], numPixels=settings['target_rows'])
+            if not df.empty:
+                df['Year'] = year
+                df['Month'] = month
+            return df
+        return extract_month
+
+    from extraction.tiling import tiled_yearly_samples
+
+    def extract_year(client, region, year, month=None):
+        print(f"   🔄 {name} {_period(year, month)}")
+        return tiled_yearly_samples(client, build, region, year, settings['target_rows'],
+                                    projection=settings.get('projection'), cache=cache,
+                                    cache_spec=sources.cache_spec(name, settings), months=_months(month), **tiling)
+    return extract_year
+
+
+def _export_csv(config, name, states):
+    # The web app's "Data - {State} Done.csv" layout
+    from extraction.store import read_partitions
+
+    if name == 'training' and dataset_settings(config, name).get('export_csv'):
+        os.makedirs(config['csv_dir'], exist_ok=True)
+        for state in states:
+            joined = read_partitions(config['store'], 'training', states=[state])
+            if not joined.empty:
+                path = os.path.join(config['csv_dir'], f"Data - {state} Done.csv")
+                joined.to_csv(path, index=False)
+                print(f"📄 {state} training table exported to {path}")
+
+
+def _saver(writer, name):
+    # Each finished job is streamed straight into its month partitions
+    def save_result(key, df):
+        state, year, month = key
+        paths = writer.write_frame(state, df.dropna())
+        print(f"✅ {name} saved for {state}, {_period(year, month)} ({len(df)} rows, {len(paths)} months).")
+    return save_result
+
+
+def run(config, args):
+    from extraction.cache import SampleCache
+    from extraction.scheduler import ExtractionScheduler, month_tasks, year_tasks
+    from extraction.store import PartitionedWriter
+    from extraction.tracing import labels
+
+    states, years, datasets = _selection(config, args)
+    if args.mode == 'monthly' and set(datasets) - {'landsat', 'sentinel2'}:
+        raise SystemExit("--mode monthly only applies to landsat and sentinel2")
+
+    client = _client(args)
+    regions = {state: client.Geometry.BBox(*config['states'][state]['bbox']) for state in states}
+    cache = SampleCache(config['cache'])
+    scheduler = ExtractionScheduler(client, **config['scheduler'])
+
+    for name in datasets:
+        print(f"🚀 {name}: {', '.join(states)} {years[0]}-{years[-1]}")
+        writer = PartitionedWriter(config['store'], name)
+        tasks = month_tasks(regions, years) if args.mode == 'monthly' else year_tasks(regions, years)
+        with labels(dataset=name):
+            scheduler.run(_job(name, config, client, cache, args.mode), tasks, on_result=_saver(writer, name))
+        _export_csv(config, name, states)
+
+    cache.print_report()
+    client.print_report()
+    print("✅✅✅ All data extracted successfully! 🚀")
+
+
+def parse_month(text):
+    year, month = text.split('-')
+    return int(year), int(month)
+
+
+def last_complete_month(today=None):
+    today = today or datetime.date.today()
+    return (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+
+def months_between(after, until):
+    """(year, month) for every month after `after` up to and including `until`."""
+    year, month = after
+    months = []
+    while True:
+        year, month = (year, month + 1) if month < 12 else (year + 1, 1)
+        if (year, month) > tuple(until):
+            return months
+        months.append((year, month))
+
+
+def pending_months(config, name, state, until):
+    # Months newer than what the store holds; an empty state starts at the configured first year
+    from extraction.store import latest_partition
+
+    latest = latest_partition(config['store'], name, state) or (config['years']['start'] - 1, 12)
+    return months_between(latest, until)
+
+
+def update(config, args):
+    """Fetch only the months after each state's newest stored partition."""
+    from extraction.cache import SampleCache
+    from extraction.scheduler import ExtractionScheduler
+    from extraction.store import PartitionedWriter
+    from extraction.tracing import labels
+
+    states, _, datasets = _selection(config, args)
+    until = parse_month(args.until) if args.until else last_complete_month()
+    client = _client(args)
+    regions = {state: client.Geometry.BBox(*config['states'][state]['bbox']) for state in states}
+    cache = SampleCache(config['cache'])
+    scheduler = ExtractionScheduler(client, **config['scheduler'])
+
+    for name in datasets:
+        tasks = [(state, regions[state], year, month)
+                 for state in states for year, month in pending_months(config, name, state, until)]
+        if not tasks:
+            print(f"✅ {name}: up to date through {until[0]}-{until[1]:02d}")
+            continue
+        print(f"🚀 {name}: {len(tasks)} new state-months through {until[0]}-{until[1]:02d}")
+        writer = PartitionedWriter(config['store'], name)
+        with labels(dataset=name):
+            scheduler.run(_job(name, config, client, cache, 'yearly'), tasks, on_result=_saver(writer, name))
+        _export_csv(config, name, sorted({task[0] for task in tasks}))
+
+    cache.print_report()
+    client.print_report()
+
+
+def report(config, args):
+    from extraction.cache import SampleCache
+
+    SampleCache(config['cache']).print_report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m extraction',
+                                     description="Satellite feature/target extraction for soil moisture models")
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help="JSON config with states, years and datasets")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for command, help_text in (('plan', "show tiles and request counts without contacting Earth Engine"),
+                               ('run', "extract and write the partitioned datasets"),
+                               ('update', "extract only the months newer than what is stored")):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('--states', nargs='+', help="state keys from the config (default: all)")
+        if command != 'update':
+            sub.add_argument('--years', help="e.g. 2020, 2019-2023 or 2019,2021 (default: config range)")
+        sub.add_argument('--datasets', nargs='+', choices=DATASET_NAMES, help="default: all but grid")
+    run_parser = commands.choices['run']
+    run_parser.add_argument('--mode', choices=('yearly', 'monthly'), default='yearly')
+    update_parser = commands.choices['update']
+    update_parser.add_argument('--until', help="last month to fetch, YYYY-MM (default: last complete month)")
+    for sub in (run_parser, update_parser):
+        sub.add_argument('--backend', choices=('ee', 'fake'), default='ee',
+                         help="'fake' uses the local stand-in for smoke tests")
+        sub.add_argument('--fake-latency', type=float, default=0.05)
+        sub.add_argument('--no-memo', action='store_true', help="send identical Earth Engine requests again")
+    commands.add_parser('report', help="print cache coverage and failures")
+
+    args = parser.parse_args(argv)
+    config = load_config(args.config)
+    {'plan': plan, 'run': run, 'update': update, 'report': report}[args.command](config, args)
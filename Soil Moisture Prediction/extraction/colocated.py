@@ -0,0 +1,46 @@
+from extraction.cache import region_bbox
+from extraction.composites import yearly_samples
+from extraction.tiling import MAX_TILE_PIXELS, tiled_sample
+
+S2_BANDS = ['S2_B4', 'S2_B5', 'S2_B6', 'S2_B7', 'S2_B8']
+L8_BANDS = ['L8_B4', 'L8_B5', 'L8_B6', 'L8_B7']
+TARGET = 'sm_surface'
+
+# Column layout of the joined training table (same order as static/results.csv)
+JOINED_COLUMNS = S2_BANDS + L8_BANDS + ['Year', 'Month', TARGET]
+
+# Feature grid for map inference: the model features of every sampled pixel, with its position
+GRID_COLUMNS = ['lon', 'lat'] + S2_BANDS + L8_BANDS + ['Year', 'Month']
+
+
+def stack_builders(*builders):
+    # One image per month carrying every sensor's renamed bands
+    def build(region, year, month, client):
+        image = builders[0](region, year, month, client)
+        for builder in builders[1:]:
+            image = image.addBands(builder(region, year, month, client))
+        return image
+    return build
+
+
+def colocated_samples(client, builders, region, year, target_rows=1000, scale=750, seed=42,
+                      cache=None, cache_spec=None, months=range(1, 13), columns=JOINED_COLUMNS, geometries=False,
+                      max_tile_pixels=MAX_TILE_PIXELS):
+    """Sample the stacked Sentinel-2 + Landsat + SMAP image at shared points.
+
+    Every row comes from the same pixel for all sensors, so the result is the
+    joined feature+target table; points where any sensor is masked are dropped
+    per tile before the stratified merge keeps target_rows rows per month.
+    With columns=GRID_COLUMNS and geometries=True (and no SMAP builder) it is
+    the feature grid used for state-wide maps instead.
+    """
+    stacked = stack_builders(*builders)
+
+    def fetch_tile(tile, num_pixels, tile_seed):
+        df = yearly_samples(client, stacked, client.Geometry.BBox(*tile), year, scale=scale,
+                            num_pixels=num_pixels, seed=tile_seed, cache=cache, cache_spec=cache_spec,
+                            geometries=geometries, months=months)
+        return df.reindex(columns=columns).dropna().reset_index(drop=True) if not df.empty else df
+
+    return tiled_sample(fetch_tile, region_bbox(region), target_rows, scale=scale, seed=seed,
+                        max_tile_pixels=max_tile_pixels)
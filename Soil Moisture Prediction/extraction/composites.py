@@ -0,0 +1,123 @@
+import datetime
+
+from extraction.cache import region_bbox, sample_key
+from extraction.scheduler import is_throttle_error
+
+# getInfo() refuses collections with more than 5000 elements
+MAX_FEATURES_PER_REQUEST = 5000
+SUBSET_COLUMN = '_subset'
+
+
+# Sample one month's composite and tag every point with its Month.
+# Empty composites (no images that month) have no bands; the If() swaps them
+# for an empty collection server-side, so they cost nothing extra.
+def _sample_month(client, image, region, month, scale, num_pixels, seed, projection, geometries,
+                  rows_per_month):
+    options = dict(region=region, scale=scale, numPixels=num_pixels, geometries=geometries)
+    if seed is not None:
+        options['seed'] = seed
+    if projection is not None:
+        options['projection'] = projection
+    sampled = image.sample(**options)
+    if rows_per_month is not None:
+        # Random subset on the server so only the rows we keep are transferred
+        sampled = sampled.randomColumn(SUBSET_COLUMN, seed or 0).sort(SUBSET_COLUMN).limit(rows_per_month)
+    sampled = sampled.map(lambda feature: feature.set('Month', month))
+    has_bands = image.bandNames().size().gt(0)
+    return client.FeatureCollection(client.Algorithms.If(has_bands, sampled, client.FeatureCollection([])))
+
+
+def _month_pages(months, num_pixels, max_features):
+    per_page = max(1, max_features // max(1, num_pixels))
+    return [months[i:i + per_page] for i in range(0, len(months), per_page)]
+
+
+def month_window(year, month, days=30):
+    start = datetime.date(year, month, 1)
+    return start.isoformat(), (start + datetime.timedelta(days=days)).isoformat()
+
+
+def _month_keys(cache_spec, region, year, months, scale, num_pixels, seed, projection, rows_per_month,
+                geometries=False):
+    bbox = region_bbox(region)
+    # Samples with coordinates are cached apart from the same points without them
+    options = {'geometries': True} if geometries else {}
+    keys = {}
+    for month in months:
+        start, end = cache_spec['window'](year, month)
+        keys[month] = sample_key(cache_spec['dataset_id'], bbox, start, end, cache_spec['bands'],
+                                 scale, num_pixels, seed, projection=projection,
+                                 rows_per_month=rows_per_month, **options)
+    return keys
+
+
+def yearly_samples(client, build_month_image, region, year, scale=750, num_pixels=1000,
+                   seed=None, projection=None, geometries=False, months=range(1, 13),
+                   rows_per_month=None, max_features=MAX_FEATURES_PER_REQUEST,
+                   cache=None, cache_spec=None):
+    """Sample all monthly composites of a year in as few getInfo() calls as possible.
+
+    build_month_image(region, year, month, client) returns the (lazy) composite
+    for one month; the composites are sampled server-side, flattened into one
+    FeatureCollection carrying a Month property and fetched in one request, or
+    in month-sized pages when the result would exceed max_features. Months
+    without imagery simply have no rows. rows_per_month keeps a random subset
+    of each month's points on the server before transfer. geometries=True
+    keeps every point's 'lon' and 'lat'.
+
+    With a SampleCache (and a cache_spec giving dataset_id, bands and the
+    window(year, month) used by the builder) every month is saved as soon as
+    its page arrives and months already in the cache are not requested again.
+    """
+    import pandas as pd
+
+    from extraction.decode import samples_to_frame
+
+    months = list(months)
+    frames = {}
+    keys = {}
+    if cache is not None:
+        keys = _month_keys(cache_spec, region, year, months, scale, num_pixels, seed,
+                           projection, rows_per_month, geometries)
+        for month, (key, _) in keys.items():
+            cached = cache.get(key)
+            if cached is not None:
+                frames[month] = cached
+
+    todo = [month for month in months if month not in frames]
+    for page in _month_pages(todo, rows_per_month or num_pixels, max_features):
+        collections = [
+            _sample_month(client, build_month_image(region, year, month, client), region, month,
+                          scale, num_pixels, seed, projection, geometries, rows_per_month)
+            for month in page
+        ]
+        try:
+            features = client.FeatureCollection(collections).flatten().getInfo()['features']
+        except Exception as e:
+            for month in page:
+                if month in keys:
+                    cache.mark_failed(*keys[month], e)
+            if is_throttle_error(e):
+                raise
+            print(f"❌ Error extracting months {page[0]}-{page[-1]} of {year}:", e)
+            continue
+
+        page_df = samples_to_frame(features, coords=geometries, drop=(SUBSET_COLUMN,))
+        for month in page:
+            month_df = page_df[page_df['Month'] == month] if not page_df.empty else pd.DataFrame()
+            frames[month] = month_df.reset_index(drop=True)
+            if month in keys:
+                cache.put(*keys[month], frames[month])
+
+    parts = [frames[month] for month in months if month in frames and not frames[month].empty]
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat(parts, ignore_index=True)
+    df['Year'] = year
+    bands = [c for c in df.columns if c not in ('Year', 'Month')]
+    df = df[bands + ['Year', 'Month']]
+
+    missing = sorted(set(months) - set(df['Month']))
+    if missing:
+        print(f"⚠ No data for {year} month(s) {missing}.")
+    return df
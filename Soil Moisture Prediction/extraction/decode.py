@@ -0,0 +1,64 @@
+import operator
+
+import numpy as np
+
+# Integer-valued properties added by the extractors
+INT_COLUMNS = ('Year', 'Month')
+
+
+def sample_columns(features):
+    # Property names of a sampled collection; every point of one image shares them
+    columns = list(features[0]['properties']) if features else []
+    for feature in features[1:]:
+        if len(feature['properties']) != len(columns):
+            seen = dict.fromkeys(columns)
+            for f in features:
+                seen.update(dict.fromkeys(f['properties']))
+            return list(seen)
+    return columns
+
+
+def _property_matrix(features, columns, dtype):
+    get = operator.itemgetter(*columns)
+    if len(columns) == 1:
+        return np.fromiter((get(f['properties']) for f in features), dtype=dtype,
+                           count=len(features)).reshape(-1, 1)
+    try:
+        # One row tuple per point straight into a 2-D buffer, no intermediate lists
+        return np.fromiter((get(f['properties']) for f in features),
+                           dtype=np.dtype((dtype, len(columns))), count=len(features))
+    except (KeyError, TypeError, ValueError):
+        # Points with missing or null properties: slow path, gaps become NaN
+        rows = [[f['properties'].get(col) for col in columns] for f in features]
+        return np.array(rows, dtype=dtype) if rows else np.empty((0, len(columns)), dtype=dtype)
+
+
+def decode_samples(response, columns=None, coords=False, dtype=np.float64, drop=()):
+    """Columnar NumPy arrays from a sample()/getInfo() FeatureCollection response.
+
+    Returns {column: 1-D array} with the numeric properties as `dtype` and
+    Year/Month as int64. Point geometries are ignored unless coords=True,
+    which adds 'lon' and 'lat' columns (the sample must have been taken with
+    geometries=True). No per-row dicts or DataFrames are built on the way.
+    """
+    features = response['features'] if isinstance(response, dict) else response
+    if columns is None:
+        columns = [col for col in sample_columns(features) if col not in drop]
+    arrays = {}
+    if columns:
+        # Transpose once so every column is a contiguous view of one buffer
+        matrix = np.ascontiguousarray(_property_matrix(features, columns, dtype).T)
+        for col, values in zip(columns, matrix):
+            arrays[col] = values.astype(np.int64) if col in INT_COLUMNS else values
+    if coords:
+        lonlat = np.fromiter((f['geometry']['coordinates'] for f in features),
+                             dtype=np.dtype((dtype, 2)), count=len(features))
+        arrays['lon'], arrays['lat'] = np.ascontiguousarray(lonlat.T)
+    return arrays
+
+
+def samples_to_frame(response, columns=None, coords=False, dtype=np.float64, drop=()):
+    # DataFrame view over decode_samples(); empty responses give an empty frame
+    import pandas as pd
+
+    return pd.DataFrame(decode_samples(response, columns, coords, dtype, drop))
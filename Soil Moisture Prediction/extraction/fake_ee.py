@@ -0,0 +1,290 @@
+import hashlib
+import random
+import threading
+import time
+
+
+class FakeEEException(Exception):
+    pass
+
+
+def _stable_seed(*parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return int(digest[:12], 16)
+
+
+# Local stand-in for the parts of the `ee` module the extractors use.
+# Every getInfo() goes through FakeEarthEngine._call, which adds latency and
+# raises quota/memory errors the same way the real service does.
+class FakeEarthEngine:
+    def __init__(self, latency=0.05, throttle_rate=0.0, max_concurrent=None,
+                 empty_months=(), max_region_pixels=None, seed=0):
+        self.latency = latency
+        self.max_region_pixels = max_region_pixels
+        self.throttle_rate = throttle_rate
+        self.max_concurrent = max_concurrent
+        self.empty_months = set(empty_months)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._active = 0
+        self.calls = 0
+        self.throttled = 0
+        self.peak_concurrency = 0
+
+        backend = self
+        self.Geometry = _GeometryNamespace
+        self.Filter = _FilterNamespace
+        self.ImageCollection = lambda dataset_id: _ImageCollection(backend, dataset_id)
+        self.FeatureCollection = lambda source: _as_collection(backend, source)
+        self.Algorithms = _AlgorithmsNamespace
+
+    def Initialize(self, *args, **kwargs):
+        pass
+
+    def _call(self, produce):
+        with self._lock:
+            self.calls += 1
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+            too_busy = self.max_concurrent is not None and self._active > self.max_concurrent
+            unlucky = self._rng.random() < self.throttle_rate
+        try:
+            if too_busy:
+                self.throttled += 1
+                raise FakeEEException("Too many concurrent aggregations.")
+            if unlucky:
+                self.throttled += 1
+                raise FakeEEException("User memory limit exceeded.")
+            time.sleep(self.latency)
+            return produce()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+class _Geometry:
+    def __init__(self, west, south, east, north):
+        self.bounds = (west, south, east, north)
+
+    def toGeoJSON(self):
+        west, south, east, north = self.bounds
+        ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+        return {"type": "Polygon", "coordinates": [ring]}
+
+
+class _GeometryNamespace:
+    @staticmethod
+    def BBox(west, south, east, north):
+        return _Geometry(west, south, east, north)
+
+
+class _FilterNamespace:
+    @staticmethod
+    def lt(name, value):
+        return ("lt", name, value)
+
+
+class _AlgorithmsNamespace:
+    @staticmethod
+    def If(condition, true_case, false_case):
+        return true_case if condition._value else false_case
+
+
+class _Value:
+    def __init__(self, backend, value):
+        self._backend = backend
+        self._value = value
+
+    def size(self):
+        return _Value(self._backend, len(self._value))
+
+    def gt(self, other):
+        return _Value(self._backend, self._value > other)
+
+    def getInfo(self):
+        return self._backend._call(lambda: self._value)
+
+
+class _ImageCollection:
+    def __init__(self, backend, dataset_id, start=None, end=None, bands=None, mapped=()):
+        self._backend = backend
+        self.dataset_id = dataset_id
+        self.start = start
+        self.end = end
+        self.bands = bands
+        self.mapped = mapped
+
+    def _copy(self, **changes):
+        state = dict(dataset_id=self.dataset_id, start=self.start, end=self.end,
+                     bands=self.bands, mapped=self.mapped)
+        state.update(changes)
+        return _ImageCollection(self._backend, **state)
+
+    def filterBounds(self, region):
+        return self
+
+    def filter(self, condition):
+        return self
+
+    def filterDate(self, start, end):
+        return self._copy(start=start, end=end)
+
+    def select(self, bands):
+        return self._copy(bands=list(bands) if not isinstance(bands, str) else [bands])
+
+    def map(self, fn):
+        return self._copy(mapped=self.mapped + (fn,))
+
+    def _reduce(self):
+        year, month = (int(part) for part in str(self.start).split("-")[:2])
+        if (self.dataset_id, year, month) in self._backend.empty_months:
+            return _Image(self._backend, [], (self.dataset_id, self.start))
+        return _Image(self._backend, list(self.bands or ["b1"]), (self.dataset_id, self.start))
+
+    median = mean = first = _reduce
+
+
+class _Image:
+    def __init__(self, backend, bands, source):
+        self._backend = backend
+        self.bands = bands
+        self.source = source
+
+    def _same(self, *args, **kwargs):
+        return _Image(self._backend, list(self.bands), self.source)
+
+    multiply = subtract = divide = updateMask = lt = setDefaultProjection = _same
+
+    def select(self, bands):
+        bands = [bands] if isinstance(bands, str) else list(bands)
+        return _Image(self._backend, [b for b in bands if b in self.bands], self.source)
+
+    def addBands(self, other):
+        return _Image(self._backend, self.bands + other.bands, (self.source, other.source))
+
+    def rename(self, names):
+        if not self.bands:
+            return self._same()
+        return _Image(self._backend, list(names), self.source)
+
+    def bandNames(self):
+        return _Value(self._backend, list(self.bands))
+
+    def sample(self, region=None, scale=None, numPixels=None, seed=0, geometries=False,
+               projection=None, **kwargs):
+        return _SampledCollection(self._backend, self, region, scale or 1000, numPixels or 1000,
+                                  seed or 0, geometries)
+
+
+class _Feature:
+    def __init__(self, data):
+        self.data = data
+
+    def set(self, name, value):
+        data = dict(self.data, properties=dict(self.data["properties"], **{name: value}))
+        return _Feature(data)
+
+
+# Feature collections stay lazy until getInfo(), which is the only round trip
+class _FeatureCollection:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def _produce(self):
+        return []
+
+    def map(self, fn):
+        return _MappedCollection(self._backend, self, fn)
+
+    def flatten(self):
+        return self
+
+    def randomColumn(self, name='random', seed=0):
+        rng = random.Random(seed)
+        return _MappedCollection(self._backend, self, lambda feature: feature.set(name, rng.random()))
+
+    def sort(self, prop, ascending=True):
+        return _SortedCollection(self._backend, self, prop, ascending)
+
+    def limit(self, count):
+        return _LimitedCollection(self._backend, self, count)
+
+    def getInfo(self):
+        return self._backend._call(lambda: {"type": "FeatureCollection", "features": self._produce()})
+
+
+def _as_collection(backend, source):
+    if isinstance(source, _FeatureCollection):
+        return source
+    return _MergedCollection(backend, list(source))
+
+
+class _MergedCollection(_FeatureCollection):
+    def __init__(self, backend, parts):
+        super().__init__(backend)
+        self.parts = parts
+
+    def _produce(self):
+        return [feature for part in self.parts for feature in part._produce()]
+
+
+class _MappedCollection(_FeatureCollection):
+    def __init__(self, backend, parent, fn):
+        super().__init__(backend)
+        self.parent = parent
+        self.fn = fn
+
+    def _produce(self):
+        return [self.fn(_Feature(feature)).data for feature in self.parent._produce()]
+
+
+class _SortedCollection(_FeatureCollection):
+    def __init__(self, backend, parent, prop, ascending):
+        super().__init__(backend)
+        self.parent = parent
+        self.prop = prop
+        self.ascending = ascending
+
+    def _produce(self):
+        return sorted(self.parent._produce(), key=lambda f: f["properties"][self.prop],
+                      reverse=not self.ascending)
+
+
+class _LimitedCollection(_FeatureCollection):
+    def __init__(self, backend, parent, count):
+        super().__init__(backend)
+        self.parent = parent
+        self.count = count
+
+    def _produce(self):
+        return self.parent._produce()[:self.count]
+
+
+class _SampledCollection(_FeatureCollection):
+    def __init__(self, backend, image, region, scale, num_pixels, seed, geometries):
+        super().__init__(backend)
+        self.image = image
+        self.region = region
+        self.scale = scale
+        self.num_pixels = num_pixels
+        self.seed = seed
+        self.geometries = geometries
+
+    def _produce(self):
+        if not self.image.bands:
+            return []
+        west, south, east, north = self.region.bounds if self.region else (0, 0, 1, 1)
+        region_pixels = (east - west) * (north - south) * (111_320 / self.scale) ** 2
+        if self._backend.max_region_pixels and region_pixels > self._backend.max_region_pixels:
+            raise FakeEEException("User memory limit exceeded.")
+        rng = random.Random(_stable_seed(self.image.source, self.seed, self.region and self.region.bounds))
+        features = []
+        for i in range(self.num_pixels):
+            lon, lat = rng.uniform(west, east), rng.uniform(south, north)
+            features.append({
+                "type": "Feature",
+                "id": str(i),
+                "geometry": {"type": "Point", "coordinates": [lon, lat]} if self.geometries else None,
+                "properties": {band: round(rng.uniform(0.0, 0.5), 6) for band in self.image.bands},
+            })
+        return features
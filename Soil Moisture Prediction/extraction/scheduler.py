@@ -0,0 +1,156 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from extraction.tracing import labels
+
+# Substrings of Earth Engine error messages that mean "slow down", not "broken"
+THROTTLE_MARKERS = (
+    "quota",
+    "memory limit",
+    "too many requests",
+    "too many concurrent",
+    "rate limit",
+    "computation timed out",
+    "429",
+)
+
+
+def is_throttle_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+# Token bucket whose refill rate halves on throttling and creeps back up on success
+class AdaptiveRateLimiter:
+    def __init__(self, rate=2.0, burst=None, min_rate=0.1, increase=0.1,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.increase = increase
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now >= self._blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = max(self._blocked_until - now, (1.0 - self.tokens) / self.rate)
+            self._sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, cooldown):
+        # Multiplicative decrease plus a shared pause so every worker backs off
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self.tokens = 0.0
+            self._blocked_until = max(self._blocked_until, self._clock() + cooldown)
+
+
+def _label(year, month):
+    return f"{year}" if month is None else f"{year}-{month:02d}"
+
+
+# Runs per-(state, year, month) extraction jobs on a bounded worker pool
+class ExtractionScheduler:
+    def __init__(self, client, max_workers=4, rate=2.0, burst=None, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, limiter=None, sleep=time.sleep):
+        self.client = client
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or AdaptiveRateLimiter(rate=rate, burst=burst, sleep=sleep)
+        self._sleep = sleep
+        self.failures = {}
+        self.throttle_count = 0
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _run_one(self, job, state, region, year, month):
+        with labels(state=state):
+            return self._attempt(job, region, year, month)
+
+    def _attempt(self, job, region, year, month):
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                result = job(self.client, region, year, month)
+            except Exception as e:
+                if not is_throttle_error(e) or attempt >= self.max_retries:
+                    raise
+                self.throttle_count += 1
+                delay = self._backoff(attempt)
+                self.limiter.on_throttle(delay)
+                attempt += 1
+                print(f"   ⏳ Throttled on {_label(year, month)} ({e}); retry {attempt} in {delay:.1f}s")
+                continue
+            self.limiter.on_success()
+            return result
+
+    def run(self, job, tasks, on_result=None):
+        """Run job(client, region, year, month) for every (state, region, year, month) task.
+
+        Year-level tasks (see year_tasks) carry month=None.
+
+        Returns {(state, year, month): result}; tasks that still fail after
+        retries are left out and recorded in self.failures. With on_result,
+        each result is handed to on_result(key, result) as soon as it is
+        ready instead of being kept in the returned dict.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                # Each task runs in a copy of the caller's context, so its Earth Engine calls carry the caller's labels
+                pool.submit(contextvars.copy_context().run, self._run_one, job, state, region, year, month):
+                    (state, year, month)
+                for state, region, year, month in tasks
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Giving up on {key[0]} {_label(key[1], key[2])}:", e)
+                    self.failures[key] = e
+                    continue
+                if on_result is not None:
+                    on_result(key, result)
+                else:
+                    results[key] = result
+        return results
+
+
+def month_tasks(states_regions, years, months=range(1, 13)):
+    return [
+        (state, region, year, month)
+        for state, region in states_regions.items()
+        for year in years
+        for month in months
+    ]
+
+
+def year_tasks(states_regions, years):
+    return [(state, region, year, None) for state, region in states_regions.items() for year in years]
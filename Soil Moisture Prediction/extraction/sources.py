@@ -0,0 +1,130 @@
+import functools
+
+from extraction.composites import month_window
+from extraction.scheduler import is_throttle_error
+
+# Collections, bands and output names; extraction/config.json can override any field
+DATASETS = {
+    'landsat': {
+        'collection': "LANDSAT/LC08/C02/T1_L2",
+        'bands': ['SR_B4', 'SR_B5', 'SR_B6', 'SR_B7'],
+        'rename': ['L8_B4', 'L8_B5', 'L8_B6', 'L8_B7'],
+        'window_days': 30,
+        'target_rows': 1000,
+    },
+    'sentinel2': {
+        'collection': 'COPERNICUS/S2_SR_HARMONIZED',
+        'bands': ['B4', 'B5', 'B6', 'B7', 'B8'],
+        'rename': ['S2_B4', 'S2_B5', 'S2_B6', 'S2_B7', 'S2_B8'],
+        'max_cloud_percentage': 20,
+        'window_days': 30,
+        'target_rows': 1000,
+    },
+    'smap': {
+        'collection': "NASA/SMAP/SPL4SMGP/007",
+        'bands': ['sm_surface'],
+        'rename': ['sm_surface'],  # Sampled under its own name
+        'window_days': 27,  # 1st to 28th
+        'projection': 'EPSG:4326',
+        'target_rows': 750,
+    },
+}
+
+
+# Function to get Landsat 8 data (Converted to Reflectance) for a specific month
+def get_landsat_data(region, year, month, client, dataset=DATASETS['landsat']):
+    start_date, end_date = month_window(year, month, dataset['window_days'])
+    image = client.ImageCollection(dataset['collection']) \
+                  .filterBounds(region) \
+                  .filterDate(start_date, end_date) \
+                  .select(dataset['bands']) \
+                  .median()  # Use median to get stable values
+
+    # Convert scaled reflectance values
+    image = image.multiply(0.0000275).subtract(0.2)
+    return image.rename(dataset['rename'])  # Rename to avoid conflicts
+
+
+# Function to mask clouds in Sentinel-2
+def mask_s2_clouds(image):
+    cloud_mask = image.select('QA60').lt(10000)  # Less than 10% cloud probability
+    return image.updateMask(cloud_mask).divide(10000)  # Normalize reflectance
+
+
+# Function to get Sentinel-2 data for a specific month
+def get_sentinel2_data(region, year, month, client, dataset=DATASETS['sentinel2']):
+    start_date, end_date = month_window(year, month, dataset['window_days'])
+    image = client.ImageCollection(dataset['collection']) \
+                  .filterBounds(region) \
+                  .filterDate(start_date, end_date) \
+                  .filter(client.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', dataset['max_cloud_percentage'])) \
+                  .map(mask_s2_clouds) \
+                  .select(dataset['bands']) \
+                  .median()
+
+    # Force CRS to WGS84 to avoid missing CRS error
+    image = image.setDefaultProjection('EPSG:4326', None, 10)
+    return image.rename(dataset['rename'])
+
+
+# Function to build the mean SMAP composite for one month
+def get_smap_month(region, year, month, client, dataset=DATASETS['smap']):
+    month_start, month_end = month_window(year, month, dataset['window_days'])
+    return client.ImageCollection(dataset['collection']) \
+                 .filterBounds(region) \
+                 .filterDate(month_start, month_end) \
+                 .select(dataset['bands']) \
+                 .mean()
+
+
+BUILDERS = {
+    'landsat': get_landsat_data,
+    'sentinel2': get_sentinel2_data,
+    'smap': get_smap_month,
+}
+
+
+def builder(name, dataset=None):
+    """Monthly image builder for a dataset, bound to its (configured) settings."""
+    return functools.partial(BUILDERS[name], dataset=dataset or DATASETS[name])
+
+
+def cache_spec(name, dataset=None):
+    # What a builder requests per month; keys the sample cache
+    dataset = dataset or DATASETS[name]
+    return {
+        'dataset_id': dataset['collection'],
+        'bands': dataset['rename'],
+        'window': lambda year, month: month_window(year, month, dataset['window_days']),
+    }
+
+
+# Function to get soil moisture data: target_rows distinct points per month
+def get_soil_moisture_data(region, year, client, dataset=DATASETS['smap'], cache=None,
+                           scale=750, seed=42, **tiling):
+    from extraction.tiling import tiled_yearly_samples
+
+    return tiled_yearly_samples(client, builder('smap', dataset), region, year, dataset['target_rows'],
+                                scale=scale, seed=seed, projection=dataset.get('projection'),
+                                cache=cache, cache_spec=cache_spec('smap', dataset), **tiling)
+
+
+# Function to sample image data properly (monthly mode); coords=True adds lon/lat
+def image_to_dataframe(image, region, scale=750, numPixels=1000, coords=False):
+    import pandas as pd
+
+    from extraction.decode import samples_to_frame
+
+    try:
+        sampled_points = image.sample(
+            region=region,
+            scale=scale,
+            numPixels=numPixels,
+            geometries=coords  # Point geometries are only transferred when kept
+        )
+        return samples_to_frame(sampled_points.getInfo(), coords=coords)
+    except Exception as e:
+        if is_throttle_error(e):
+            raise  # Let the scheduler back off and retry
+        print("Error extracting data:", e)
+        return pd.DataFrame()
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Partition layout: <root>/<dataset>/state=<State>/year=<YYYY>/month=<M>/data.parquet
+PARTITION_KEYS = ('state', 'year', 'month')
+INT_COLUMNS = ('Year', 'Month')
+
+
+def _require_parquet():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("The partitioned store needs pyarrow: pip install pyarrow")
+
+
+def _compact(df):
+    # float32 bands/targets, int16 calendar columns
+    out = {}
+    for col in df.columns:
+        if col in INT_COLUMNS:
+            out[col] = df[col].astype(np.int16)
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            out[col] = df[col].astype(np.float32)
+        else:
+            out[col] = df[col]
+    return pd.DataFrame(out, index=df.index)
+
+
+def _partition_value(name):
+    key, _, value = name.partition('=')
+    return key, value
+
+
+# Streams one month at a time into a state/year/month partitioned Parquet dataset
+class PartitionedWriter:
+    def __init__(self, root, dataset):
+        _require_parquet()
+        self.path = os.path.join(root, dataset)
+        self.schema_path = os.path.join(self.path, '_schema.json')
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self.schema = read_schema(root, dataset)
+
+    def _check_schema(self, df):
+        columns = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        with self._lock:
+            if self.schema is None:
+                self.schema = {'columns': columns, 'partitioning': list(PARTITION_KEYS)}
+                tmp_path = f'{self.schema_path}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.schema, f, indent=1)
+                os.replace(tmp_path, self.schema_path)
+            elif columns != self.schema['columns']:
+                raise ValueError(f"Schema mismatch for {self.path}: {columns} != {self.schema['columns']}")
+
+    def write_month(self, state, year, month, df):
+        """Write (or replace) one month's partition; empty frames are skipped."""
+        if df.empty:
+            return None
+        df = _compact(df.reset_index(drop=True))
+        if self.schema is not None:
+            df = df.reindex(columns=list(self.schema['columns']))
+        self._check_schema(df)
+        part_dir = os.path.join(self.path, f'state={state}', f'year={int(year)}', f'month={int(month)}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, 'data.parquet')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def write_frame(self, state, df):
+        # Split a frame with Year/Month columns into its month partitions
+        if df.empty:
+            return []
+        return [self.write_month(state, year, month, part)
+                for (year, month), part in df.groupby(['Year', 'Month'], sort=True)]
+
+
+def read_schema(root, dataset):
+    path = os.path.join(root, dataset, '_schema.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_partitions(root, dataset, states=None, years=None, months=None):
+    """(state, year, month, path) for every stored partition matching the filters."""
+    base = os.path.join(root, dataset)
+    if not os.path.isdir(base):
+        return []
+    found = []
+    for state_dir in sorted(name for name in os.listdir(base) if name.startswith('state=')):
+        state = _partition_value(state_dir)[1]
+        if states is not None and state not in states:
+            continue
+        for year_dir in sorted(os.listdir(os.path.join(base, state_dir))):
+            year = int(_partition_value(year_dir)[1])
+            if years is not None and year not in years:
+                continue
+            year_root = os.path.join(base, state_dir, year_dir)
+            for month_dir in sorted(os.listdir(year_root), key=lambda name: int(_partition_value(name)[1])):
+                month = int(_partition_value(month_dir)[1])
+                if months is not None and month not in months:
+                    continue
+                path = os.path.join(year_root, month_dir, 'data.parquet')
+                if os.path.exists(path):
+                    found.append((state, year, month, path))
+    return found
+
+
+def latest_partition(root, dataset, state):
+    """(year, month) of the newest stored partition for a state, or None."""
+    partitions = list_partitions(root, dataset, states=[state])
+    return max((year, month) for _, year, month, _ in partitions) if partitions else None
+
+
+def read_partitions(root, dataset, states=None, years=None, months=None, columns=None, with_state=False):
+    """Load only the matching partitions, and only `columns` from each file."""
+    _require_parquet()
+    frames = []
+    for state, _, _, path in list_partitions(root, dataset, states, years, months):
+        df = pd.read_parquet(path, columns=columns)
+        if with_state:
+            df['State'] = state
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def iter_partitions(root, dataset, states=None, years=None, months=None, columns=None, block_rows=1_000_000):
+    """Stream the matching partitions as compact frames of at most block_rows rows."""
+    _require_parquet()
+    import pyarrow.parquet as pq
+
+    for _, _, _, path in list_partitions(root, dataset, states, years, months):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=block_rows, columns=columns):
+            yield _compact(batch.to_pandas())
+
+
+def import_csv(csv_path, root, dataset, state):
+    # One-off conversion of an existing per-state CSV (e.g. "Data - Bihar Done.csv")
+    writer = PartitionedWriter(root, dataset)
+    df = pd.read_csv(csv_path)
+    return writer.write_frame(state, df)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a per-state CSV into the partitioned store")
+    parser.add_argument('csv_path')
+    parser.add_argument('state')
+    parser.add_argument('--root', help="default: the store in extraction/config.json (or $DATA_STORE)")
+    parser.add_argument('--dataset', default='training')
+    args = parser.parse_args()
+    if args.root is None:
+        from extraction.cli import data_store_path
+
+        args.root = data_store_path()
+    written = import_csv(args.csv_path, args.root, args.dataset, args.state)
+    print(f"✅ Wrote {len(written)} partitions to {os.path.join(args.root, args.dataset)}")
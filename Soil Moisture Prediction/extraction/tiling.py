@@ -0,0 +1,124 @@
+import contextvars
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Pixels per sampled region that keep Earth Engine's sample() clear of memory limits
+MAX_TILE_PIXELS = 250_000
+METERS_PER_DEGREE = 111_320
+
+
+def _extent_m(bbox):
+    west, south, east, north = bbox
+    mid_lat = math.radians((south + north) / 2)
+    return (east - west) * METERS_PER_DEGREE * math.cos(mid_lat), (north - south) * METERS_PER_DEGREE
+
+
+def bbox_pixels(bbox, scale):
+    width, height = _extent_m(bbox)
+    return width * height / (scale * scale)
+
+
+def split_bbox(bbox, scale=750, max_tile_pixels=MAX_TILE_PIXELS):
+    """Split a [west, south, east, north] box into a grid of tiles under max_tile_pixels."""
+    west, south, east, north = bbox
+    pixels = bbox_pixels(bbox, scale)
+    if pixels <= max_tile_pixels:
+        return [list(bbox)]
+    # Roughly square tiles in metres
+    width, height = _extent_m(bbox)
+    n_tiles = math.ceil(pixels / max_tile_pixels)
+    nx = max(1, round(math.sqrt(n_tiles * width / height)))
+    ny = math.ceil(n_tiles / nx)
+    while pixels / (nx * ny) > max_tile_pixels:
+        nx, ny = (nx + 1, ny) if width / nx >= height / ny else (nx, ny + 1)
+    dx, dy = (east - west) / nx, (north - south) / ny
+    return [[west + i * dx, south + j * dy, west + (i + 1) * dx, south + (j + 1) * dy]
+            for j in range(ny) for i in range(nx)]
+
+
+def tile_seed(seed, index):
+    # Deterministic, distinct seed per tile so reruns pick the same points
+    return (seed * 1_000_003 + index * 7919) % (2 ** 31)
+
+
+def allocate_rows(tiles, target_rows, scale=750):
+    """Split target_rows across tiles in proportion to their area (largest remainder)."""
+    areas = [bbox_pixels(tile, scale) for tile in tiles]
+    total = sum(areas)
+    exact = [target_rows * area / total for area in areas]
+    quotas = [int(value) for value in exact]
+    by_remainder = sorted(range(len(tiles)), key=lambda i: exact[i] - quotas[i], reverse=True)
+    for i in by_remainder[:target_rows - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+def _stratified_pick(frames, quotas, target_rows, seed):
+    # Take each tile's quota first; tiles that came up short (masked water,
+    # no imagery) are topped up from the other tiles' spare rows, never by
+    # duplicating rows
+    import pandas as pd
+
+    picked, spare = [], []
+    for i, (df, quota) in enumerate(zip(frames, quotas)):
+        shuffled = df.sample(frac=1.0, random_state=tile_seed(seed, i)) if len(df) else df
+        picked.append(shuffled.iloc[:quota])
+        spare.append(shuffled.iloc[quota:])
+    chosen = pd.concat(picked, ignore_index=True) if picked else pd.DataFrame()
+    shortfall = target_rows - len(chosen)
+    if shortfall > 0 and spare:
+        extra = pd.concat(spare, ignore_index=True)
+        extra = extra.sample(n=min(shortfall, len(extra)), random_state=seed)
+        chosen = pd.concat([chosen, extra], ignore_index=True)
+    return chosen
+
+
+def tiled_sample(fetch, bbox, target_rows, scale=750, seed=42, max_tile_pixels=MAX_TILE_PIXELS,
+                 oversample=1.5, max_workers=4, by='Month'):
+    """Sample a large box tile by tile, concurrently, and merge a stratified subset.
+
+    fetch(tile_bbox, num_pixels, seed) samples one tile and returns a DataFrame.
+    Each tile is asked for its area share of target_rows (times `oversample`
+    to absorb masked pixels); the merge then keeps target_rows rows per `by`
+    group (e.g. per Month), or fewer if the state genuinely has fewer pixels.
+    """
+    import pandas as pd
+
+    tiles = split_bbox(bbox, scale, max_tile_pixels)
+    quotas = allocate_rows(tiles, target_rows, scale)
+    requests = [(tile, max(1, math.ceil(quota * oversample)), tile_seed(seed, i))
+                for i, (tile, quota) in enumerate(zip(tiles, quotas))]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tiles))) as pool:
+        # Tiles keep the caller's context (extraction.tracing labels)
+        futures = [pool.submit(contextvars.copy_context().run, fetch, *request) for request in requests]
+        frames = [future.result() for future in futures]
+
+    if all(df.empty for df in frames):
+        return pd.DataFrame()
+    if by is None:
+        return _stratified_pick(frames, quotas, target_rows, seed)
+
+    groups = sorted(set().union(*(set(df[by]) for df in frames if not df.empty)))
+    parts = []
+    for group in groups:
+        group_frames = [df[df[by] == group] if not df.empty else df for df in frames]
+        part = _stratified_pick(group_frames, quotas, target_rows, seed)
+        if len(part) < target_rows:
+            print(f"⚠ Only {len(part)} of {target_rows} rows available for {by} {group}.")
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def tiled_yearly_samples(client, build_month_image, region, year, target_rows, scale=750, seed=42,
+                         max_tile_pixels=MAX_TILE_PIXELS, **options):
+    """yearly_samples over the tiles of a state: target_rows distinct points per month."""
+    from extraction.cache import region_bbox
+    from extraction.composites import yearly_samples
+
+    def fetch_tile(tile, num_pixels, tile_seed_value):
+        return yearly_samples(client, build_month_image, client.Geometry.BBox(*tile), year, scale=scale,
+                              num_pixels=num_pixels, seed=tile_seed_value, **options)
+    return tiled_sample(fetch_tile, region_bbox(region), target_rows, scale=scale, seed=seed,
+                        max_tile_pixels=max_tile_pixels)
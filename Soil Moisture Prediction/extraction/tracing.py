@@ -0,0 +1,213 @@
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Labels of the work in progress (dataset, state, period), set by the CLI and the scheduler
+_labels = contextvars.ContextVar('extraction_labels', default={})
+
+# Results returned as-is rather than wrapped: plain data, not Earth Engine objects
+PLAIN_TYPES = (dict, list, tuple, str, bytes, int, float, bool, type(None))
+
+MEMO_BYTES = 256 * 1024 ** 2  # Results kept for identical requests within a run
+
+
+@contextmanager
+def labels(**values):
+    """Attribute the Earth Engine calls made inside the block to dataset/state/... labels."""
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def _describe(value):
+    # Stable description of an argument, for the request key
+    if isinstance(value, _Traced):
+        return value._expr
+    if isinstance(value, (list, tuple)):
+        return [_describe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(name): _describe(item) for name, item in sorted(value.items())}
+    if callable(value):
+        # Mapped functions: same code and same captured values, same request
+        code = getattr(value, '__code__', None)
+        if code is None:
+            return repr(value)
+        cells = [_describe(cell.cell_contents) for cell in (value.__closure__ or ())]
+        return ['fn', code.co_filename, code.co_firstlineno, cells]
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    return repr(value)
+
+
+def _unwrap(value):
+    if isinstance(value, _Traced):
+        return value._target
+    if isinstance(value, list):
+        return [_unwrap(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_unwrap(item) for item in value)
+    if isinstance(value, dict):
+        return {name: _unwrap(item) for name, item in value.items()}
+    return value
+
+
+def _collections(expr):
+    # ImageCollection ids anywhere in an expression
+    if isinstance(expr, list):
+        if len(expr) == 3 and expr[1] == 'ImageCollection()' and expr[2][0]:
+            return [str(expr[2][0][0])]
+        return [name for item in expr for name in _collections(item)]
+    if isinstance(expr, dict):
+        return [name for item in expr.values() for name in _collections(item)]
+    return []
+
+
+class _Traced:
+    """An Earth Engine object (or namespace) seen through the tracer.
+
+    Building a computation is passed straight through and only remembered
+    as an expression; getInfo() is where the round trip happens, so that is
+    where calls are counted, timed, measured and memoized.
+    """
+
+    def __init__(self, tracer, target, expr):
+        self._tracer = tracer
+        self._target = target
+        self._expr = expr
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == 'getInfo':
+            return lambda *args, **kwargs: self._tracer.get_info(self, attr, *args, **kwargs)
+        return self._tracer.wrap(attr, [self._expr, '.', name])
+
+    def __call__(self, *args, **kwargs):
+        result = self._target(*_unwrap(args), **_unwrap(kwargs))
+        name = self._expr[2] if isinstance(self._expr, list) and self._expr[1] == '.' else 'call'
+        if name == 'sample':
+            # Counted once the sample is actually requested, under the labels of the calling task
+            self._tracer.count('samples', self._expr)
+        return self._tracer.wrap(result, [self._expr, f'{name}()', [_describe(args), _describe(kwargs)]])
+
+
+class TracingClient(_Traced):
+    """Wraps the `ee` module (or extraction.fake_ee.FakeEarthEngine) for accounting and deduplication.
+
+    Every getInfo() is recorded per (dataset, state) label: calls, latency
+    and JSON payload bytes. Identical requests within a run (same
+    expression, e.g. a year of SMAP asked for once per month) are answered
+    from memory, and concurrent duplicates wait for the first one. Lazy
+    sample() calls are counted too. report()/print_report() show where the
+    time went.
+    """
+
+    def __init__(self, client, memoize=True, memo_bytes=MEMO_BYTES):
+        super().__init__(self, client, 'ee')
+        self.memoize = memoize
+        self.memo_bytes = memo_bytes
+        self.started = time.perf_counter()
+        self._memo = OrderedDict()  # key -> (result, payload bytes)
+        self._memo_size = 0
+        self._pending = {}
+        self._stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def wrap(self, value, expr):
+        return value if isinstance(value, PLAIN_TYPES) else _Traced(self, value, expr)
+
+    def _row(self, expr):
+        current = _labels.get()
+        dataset = current.get('dataset') or '+'.join(dict.fromkeys(_collections(expr))) or '-'
+        key = (dataset, current.get('state', '-'))
+        row = self._stats.get(key)
+        if row is None:
+            row = self._stats[key] = {'calls': 0, 'memo_hits': 0, 'samples': 0, 'errors': 0,
+                                      'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0}
+        return row
+
+    def count(self, field, expr, value=1):
+        with self._lock:
+            self._row(expr)[field] += value
+
+    def _call(self, expr, get_info, args, kwargs):
+        start = time.perf_counter()
+        try:
+            result = get_info(*args, **kwargs)
+        except Exception:
+            self.count('errors', expr)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                row = self._row(expr)
+                row['calls'] += 1
+                row['seconds'] += seconds
+                row['max_seconds'] = max(row['max_seconds'], seconds)
+        size = len(json.dumps(result, default=str))
+        self.count('bytes', expr, size)
+        return result, size
+
+    def get_info(self, traced, get_info, *args, **kwargs):
+        expr = traced._expr
+        key = None
+        if self.memoize and not args and not kwargs:
+            key = hashlib.sha256(json.dumps(expr, default=repr).encode()).hexdigest()
+        while key is not None:
+            with self._lock:
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    self._row(expr)['memo_hits'] += 1
+                    return self._memo[key][0]
+                in_flight = self._pending.get(key)
+                if in_flight is None:
+                    self._pending[key] = threading.Event()
+                    break
+            # The same request is already running: wait for its result (or its failure)
+            in_flight.wait()
+
+        try:
+            result, size = self._call(expr, get_info, args, kwargs)
+            if key is not None and size <= self.memo_bytes:
+                with self._lock:
+                    self._memo[key] = (result, size)
+                    self._memo_size += size
+                    while self._memo_size > self.memo_bytes:
+                        _, (_, dropped) = self._memo.popitem(last=False)
+                        self._memo_size -= dropped
+            return result
+        finally:
+            if key is not None:
+                with self._lock:
+                    self._pending.pop(key).set()
+
+    def report(self):
+        """Per (dataset, state) accounting, slowest first, plus run totals."""
+        with self._lock:
+            rows = [{'dataset': dataset, 'state': state, **row} for (dataset, state), row in self._stats.items()]
+        rows.sort(key=lambda row: row['seconds'], reverse=True)
+        busy = sum(row['seconds'] for row in rows)
+        for row in rows:
+            row['share'] = row['seconds'] / busy if busy else 0.0
+        totals = {field: sum(row[field] for row in rows)
+                  for field in ('calls', 'memo_hits', 'samples', 'errors', 'seconds', 'bytes')}
+        totals['wall_seconds'] = time.perf_counter() - self.started
+        return {'rows': rows, 'totals': totals}
+
+    def print_report(self):
+        report = self.report()
+        totals = report['totals']
+        print(f"⏱️ Earth Engine: {totals['calls']} getInfo calls ({totals['memo_hits']} answered from memory, "
+              f"{totals['errors']} failed), {totals['seconds']:.1f}s in calls over {totals['wall_seconds']:.1f}s, "
+              f"{totals['bytes'] / 1024 ** 2:.1f} MB received")
+        for row in report['rows']:
+            mean_ms = 1000 * row['seconds'] / row['calls'] if row['calls'] else 0.0
+            print(f"   {row['dataset'][:48]:48s} {row['state']:14s} {row['calls']:5d} calls "
+                  f"{row['memo_hits']:4d} memo {row['samples']:5d} samples  {row['seconds']:7.1f}s "
+                  f"({row['share']:4.0%}) mean {mean_ms:6.0f}ms max {1000 * row['max_seconds']:6.0f}ms "
+                  f"{row['bytes'] / 1024 ** 2:7.2f} MB")
@@ -0,0 +1,8 @@
+# Tests run from the "Soil Moisture Prediction" folder: python -m pytest tests
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB = os.path.join(ROOT, 'Full Website')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, WEB)
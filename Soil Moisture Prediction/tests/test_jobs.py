@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+import time
+
+from serving.jobs import JobQueue
+
+
+def wait_for(queue, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def counting_handler(runs, delay=0.0):
+    lock = threading.Lock()
+
+    def handler(params, path):
+        with lock:
+            runs.append(params['n'])
+        time.sleep(delay)
+        with open(path, 'w') as f:
+            json.dump(params, f)
+        return 'application/json'
+    return handler
+
+
+def test_nothing_starts_before_first_use(tmp_path):
+    queue = JobQueue({'echo': counting_handler([])}, root=str(tmp_path / 'jobs'))
+    assert queue._pool is None
+    assert not (tmp_path / 'jobs').exists()
+    job_id = queue.submit('echo', {'n': 1})
+    assert wait_for(queue, job_id)['status'] == 'done'
+    queue.shutdown()
+
+
+def test_each_job_runs_once_across_queues(tmp_path):
+    # Two queues on one root stand in for two worker processes
+    runs = []
+    handlers = {'echo': counting_handler(runs, delay=0.01)}
+    first = JobQueue(handlers, root=str(tmp_path), workers=2)
+    second = JobQueue(handlers, root=str(tmp_path), workers=2)
+    job_ids = [first.submit('echo', {'n': n}) for n in range(10)]
+    second.start()  # Offers every queued job to the second queue as well
+    for job_id in job_ids:
+        assert wait_for(first, job_id)['status'] == 'done'
+    assert sorted(runs) == list(range(10))
+    first.shutdown()
+    second.shutdown()
+
+
+def test_running_job_with_live_lease_is_left_alone(tmp_path):
+    runs = []
+    queue = JobQueue({'echo': counting_handler(runs)}, root=str(tmp_path), lease_seconds=60)
+    queue.start()
+    with sqlite3.connect(queue.db_path) as db:
+        db.execute("INSERT INTO jobs (id, kind, params, status, created, owner, lease_until) "
+                   "VALUES ('live', 'echo', '{\"n\": 1}', 'running', '2024-01-01', 'other', ?)",
+                   (time.time() + 60,))
+    queue._recover()
+    time.sleep(0.1)
+    assert queue.get('live')['status'] == 'running' and runs == []
+    queue.shutdown()
+
+
+def test_expired_lease_is_recovered(tmp_path):
+    runs = []
+    queue = JobQueue({'echo': counting_handler(runs)}, root=str(tmp_path), lease_seconds=0.3)
+    queue.start()
+    with sqlite3.connect(queue.db_path) as db:
+        # Claimed by a process that died: its lease is never renewed
+        db.execute("INSERT INTO jobs (id, kind, params, status, created, owner, lease_until) "
+                   "VALUES ('orphan', 'echo', '{\"n\": 7}', 'running', '2024-01-01', 'dead', ?)",
+                   (time.time() + 0.2,))
+    job = wait_for(queue, 'orphan')
+    assert job['status'] == 'done' and job['owner'] == queue.owner
+    assert runs == [7]
+    queue.shutdown()
+
+
+def test_long_job_keeps_its_lease(tmp_path):
+    runs = []
+    first = JobQueue({'echo': counting_handler(runs, delay=1.0)}, root=str(tmp_path), lease_seconds=0.3)
+    second = JobQueue({'echo': counting_handler(runs, delay=1.0)}, root=str(tmp_path), lease_seconds=0.3)
+    job_id = first.submit('echo', {'n': 1})
+    second.start()
+    assert wait_for(first, job_id)['status'] == 'done'
+    assert runs == [1]
+    first.shutdown()
+    second.shutdown()
+
+
+def test_status_hides_internal_fields(tmp_path):
+    queue = JobQueue({'echo': counting_handler([])}, root=str(tmp_path))
+    job_id = queue.submit('echo', {'n': 1})
+    wait_for(queue, job_id)
+    assert not {'result_path', 'owner', 'lease_until'} & set(queue.status(job_id))
+    queue.shutdown()
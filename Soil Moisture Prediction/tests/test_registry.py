@@ -0,0 +1,70 @@
+import os
+import threading
+
+from serving.registry import ModelRegistry
+
+
+class SlowLoader:
+    """Reads the file's text as the "model"; loads block while `gate` is closed."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def __call__(self, path):
+        self.started.set()
+        self.gate.wait(5)
+        with open(path) as f:
+            return f.read()
+
+
+def write_model(tmp_path, text):
+    path = tmp_path / 'Bihar' / 'Bihar_Random_Forest.pkl'
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(text)
+    os.utime(path, ns=(len(text), len(text)))  # A distinct mtime for every version
+    return str(path)
+
+
+def test_changed_model_is_reloaded_once_while_the_old_one_is_served(tmp_path):
+    loader = SlowLoader()
+    registry = ModelRegistry(str(tmp_path), check_interval=0.0, loader=loader)
+    write_model(tmp_path, 'v1')
+    assert registry.get('Bihar', 'Random Forest').model == 'v1'
+
+    write_model(tmp_path, 'version 2')
+    loader.gate.clear()
+    loader.started.clear()
+    reloaded = []
+    reloader = threading.Thread(target=lambda: reloaded.append(registry.get('Bihar', 'Random Forest')))
+    reloader.start()
+    assert loader.started.wait(5)
+
+    # The reload is in progress: other requests get the old model at once
+    assert registry.get('Bihar', 'Random Forest').model == 'v1'
+    loader.gate.set()
+    reloader.join(5)
+
+    assert reloaded[0].model == 'version 2'
+    assert registry.get('Bihar', 'Random Forest').model == 'version 2'
+    assert registry.loads == 2
+
+
+def test_first_load_is_shared_by_concurrent_requests(tmp_path):
+    loader = SlowLoader()
+    registry = ModelRegistry(str(tmp_path), loader=loader)
+    write_model(tmp_path, 'v1')
+    loader.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('Bihar', 'Random Forest').model))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(5)
+    loader.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['v1'] * 4
+    assert registry.loads == 1
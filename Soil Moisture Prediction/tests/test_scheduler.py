@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from extraction.fake_ee import FakeEarthEngine, FakeEEException
+from extraction.scheduler import AdaptiveRateLimiter, ExtractionScheduler, month_tasks
+
+
+def band_names(client, region, year, month):
+    collection = client.ImageCollection('TEST/COLLECTION').filterDate(f'{year}-{month:02d}-01', f'{year}-{month:02d}-28')
+    return collection.median().bandNames().getInfo()
+
+
+def make_scheduler(client, **kwargs):
+    # No real waiting: backoff pauses of a millisecond, a fast token bucket
+    options = dict(max_workers=4, rate=1000.0, base_delay=0.001, max_delay=0.001, sleep=lambda seconds: None)
+    options.update(kwargs)
+    return ExtractionScheduler(client, **options)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_rate_halves_on_throttle_and_recovers():
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(rate=4.0, min_rate=0.5, increase=1.0, clock=clock, sleep=clock.sleep)
+    limiter.on_throttle(cooldown=3.0)
+    assert limiter.rate == 2.0
+    limiter.on_throttle(cooldown=3.0)
+    assert limiter.rate == 1.0
+    for _ in range(10):
+        limiter.on_throttle(cooldown=3.0)
+    assert limiter.rate == 0.5  # Never below min_rate
+
+    # Every worker waits out the cooldown before the next request
+    limiter.acquire()
+    assert clock.now >= 3.0
+
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 4.0  # Back to, and capped at, the configured rate
+
+
+def test_throttled_jobs_are_retried_until_they_succeed():
+    client = FakeEarthEngine(latency=0.0, throttle_rate=0.3, seed=1)
+    scheduler = make_scheduler(client, max_retries=20)
+    results = scheduler.run(band_names, month_tasks({'Bihar': None}, [2023]))
+
+    assert len(results) == 12 and not scheduler.failures
+    assert client.throttled > 0
+    assert scheduler.throttle_count == client.throttled
+    assert client.calls == 12 + client.throttled
+
+
+def test_failed_tasks_are_reported():
+    attempts = {}
+    lock = threading.Lock()
+
+    def job(client, region, year, month):
+        with lock:
+            attempts[month] = attempts.get(month, 0) + 1
+        if month == 3:
+            raise FakeEEException("Quota exceeded.")
+        if month == 4:
+            raise ValueError("Image.select: band not found")
+        return band_names(client, region, year, month)
+
+    scheduler = make_scheduler(FakeEarthEngine(latency=0.0), max_retries=2)
+    results = scheduler.run(job, month_tasks({'Bihar': None}, [2023]))
+
+    assert sorted(scheduler.failures) == [('Bihar', 2023, 3), ('Bihar', 2023, 4)]
+    assert len(results) == 10
+    assert attempts[3] == 3  # First try plus max_retries
+    assert attempts[4] == 1  # Not a throttle error: no retry
+    assert scheduler.throttle_count == 2
+
+
+def test_concurrency_is_bounded_by_the_pool():
+    client = FakeEarthEngine(latency=0.02)
+    scheduler = make_scheduler(client, max_workers=3)
+    results = scheduler.run(band_names, month_tasks({'Bihar': None, 'Rajasthan': None}, [2023]))
+
+    assert len(results) == 24
+    assert 1 < client.peak_concurrency <= 3
+
+
+def test_too_many_concurrent_requests_back_off():
+    # The backend accepts one request at a time; the rest are throttled and retried
+    client = FakeEarthEngine(latency=0.005, max_concurrent=1)
+    scheduler = make_scheduler(client, max_workers=4, max_retries=50)
+    results = scheduler.run(band_names, month_tasks({'Bihar': None}, [2023]))
+
+    assert len(results) == 12 and not scheduler.failures
+    assert scheduler.throttle_count == client.throttled > 0
+
+
+@pytest.mark.parametrize('message', ["User memory limit exceeded.", "Too many concurrent aggregations.",
+                                     "Quota exceeded", "HTTP 429"])
+def test_throttle_messages_are_recognised(message):
+    from extraction.scheduler import is_throttle_error
+
+    assert is_throttle_error(FakeEEException(message))
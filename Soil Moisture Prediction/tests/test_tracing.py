@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from extraction import cli
+from extraction.fake_ee import FakeEarthEngine
+from extraction.scheduler import ExtractionScheduler, month_tasks
+from extraction.tiling import split_bbox
+from extraction.tracing import TracingClient, labels
+
+STATES = {'Bihar': [83.0, 24.5, 88.0, 27.5], 'Telangana': [77.2, 15.8, 81.3, 19.9]}
+DATASETS = ('smap', 'landsat', 'training')
+
+
+def band_names(client, region, year, month):
+    collection = client.ImageCollection('TEST/COLLECTION').filterDate(f'{year}-{month:02d}-01', f'{year}-{month:02d}-28')
+    return collection.median().bandNames().getInfo()
+
+
+def rows(client):
+    return {(row['dataset'], row['state']): row for row in client.report()['rows']}
+
+
+def run_extraction(tmp_path, monkeypatch, datasets=DATASETS, max_tile_pixels=250000):
+    """Run `python -m extraction run` for two states and one year against the fake backend."""
+    config = {'years': {'start': 2023, 'end': 2023}, 'store': str(tmp_path / 'store'),
+              'cache': str(tmp_path / 'cache'),
+              'scheduler': {'max_workers': 2, 'rate': 1000.0, 'max_retries': 2},
+              'sampling': {'scale': 750, 'seed': 42, 'max_tile_pixels': max_tile_pixels},
+              'datasets': {name: {'target_rows': 50} for name in datasets},
+              'states': {state: {'label': state, 'bbox': bbox} for state, bbox in STATES.items()}}
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config))
+    monkeypatch.delenv('DATA_STORE', raising=False)
+
+    fake = FakeEarthEngine(latency=0.0)
+    client = TracingClient(fake)
+    monkeypatch.setattr(cli, '_client', lambda args: client)
+    cli.main(['--config', str(config_path), 'run', '--backend', 'fake', '--datasets', *datasets])
+    return fake, client
+
+
+@pytest.fixture
+def extraction(tmp_path, monkeypatch):
+    return run_extraction(tmp_path, monkeypatch)
+
+
+def test_extraction_is_accounted_per_dataset_and_state(extraction):
+    fake, client = extraction
+    accounted = rows(client)
+    assert set(accounted) == {(name, state) for name in DATASETS for state in STATES}
+    for (name, state), row in accounted.items():
+        # One getInfo per tile, sampling each of the 12 months
+        tiles = len(split_bbox(STATES[state], 750, 250000))
+        assert row['calls'] == tiles, (name, state)
+        assert row['samples'] == 12 * tiles, (name, state)
+        assert row['memo_hits'] == 0 and row['errors'] == 0
+    assert client.report()['totals']['calls'] == fake.calls
+
+
+@pytest.mark.parametrize('dataset', ['smap', 'training', 'grid'])
+def test_configured_tile_size_applies_to_every_dataset(tmp_path, monkeypatch, dataset):
+    _, client = run_extraction(tmp_path, monkeypatch, [dataset], max_tile_pixels=100000)
+    for (name, state), row in rows(client).items():
+        tiles = len(split_bbox(STATES[state], 750, 100000))
+        assert tiles > len(split_bbox(STATES[state], 750, 250000))
+        assert row['calls'] == tiles, (name, state)
+
+
+def test_identical_requests_are_answered_from_memory():
+    # band_names ignores the region, so both states ask the same 12 questions
+    fake = FakeEarthEngine(latency=0.0)
+    client = TracingClient(fake)
+    scheduler = ExtractionScheduler(client, max_workers=4, rate=1000.0)
+    with labels(dataset='bands'):
+        results = scheduler.run(band_names, month_tasks({'Bihar': None, 'Telangana': None}, [2023]))
+
+    assert len(results) == 24
+    assert fake.calls == 12
+    accounted = rows(client)
+    assert sum(row['calls'] for row in accounted.values()) == 12
+    assert sum(row['memo_hits'] for row in accounted.values()) == 12
+    for state in ('Bihar', 'Telangana'):
+        row = accounted[('bands', state)]
+        assert row['calls'] + row['memo_hits'] == 12
+
+
+def test_identical_requests_are_sent_again_without_memo():
+    fake = FakeEarthEngine(latency=0.0)
+    client = TracingClient(fake, memoize=False)
+    for _ in range(2):
+        band_names(client, None, 2023, 1)
+    assert fake.calls == 2
+    assert client.report()['totals']['calls'] == 2
+    assert client.report()['totals']['memo_hits'] == 0
+
+
+def test_samples_are_counted_when_requested():
+    client = TracingClient(FakeEarthEngine(latency=0.0))
+    image = client.ImageCollection('TEST/COLLECTION').filterDate('2023-01-01', '2023-01-28').median()
+    sample = image.sample  # Looking the method up requests nothing
+    assert client.report()['totals']['samples'] == 0
+
+    with labels(dataset='test', state='Bihar'):
+        sample(region=client.Geometry.BBox(*STATES['Bihar']), scale=750, numPixels=10)
+    assert rows(client)[('test', 'Bihar')]['samples'] == 1
+    assert client.report()['totals']['samples'] == 1
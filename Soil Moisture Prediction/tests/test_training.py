@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from serving.training import fit_gbr
+
+
+def test_gbr_keeps_only_the_early_stopped_trees():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 1, (400, 4)), columns=['a', 'b', 'c', 'd'])
+    y = X['a'] * 0.3 + rng.normal(0, 0.05, 400)
+    X_val = pd.DataFrame(rng.uniform(0, 1, (200, 4)), columns=X.columns)
+    y_val = (X_val['a'] * 0.3 + rng.normal(0, 0.05, 200)).to_numpy()
+
+    model, params, best_rounds = fit_gbr(X, y, X_val, y_val, threads=1, max_rounds=1000, patience=50)
+    assert model.n_estimators == best_rounds == len(model.estimators_)
+    assert best_rounds < 1000  # Noisy target: stops well before the cap
+
+
+def monthly_frame(rows_per_month, first=(2022, 1), last=(2023, 12)):
+    months = range(first[0] * 12 + first[1] - 1, last[0] * 12 + last[1])
+    index = np.repeat(list(months), rows_per_month)
+    return pd.DataFrame({'Year': index // 12, 'Month': index % 12 + 1})
+
+
+def test_update_gate_holds_out_whole_months():
+    from serving.training import update_split
+
+    df = monthly_frame(rows_per_month=50)
+    window, gate, new = update_split(df, [2023, 6], min_gate_rows=120)
+    gate_months = set(zip(df['Year'][gate], df['Month'][gate]))
+    assert gate_months == {(2023, 12), (2023, 11), (2023, 10)}  # Newest first, until 120 rows
+    assert new.sum() == 300 and not (window & gate).any()
+    # Every new month outside the gate is learned, plus the last 12 months
+    assert (window | gate)[new].all()
+    assert window.sum() == 12 * 50 - gate.sum()
+
+
+def test_update_window_reaches_back_to_missed_months():
+    from serving.training import update_split
+
+    # A model that last learned 2022-03 (e.g. it failed earlier gates) still sees every month since
+    df = monthly_frame(rows_per_month=50)
+    window, gate, new = update_split(df, [2022, 3], min_gate_rows=50)
+    assert (window | gate)[new].all()
+    assert update_split(df, [2023, 12]) is None
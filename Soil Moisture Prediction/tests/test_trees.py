@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from serving.trees import FlatEnsemble, check_rows, compare, export_model, is_flat
+
+FEATURES = ['B2', 'B3', 'B4', 'B8', 'SR_B4', 'SR_B5', 'Year', 'Month']
+TOLERANCE = 1e-5
+
+
+def training_frame(n_rows=600, seed=0, missing=0.0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(check_rows(FEATURES, n_rows, seed), columns=FEATURES)
+    y = 0.3 * X['B8'] - 0.2 * X['B4'] + 0.01 * X['Month'] + rng.normal(0, 0.01, n_rows)
+    if missing:
+        # NaNs in a feature the trees split on, so the learned missing-value direction matters
+        X.loc[rng.random(n_rows) < missing, 'B8'] = np.nan
+        y = y.where(X['B8'].notna(), y + 0.1)
+    return X, y
+
+
+def fit(kind, missing=0.0):
+    X, y = training_frame(missing=missing)
+    if kind == 'rf':
+        model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0)
+    elif kind == 'gbr':
+        model = GradientBoostingRegressor(n_estimators=40, max_depth=3, random_state=0)
+    elif kind == 'xgb':
+        xgboost = pytest.importorskip('xgboost')
+        model = xgboost.XGBRegressor(n_estimators=40, max_depth=4, learning_rate=0.1, random_state=0)
+    else:
+        lightgbm = pytest.importorskip('lightgbm')
+        model = lightgbm.LGBMRegressor(n_estimators=40, num_leaves=15, random_state=0, verbose=-1)
+    return model.fit(X, y)
+
+
+@pytest.mark.parametrize('kind', ['rf', 'gbr', 'xgb', 'lgbm'])
+def test_flat_predictions_match_the_model(kind):
+    model = fit(kind)
+    flat = export_model(model)
+    X = check_rows(FEATURES, 1000, seed=1)
+    assert compare(model, flat, X, TOLERANCE) <= TOLERANCE
+    # Single rows and tiny batches take the same path as the block walk
+    frame = pd.DataFrame(X[:3], columns=FEATURES)
+    np.testing.assert_allclose(flat.predict(frame), model.predict(frame), atol=TOLERANCE)
+
+
+@pytest.mark.parametrize('kind', ['rf', 'xgb', 'lgbm'])  # GradientBoostingRegressor rejects NaN
+def test_missing_values_follow_the_default_direction(kind):
+    model = fit(kind, missing=0.3)
+    flat = export_model(model)
+    assert flat.default_left.any() and not flat.default_left.all()
+    X = pd.DataFrame(check_rows(FEATURES, 500, seed=2), columns=FEATURES)
+    X.loc[::2, 'B8'] = np.nan
+    X.loc[::3, 'SR_B5'] = np.nan
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), atol=TOLERANCE)
+
+
+@pytest.mark.parametrize('kind', ['rf', 'gbr', 'xgb', 'lgbm'])
+def test_save_and_memory_mapped_load_round_trip(kind, tmp_path):
+    model = fit(kind)
+    flat = export_model(model)
+    path = str(tmp_path / 'flat' / f'{kind}.trees')
+    flat.save(path)
+    assert is_flat(path)
+
+    loaded = FlatEnsemble.load(path)
+    assert not loaded.threshold.flags.writeable  # Read-only views of the mapped file
+    assert loaded.meta() == flat.meta()
+    for name, array in flat.arrays().items():
+        np.testing.assert_array_equal(getattr(loaded, name), array)
+    X = pd.DataFrame(check_rows(FEATURES, 300, seed=3), columns=FEATURES)
+    np.testing.assert_allclose(loaded.predict(X), model.predict(X), atol=TOLERANCE)
+    np.testing.assert_array_equal(FlatEnsemble.load(path, mmap=False).predict(X), loaded.predict(X))
+
+
+def test_corrupt_export_is_rejected(tmp_path):
+    path = tmp_path / 'model.trees'
+    path.write_bytes(b'not a tree export')
+    with pytest.raises(ValueError):
+        FlatEnsemble.load(str(path))